@@ -10,7 +10,7 @@ DATA_DIR = BASE_DIR / "data"
 UPLOAD_DIR.mkdir(exist_ok=True)
 DATA_DIR.mkdir(exist_ok=True)
 
-DATABASE_URL = f"sqlite+aiosqlite:///{DATA_DIR / 'turing_review.db'}"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite+aiosqlite:///{DATA_DIR / 'turing_review.db'}")
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
@@ -27,6 +27,14 @@ INNOVATOR_MODEL = "meta-llama/llama-3.3-70b-instruct"  # The Innovator (via Open
 TECHNICIAN_MODEL = "deepseek-chat"                      # The Technician (direct)
 DEEPSEEK_BASE_URL = "https://api.deepseek.com"
 
+# 各模型上下文窗口（token），用于按模型计算稿件可用长度；未列出的模型（如社区 API 模式）用默认值
+MODEL_CONTEXT_TOKENS = {
+    LOGICIAN_MODEL: 32768,
+    INNOVATOR_MODEL: 131072,
+    TECHNICIAN_MODEL: 65536,
+}
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("DEFAULT_CONTEXT_TOKENS", "16000"))
+
 # 主编模型（通过 OpenRouter 调用）
 EDITOR_MODEL = "meta-llama/llama-3.3-70b-instruct"
 
@@ -42,10 +50,143 @@ SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")
 MAX_GUEST_REVIEWERS_PER_PAPER = int(os.getenv("MAX_GUEST_REVIEWERS_PER_PAPER", "2"))
 MAX_PROMPT_MODE_PER_PAPER = int(os.getenv("MAX_PROMPT_MODE_PER_PAPER", "1"))
 GUEST_API_TIMEOUT = int(os.getenv("GUEST_API_TIMEOUT", "120"))
+GUEST_LATENCY_PENALTY_SECONDS = float(os.getenv("GUEST_LATENCY_PENALTY_SECONDS", "30"))  # 平均每慢这么多秒，分配得分 -1
 GUEST_API_KEY_SECRET = os.getenv("GUEST_API_KEY_SECRET", "change-me-in-production")
 PROMPT_MODE_MONTHLY_QUOTA = int(os.getenv("PROMPT_MODE_MONTHLY_QUOTA", "10"))
 
-# 投稿频率限制
+# 上传文件（流式写入临时文件，校验通过后原子重命名到 UPLOAD_DIR）
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "30")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+UPLOAD_TMP_DIR = UPLOAD_DIR / ".incoming"
+UPLOAD_TMP_DIR.mkdir(exist_ok=True)
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))  # 无人引用的文件至少保留这么久
+BLOB_GC_INTERVAL_SECONDS = int(os.getenv("BLOB_GC_INTERVAL_SECONDS", "21600"))  # 0 = 不自动回收
+
+# PDF 文本提取（每个文件一个独立进程，避免阻塞事件循环）
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "2"))  # 同时运行的提取进程数
+PDF_EXTRACT_TIMEOUT = int(os.getenv("PDF_EXTRACT_TIMEOUT", "60"))  # 单个文件的提取超时（秒，从进程开始运行时计算，不含排队）
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "300"))  # 超出的页不提取
+PDF_EXTRACT_MEMORY_MB = int(os.getenv("PDF_EXTRACT_MEMORY_MB", "1024"))  # 提取进程的地址空间上限，0 = 不限
+
+# SQLite 调优：WAL 模式下读不阻塞写；审稿/校准/升降级的写操作经单写队列串行并合并提交
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+DB_WRITE_BATCH_MAX = int(os.getenv("DB_WRITE_BATCH_MAX", "50"))  # 一次提交最多合并的写操作数
+DB_WRITE_BATCH_WINDOW_MS = int(os.getenv("DB_WRITE_BATCH_WINDOW_MS", "5"))  # 攒批等待时间
+
+# 已决定论文详情页的渲染缓存（进程内 LRU）
+PAGE_CACHE_MAX_MB = int(os.getenv("PAGE_CACHE_MAX_MB", "32"))
+
+# HTML 响应压缩（brotli 需安装 brotli 包，否则只用 gzip）
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# 统计面板：计数器增量维护，后台定期从原始表对账；面板数据的进程内缓存时间
+DASHBOARD_CACHE_SECONDS = int(os.getenv("DASHBOARD_CACHE_SECONDS", "10"))
+DASHBOARD_RECONCILE_INTERVAL_SECONDS = int(os.getenv("DASHBOARD_RECONCILE_INTERVAL_SECONDS", "3600"))  # 0 = 只在启动时对账
+
+# 社区审稿人排行榜每页人数
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", "50"))
+
+# 社区审稿人分配索引（审稿人向量矩阵 + 近 30 天负载，进程内）从数据库整体重建的间隔（秒）
+ASSIGNMENT_INDEX_REFRESH_SECONDS = int(os.getenv("ASSIGNMENT_INDEX_REFRESH_SECONDS", "300"))
+
+# 审稿人匹配：哈希 TF-IDF 向量的维数（矩阵每位审稿人占 4 字节 × 维数，维数越低哈希冲突越多），相似度（0~1）在分配得分中的权重
+# （权重 10 表示完全匹配抵得上近 30 天多审 10 篇）
+ASSIGNMENT_VECTOR_DIM = int(os.getenv("ASSIGNMENT_VECTOR_DIM", "1024"))
+ASSIGNMENT_SIMILARITY_WEIGHT = float(os.getenv("ASSIGNMENT_SIMILARITY_WEIGHT", "10"))
+
+# 单个请求加载的 ORM 对象超过该数量时记录警告（按路由的统计见 /dashboard/runtime）
+QUERY_LOAD_WARN_OBJECTS = int(os.getenv("QUERY_LOAD_WARN_OBJECTS", "500"))
+
+# 论文列表分页（游标分页，per_page 参数不能超过上限）
+PAPERS_PAGE_SIZE = int(os.getenv("PAPERS_PAGE_SIZE", "20"))
+PAPERS_MAX_PAGE_SIZE = int(os.getenv("PAPERS_MAX_PAGE_SIZE", "100"))
+
+# 投稿频率限制（每个 email 滚动 24 小时 / 30 天的窗口）
 DAILY_SUBMIT_LIMIT = int(os.getenv("DAILY_SUBMIT_LIMIT", "2"))
 MONTHLY_SUBMIT_LIMIT = int(os.getenv("MONTHLY_SUBMIT_LIMIT", "5"))
 REQUIRE_EMAIL = os.getenv("REQUIRE_EMAIL", "true").lower() == "true"
+# 应用前面的可信反向代理层数：>0 时客户端 IP 取 X-Forwarded-For 从右数第 N 项（Heroku router 为 1），0 = 直接取连接地址
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
+# 同一客户端 IP 每天最多投稿数（0 = 不限）
+SUBMIT_IP_DAILY_LIMIT = int(os.getenv("SUBMIT_IP_DAILY_LIMIT", "10"))
+# 社区审稿人注册：同一 IP 每天最多注册数；重新校准：每位审稿人 / 同一 IP 每天最多次数（0 = 不限）
+REGISTER_IP_DAILY_LIMIT = int(os.getenv("REGISTER_IP_DAILY_LIMIT", "5"))
+CALIBRATE_DAILY_LIMIT = int(os.getenv("CALIBRATE_DAILY_LIMIT", "5"))
+CALIBRATE_IP_DAILY_LIMIT = int(os.getenv("CALIBRATE_IP_DAILY_LIMIT", "20"))
+
+# 后台任务队列（审稿流程 / 校准测试）
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))  # 同时运行的任务数上限
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))  # 租约时长，超时未心跳的任务会被重新领取
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+# 同时运行的校准测试数上限（所有进程合计，领取任务时检查；0 = 不限），其余 worker 留给审稿流程
+CALIBRATION_MAX_CONCURRENCY = int(os.getenv("CALIBRATION_MAX_CONCURRENCY", "1"))
+
+# LLM 调用限流（按 provider base URL 区分；RPM/TPM 为 0 表示不限）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+PROVIDER_LIMITS = {
+    OPENROUTER_BASE_URL: {
+        "max_concurrency": int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "6")),
+        "rpm": int(os.getenv("OPENROUTER_REQUESTS_PER_MINUTE", "60")),
+        "tpm": int(os.getenv("OPENROUTER_TOKENS_PER_MINUTE", "0")),
+    },
+    DEEPSEEK_BASE_URL: {
+        "max_concurrency": int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "4")),
+        "rpm": int(os.getenv("DEEPSEEK_REQUESTS_PER_MINUTE", "30")),
+        "tpm": int(os.getenv("DEEPSEEK_TOKENS_PER_MINUTE", "0")),
+    },
+}
+# 社区审稿人自带端点（每个端点单独计数）
+GUEST_API_MAX_CONCURRENCY = int(os.getenv("GUEST_API_MAX_CONCURRENCY", "2"))
+GUEST_API_REQUESTS_PER_MINUTE = int(os.getenv("GUEST_API_REQUESTS_PER_MINUTE", "10"))
+GUEST_API_TOKENS_PER_MINUTE = int(os.getenv("GUEST_API_TOKENS_PER_MINUTE", "0"))
+# 社区审稿人端点的限流器：最多保留的个数 / 空闲多久后丢弃（秒，不小于 60 时丢弃前 RPM 窗口已恢复）
+GUEST_LIMITER_POOL_SIZE = int(os.getenv("GUEST_LIMITER_POOL_SIZE", "256"))
+GUEST_LIMITER_IDLE_SECONDS = int(os.getenv("GUEST_LIMITER_IDLE_SECONDS", "600"))
+
+# LLM HTTP 连接池（按端点共享）
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "120"))
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+# 社区审稿人自带端点的客户端：最多保留的个数 / 空闲多久后关闭（秒）
+GUEST_CLIENT_POOL_SIZE = int(os.getenv("GUEST_CLIENT_POOL_SIZE", "32"))
+GUEST_CLIENT_IDLE_SECONDS = int(os.getenv("GUEST_CLIENT_IDLE_SECONDS", "600"))
+LLM_WARMUP_TIMEOUT = float(os.getenv("LLM_WARMUP_TIMEOUT", "5"))
+
+# LLM 流式输出（边接收边校验 JSON，异常输出提前中止）
+LLM_STREAMING = os.getenv("LLM_STREAMING", "false").lower() == "true"
+LLM_STREAM_MAX_RETRIES = int(os.getenv("LLM_STREAM_MAX_RETRIES", "1"))  # 提前中止后的重试次数
+LLM_MAX_RESPONSE_CHARS = int(os.getenv("LLM_MAX_RESPONSE_CHARS", "60000"))
+GUEST_MAX_RESPONSE_CHARS = int(os.getenv("GUEST_MAX_RESPONSE_CHARS", "20000"))  # 社区审稿人自带端点（不可信）
+# 社区审稿人端点的响应体字节上限，读取时计数（流式响应每个事件有 JSON 包装，比正文大得多）
+GUEST_MAX_RESPONSE_BYTES = int(os.getenv("GUEST_MAX_RESPONSE_KB", "4096")) * 1024
+
+# 长稿件分段审稿（map-reduce）：超出单次预算的稿件按章节分段做笔记，再汇总成审稿意见
+# 单次审稿的正文上限，0 = 仅受模型上下文限制；默认约 3 万个拉丁字符，与分段审稿之前的单次截断长度相同
+LONG_DOC_SINGLE_PASS_TOKENS = int(os.getenv("LONG_DOC_SINGLE_PASS_TOKENS", "7500"))
+LONG_DOC_CHUNK_TOKENS = int(os.getenv("LONG_DOC_CHUNK_TOKENS", "6000"))  # 每段目标大小（不超过单次上限）
+LONG_DOC_MAX_CHUNKS = int(os.getenv("LONG_DOC_MAX_CHUNKS", "12"))  # 超出时放大分段，仍超出则截断末尾
+
+# Prompt 布局：persona_first（人设在前，默认）/ manuscript_first（稿件在前，多位审稿人共享可缓存的前缀）
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "persona_first")
+# manuscript_first 时给稿件块加 cache_control 提示（仅对下列端点；OpenAI / DeepSeek 为自动前缀缓存，无需提示）
+PROMPT_CACHE_CONTROL = os.getenv("PROMPT_CACHE_CONTROL", "true").lower() == "true"
+PROMPT_CACHE_CONTROL_PROVIDERS = {OPENROUTER_BASE_URL}
+
+# 审稿结果缓存（相同稿件重复投稿时复用）
+REVIEW_CACHE_ENABLED = os.getenv("REVIEW_CACHE_ENABLED", "true").lower() == "true"
+REVIEW_CACHE_TTL_DAYS = int(os.getenv("REVIEW_CACHE_TTL_DAYS", "30"))
+REVIEW_CACHE_MAX_ENTRIES = int(os.getenv("REVIEW_CACHE_MAX_ENTRIES", "5000"))
+# 校准结果缓存（相同配置的审稿人在有效期内复用上次通过的校准结论，小时）
+CALIBRATION_CACHE_TTL_HOURS = int(os.getenv("CALIBRATION_CACHE_TTL_HOURS", "24"))
+
+# 审稿流程截止时间与法定数：主编不再无限等待慢速社区审稿人
+PIPELINE_DEADLINE_SECONDS = int(os.getenv("PIPELINE_DEADLINE_SECONDS", "180"))  # 自流程开始计时
+BUILTIN_REVIEW_QUORUM = int(os.getenv("BUILTIN_REVIEW_QUORUM", "0"))  # 主编开始前至少需要的内置审稿数，0 = 全部
+ASSOCIATE_GRACE_SECONDS = int(os.getenv("ASSOCIATE_GRACE_SECONDS", "30"))  # 内置审稿完成后最多再等 Associate 的秒数
@@ -1,21 +1,63 @@
+import logging
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 
-from app.config import DATABASE_URL
+from app.config import DATABASE_URL, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_MB, SQLITE_CACHE_MB
+
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_pragmas(query_only: bool = False):
+    """每个新连接的 PRAGMA：WAL + synchronous=NORMAL，锁等待超时，内存映射和页缓存。"""
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")  # 负数单位为 KB
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+    return on_connect
+
 
+# 写引擎：建表迁移、单写队列（见 db_writer_service）、投稿/注册等请求内的少量写入
 engine = create_async_engine(DATABASE_URL, echo=False)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# 只读引擎：页面查询和审稿流程中的读取，WAL 模式下不会被写事务阻塞
+read_engine = create_async_engine(DATABASE_URL, echo=False)
+read_session = async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine.sync_engine, "connect", _sqlite_pragmas())
+    event.listen(read_engine.sync_engine, "connect", _sqlite_pragmas(query_only=True))
+
 
 class Base(DeclarativeBase):
     pass
 
 
 async def init_db():
+    """建新表并执行未执行的迁移（见 app/migrations.py），然后检查热点查询的执行计划。"""
+    from app.migrations import run_migrations, check_query_plans
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+        regressions = await conn.run_sync(check_query_plans)
+    for name, plan in regressions.items():
+        logger.warning(f"Query plan regression: {name} does a full table scan ({' | '.join(plan)})")
 
 
 async def get_db():
     async with async_session() as session:
         yield session
+
+
+async def get_read_db():
+    """只读页面使用的会话（连接设置了 query_only，误写会直接报错）。"""
+    async with read_session() as session:
+        yield session
@@ -3,19 +3,40 @@
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from sqlalchemy import select
 
-from app.database import init_db
+from app.database import init_db, engine, read_engine
 from app.models import Paper
 from app.routers import submit, papers, dashboard, guest
+from app.services.blob_store_service import start_blob_gc, stop_blob_gc
+from app.services.dashboard_stats_service import start_stats_reconcile, stop_stats_reconcile
+from app.services.db_writer_service import db_writer
+from app.services.http_cache_service import (
+    CompressionMiddleware, FingerprintedStaticFiles, not_modified, with_validators,
+)
+from app.services.job_queue_service import job_pool
+from app.services.llm_client_service import warmup_clients, close_clients
+from app.services.paper_query_service import paper_summaries, papers_validators
+from app.services.paper_service import shutdown_extraction_pool
+from app.services.query_stats_service import QueryStatsMiddleware, install_query_stats
+from app.services.rate_limit_service import load_rate_limits
+from app.templating import templates
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await load_rate_limits()
+    await warmup_clients()
+    await job_pool.start()
+    start_blob_gc()
+    start_stats_reconcile()
     yield
+    await stop_stats_reconcile()
+    await stop_blob_gc()
+    await job_pool.stop()
+    await db_writer.stop()
+    await close_clients()
+    shutdown_extraction_pool()
 
 
 app = FastAPI(
@@ -24,7 +45,10 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+install_query_stats(engine, read_engine)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.mount("/static", FingerprintedStaticFiles(directory="app/static"), name="static")
 
 # 注册路由
 app.include_router(submit.router)
@@ -32,26 +56,28 @@ app.include_router(papers.router)
 app.include_router(dashboard.router)
 app.include_router(guest.router)
 
-templates = Jinja2Templates(directory="app/templates")
-
 
 @app.get("/")
 async def home(request: Request):
-    from app.database import async_session
-    async with async_session() as db:
+    from app.database import read_session
+    async with read_session() as db:
+        validators = await papers_validators(db)
+        if response := not_modified(request, validators):
+            return response
+
         result = await db.execute(
-            select(Paper).order_by(Paper.submitted_at.desc()).limit(10)
+            paper_summaries().order_by(Paper.submitted_at.desc()).limit(10)
         )
-        recent_papers = result.scalars().all()
+        recent_papers = result.all()
 
         published_result = await db.execute(
-            select(Paper).where(Paper.status == "accepted")
+            paper_summaries().where(Paper.status == "accepted")
             .order_by(Paper.decided_at.desc()).limit(5)
         )
-        published_papers = published_result.scalars().all()
+        published_papers = published_result.all()
 
-    return templates.TemplateResponse("index.html", {
+    return with_validators(templates.TemplateResponse("index.html", {
         "request": request,
         "recent_papers": recent_papers,
         "published_papers": published_papers,
-    })
+    }), validators)
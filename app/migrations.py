@@ -0,0 +1,294 @@
+"""数据库迁移 — 按版本号顺序执行，已执行的版本记录在 schema_version 表中。
+
+create_all 只会建新表，已有部署的表结构（新列、索引）都通过这里的迁移变更。
+每个迁移都用幂等的辅助函数编写（列/索引已存在则跳过），新库上重复执行也安全。
+
+热点查询的执行计划检查：tests/test_query_plans.py（pytest）和 python -m app.migrations --check，
+任一查询退化为全表扫描时失败 / 以非零状态退出；应用启动时同样检查并记录警告。
+"""
+
+import logging
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import PurePath
+from typing import Callable
+
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+
+# ---------- 幂等辅助函数 ----------
+
+def table_columns(conn: Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str):
+    """列不存在时添加，ddl 为列类型及默认值，如 "INTEGER DEFAULT 0"。"""
+    if column not in table_columns(conn, table):
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def create_index(conn: Connection, name: str, table: str, columns: str, unique: bool = False, where: str = ""):
+    """创建索引（已存在则跳过），columns 可包含表达式，where 非空时为部分索引。"""
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    condition = f" WHERE {where}" if where else ""
+    conn.exec_driver_sql(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns}){condition}")
+
+
+# ---------- 迁移 ----------
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _hot_query_indexes(conn: Connection):
+    # /papers 列表：(submitted_at, id) 游标分页，可按状态过滤
+    create_index(conn, "ix_papers_submitted", "papers", "submitted_at, id")
+    create_index(conn, "ix_papers_status_submitted", "papers", "status, submitted_at, id")
+    # /published 列表：与 PUBLISHED_SORT_KEY 相同的表达式
+    create_index(conn, "ix_papers_status_published", "papers", "status, coalesce(decided_at, submitted_at), id")
+    # 排行榜 / 审稿人主页：按社区审稿人查审稿意见
+    create_index(conn, "ix_reviews_guest_reviewed", "reviews", "guest_reviewer_id, is_guest, reviewed_at")
+    # 审稿人分配：候选审稿人近 30 天的审稿数；审稿人主页：按审稿人查记录
+    create_index(conn, "ix_guest_review_records_reviewer", "guest_review_records", "guest_reviewer_id, created_at")
+
+
+def _paper_versions(conn: Connection):
+    # HTTP 条件请求：papers.updated_at 作为列表页的数据版本，详情页另按论文查审稿意见时间
+    add_column(conn, "papers", "updated_at", "DATETIME")
+    conn.exec_driver_sql("UPDATE papers SET updated_at = coalesce(decided_at, submitted_at) WHERE updated_at IS NULL")
+    create_index(conn, "ix_papers_updated", "papers", "updated_at")
+    create_index(conn, "ix_reviews_paper", "reviews", "paper_id, reviewed_at")
+
+
+def _guest_reviewer_leaderboard(conn: Connection):
+    # 排行榜：审稿数与评分总和存进 guest_reviewer_stats，按已有数据回填，每个排序键一个索引
+    for column in ("review_count", "valid_count", "scored_reviews", "novelty_sum", "soundness_sum", "writing_sum"):
+        add_column(conn, "guest_reviewer_stats", column, "INTEGER DEFAULT 0")
+    for column in ("avg_novelty", "avg_soundness", "avg_writing", "avg_overall"):
+        add_column(conn, "guest_reviewer_stats", column, "FLOAT DEFAULT 0")
+    conn.exec_driver_sql(
+        "INSERT OR IGNORE INTO guest_reviewer_stats (guest_reviewer_id, latency_ewma, late_reviews) "
+        "SELECT id, 0, 0 FROM guest_reviewers"
+    )
+    # 回填语句按当时的统计口径写死（不引用业务代码，之后口径变化不影响这个迁移）
+    records = "FROM guest_review_records r WHERE r.guest_reviewer_id = guest_reviewer_stats.guest_reviewer_id"
+    reviews = ("FROM reviews v WHERE v.guest_reviewer_id = guest_reviewer_stats.guest_reviewer_id "
+               "AND v.is_guest = 1")
+    conn.exec_driver_sql(
+        f"UPDATE guest_reviewer_stats SET "
+        f"review_count = (SELECT count(r.id) {records}), "
+        f"valid_count = (SELECT count(r.id) {records} AND r.format_valid = 1), "
+        f"scored_reviews = (SELECT count(v.id) {reviews}), "
+        f"novelty_sum = (SELECT coalesce(sum(v.novelty_score), 0) {reviews}), "
+        f"soundness_sum = (SELECT coalesce(sum(v.soundness_score), 0) {reviews}), "
+        f"writing_sum = (SELECT coalesce(sum(v.writing_score), 0) {reviews})"
+    )
+    conn.exec_driver_sql(
+        "UPDATE guest_reviewer_stats SET "
+        "avg_novelty = CASE WHEN scored_reviews > 0 THEN novelty_sum * 1.0 / scored_reviews ELSE 0.0 END, "
+        "avg_soundness = CASE WHEN scored_reviews > 0 THEN soundness_sum * 1.0 / scored_reviews ELSE 0.0 END, "
+        "avg_writing = CASE WHEN scored_reviews > 0 THEN writing_sum * 1.0 / scored_reviews ELSE 0.0 END, "
+        "avg_overall = CASE WHEN scored_reviews > 0 "
+        "THEN (novelty_sum + soundness_sum + writing_sum) * 1.0 / (3 * scored_reviews) ELSE 0.0 END"
+    )
+    for key in ("review_count", "avg_novelty", "avg_soundness", "avg_writing", "avg_overall"):
+        create_index(conn, f"ix_guest_reviewer_stats_{key}", "guest_reviewer_stats", key)
+
+
+def _assignment_index(conn: Connection):
+    # 审稿人分配：关键词倒排索引和按天负载（两张新表由 create_all 建好），按已有数据回填
+    # 关键词规范化规则按当时写死：逗号分隔、去空白、小写、最长 100 字符
+    for reviewer_id, expertise_areas in conn.exec_driver_sql("SELECT id, expertise_areas FROM guest_reviewers").all():
+        for keyword in {k.strip().lower()[:100] for k in (expertise_areas or "").split(",") if k.strip()}:
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO reviewer_keywords (keyword, guest_reviewer_id) VALUES (?, ?)",
+                (keyword, reviewer_id),
+            )
+    # 负载窗口：含当天共 30 个按天（UTC）的桶
+    conn.exec_driver_sql(
+        "INSERT OR REPLACE INTO guest_reviewer_daily_loads (guest_reviewer_id, day, reviews) "
+        "SELECT guest_reviewer_id, date(created_at), count(*) FROM guest_review_records "
+        "WHERE date(created_at) >= date('now', '-29 days') GROUP BY guest_reviewer_id, date(created_at)"
+    )
+    # 修改专长时按审稿人删除倒排索引行
+    create_index(conn, "ix_reviewer_keywords_reviewer", "reviewer_keywords", "guest_reviewer_id")
+
+
+def _calibration_dedupe(conn: Connection):
+    # 每位审稿人同时只有一个待执行/运行中的校准任务：先把已有的重复任务并入最早的一个，再建部分唯一索引
+    conn.exec_driver_sql(
+        "UPDATE review_jobs SET status = 'done', finished_at = ?, last_error = 'Coalesced into an earlier calibration job' "
+        "WHERE kind = 'calibration' AND status IN ('pending', 'running') AND id NOT IN ("
+        "SELECT min(id) FROM review_jobs WHERE kind = 'calibration' AND status IN ('pending', 'running') GROUP BY target_id)",
+        (datetime.utcnow().isoformat(" "),),
+    )
+    create_index(conn, "ix_review_jobs_active_calibration", "review_jobs", "target_id", unique=True,
+                 where="kind = 'calibration' AND status IN ('pending', 'running')")
+    # 按目标查活动任务（重新校准时并入已有任务；启动时恢复孤立的审稿流程）
+    create_index(conn, "ix_review_jobs_target", "review_jobs", "target_id, kind, status")
+
+
+def _relative_blob_paths(conn: Connection):
+    # blob 路径改存相对 UPLOAD_DIR 的 blobs/ab/cd/<哈希><扩展名>，部署目录变化后仍能找到文件；旧版平铺存储的绝对路径不变
+    rows = conn.exec_driver_sql("SELECT id, file_path FROM papers WHERE file_path LIKE '%blobs%'").all()
+    for paper_id, file_path in rows:
+        parts = PurePath(file_path).parts
+        if len(parts) > 4 and parts[-4] == "blobs":
+            conn.exec_driver_sql("UPDATE papers SET file_path = ? WHERE id = ?", ("/".join(parts[-4:]), paper_id))
+
+
+def _paper_keywords(conn: Connection):
+    # 按关键词过滤论文列表：倒排索引表由 create_all 建好，按已有论文回填（规范化规则同 _assignment_index，按当时写死）
+    for paper_id, keywords, submitted_at in conn.exec_driver_sql("SELECT id, keywords, submitted_at FROM papers").all():
+        for keyword in {k.strip().lower()[:100] for k in (keywords or "").split(",") if k.strip()}:
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO paper_keywords (keyword, paper_id, submitted_at) VALUES (?, ?, ?)",
+                (keyword, paper_id, submitted_at),
+            )
+    # 列表页：关键词内按 (submitted_at, paper_id) 游标分页
+    create_index(conn, "ix_paper_keywords_submitted", "paper_keywords", "keyword, submitted_at, paper_id")
+
+
+def _leaderboard_level_index(conn: Connection):
+    # 排行榜按等级排序：(level, rowid) 索引顺序即排行榜顺序，同时覆盖 level >= 1 的过滤
+    create_index(conn, "ix_guest_reviewers_level", "guest_reviewers", "level")
+
+
+# 迁移只改动已有部署的表结构；新表和与表同时发布的列由 create_all 建好，不需要迁移
+MIGRATIONS = [
+    Migration(2, "composite indexes for hot queries", _hot_query_indexes),
+    Migration(3, "papers.updated_at and indexes for page validators", _paper_versions),
+    Migration(4, "guest_reviewer_stats leaderboard aggregates", _guest_reviewer_leaderboard),
+    Migration(5, "reviewer keyword index and daily load counters", _assignment_index),
+    Migration(6, "one active calibration job per reviewer", _calibration_dedupe),
+    Migration(7, "store blob paths relative to the upload directory", _relative_blob_paths),
+    Migration(8, "paper keyword index for the filtered paper list", _paper_keywords),
+    Migration(9, "guest reviewer level index for the leaderboard", _leaderboard_level_index),
+]
+
+
+def run_migrations(conn: Connection) -> list[int]:
+    """执行尚未执行的迁移，返回本次执行的版本号。需在 create_all 之后、同一事务中调用。"""
+    conn.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at DATETIME)"
+    )
+    applied = {row[0] for row in conn.exec_driver_sql("SELECT version FROM schema_version")}
+    done = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        migration.apply(conn)
+        conn.exec_driver_sql(
+            "INSERT OR IGNORE INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+            (migration.version, migration.description, datetime.utcnow().isoformat(" ")),
+        )
+        done.append(migration.version)
+        logger.info(f"Applied migration {migration.version}: {migration.description}")
+    return done
+
+
+# ---------- 执行计划检查 ----------
+
+def hot_queries() -> dict:
+    """需要走索引的热点查询（与业务代码中的查询结构一致，参数值不影响执行计划）。"""
+    from app.models import (
+        Paper, Review, GuestReviewer, GuestReviewRecord, ReviewerKeyword, GuestReviewerDailyLoad, PaperKeyword,
+    )
+    from app.services.paper_query_service import (
+        paper_summaries, PUBLISHED_SORT_KEY, papers_version_query, paper_version_query,
+    )
+    from app.services.dashboard_stats_service import counters_query
+    from app.services.job_queue_service import active_job_query
+    from app.services.rate_limit_service import submission_counts_query
+    from app.services.reviewer_stats_service import LEADERBOARD_SORTS, leaderboard_query
+
+    now = datetime.utcnow()
+    return {
+        "submission_limit_rebuild": submission_counts_query(86400, now),
+        "papers_page": paper_summaries()
+            .where(tuple_(Paper.submitted_at, Paper.id) < (now, 0))
+            .order_by(Paper.submitted_at.desc(), Paper.id.desc()).limit(21),
+        "papers_page_by_status": paper_summaries()
+            .where(Paper.status == "", tuple_(Paper.submitted_at, Paper.id) < (now, 0))
+            .order_by(Paper.submitted_at.desc(), Paper.id.desc()).limit(21),
+        "published_page": paper_summaries()
+            .where(Paper.status == "accepted", tuple_(PUBLISHED_SORT_KEY, Paper.id) < (now, 0))
+            .order_by(PUBLISHED_SORT_KEY.desc(), Paper.id.desc()).limit(21),
+        "home_recent": paper_summaries().order_by(Paper.submitted_at.desc()).limit(10),
+        "papers_page_by_keyword": paper_summaries()
+            .join(PaperKeyword, PaperKeyword.paper_id == Paper.id)
+            .where(PaperKeyword.keyword == "", tuple_(PaperKeyword.submitted_at, PaperKeyword.paper_id) < (now, 0))
+            .order_by(PaperKeyword.submitted_at.desc(), PaperKeyword.paper_id.desc()).limit(21),
+        "home_published": paper_summaries().where(Paper.status == "accepted")
+            .order_by(Paper.decided_at.desc()).limit(5),
+        "status_counts": counters_query("status:"),
+        "published_issues": counters_query("published:"),
+        "leaderboard_scores": select(func.avg(Review.novelty_score))
+            .where(Review.guest_reviewer_id == 0, Review.is_guest == 1),
+        "reviewer_recent_reviews": select(Review.id)
+            .where(Review.guest_reviewer_id == 0, Review.is_guest == 1)
+            .order_by(Review.reviewed_at.desc()).limit(20),
+        "reviewer_records": select(func.count(GuestReviewRecord.id))
+            .where(GuestReviewRecord.guest_reviewer_id == 0),
+        "assignment_picks": select(GuestReviewer)
+            .where(GuestReviewer.id.in_([0, 1]), GuestReviewer.level >= 1, GuestReviewer.is_active == 1),
+        "reviewer_keywords_delete": select(ReviewerKeyword.keyword).where(ReviewerKeyword.guest_reviewer_id == 0),
+        "daily_load_expire": select(GuestReviewerDailyLoad.day)
+            .where(GuestReviewerDailyLoad.guest_reviewer_id == 0, GuestReviewerDailyLoad.day < ""),
+        "active_job": active_job_query("calibration", 0),
+        "papers_version": papers_version_query(),
+        "paper_version": paper_version_query(0),
+        **{f"leaderboard_by_{sort}": leaderboard_query(sort, 1, 20) for sort in LEADERBOARD_SORTS},
+    }
+
+
+# 只有不带索引的 "SCAN t" 是全表扫描；"SCAN t USING [COVERING] INDEX i" 按索引顺序读（如 ORDER BY ... LIMIT），允许
+_FULL_SCAN = re.compile(r"^SCAN \w+$")
+
+
+def explain(conn: Connection, statement) -> list[str]:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(None for _ in (compiled.positiontup or ()))
+    return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)]
+
+
+def check_query_plans(conn: Connection) -> dict[str, list[str]]:
+    """返回退化为全表扫描的查询 → 执行计划，全部走索引时为空。"""
+    regressions = {}
+    for name, statement in hot_queries().items():
+        plan = explain(conn, statement)
+        if any(_FULL_SCAN.match(step) for step in plan):
+            regressions[name] = plan
+    return regressions
+
+
+async def main(check: bool) -> int:
+    import app.models  # noqa: F401  注册所有表
+    from app.database import engine, init_db
+    await init_db()
+    if not check:
+        return 0
+    async with engine.connect() as conn:
+        regressions = await conn.run_sync(check_query_plans)
+    await engine.dispose()
+    for name, plan in regressions.items():
+        print(f"FULL SCAN in {name}: {' | '.join(plan)}")
+    if not regressions:
+        print("All hot queries use indexes.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    import asyncio
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main("--check" in sys.argv)))
@@ -1,6 +1,6 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, Float, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship, deferred
 from app.database import Base
 
 
@@ -14,14 +14,16 @@ class Paper(Base):
     email = Column(String(200), default="")
     keywords = Column(String(500), default="")
     file_path = Column(String(500), default="")
-    content_text = Column(Text, default="")
-    status = Column(String(50), default="submitted")  # submitted/under_review/accepted/revision/rejected
+    content_text = deferred(Column(Text, default=""), raiseload=True)  # 全文只在审稿任务中 undefer 加载
+    status = Column(String(50), default="submitted")  # submitted/under_review/accepted/revision/rejected/review_failed
     publication_number = Column(Integer, nullable=True, unique=True)  # 仅 accepted 时分配，作为 TR-xxxx 发表编号
     submitted_at = Column(DateTime, default=datetime.utcnow)
     decided_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # 列表页 ETag 的数据版本
 
-    reviews = relationship("Review", back_populates="paper", lazy="selectin")
-    editorial_decision = relationship("EditorialDecision", back_populates="paper", uselist=False, lazy="selectin")
+    # 关联默认不加载，需要的查询显式 selectinload（见 paper_query_service）
+    reviews = relationship("Review", back_populates="paper", lazy="raise")
+    editorial_decision = relationship("EditorialDecision", back_populates="paper", uselist=False, lazy="raise")
 
 
 class Review(Base):
@@ -40,7 +42,7 @@ class Review(Base):
     detailed_comments = Column(Text, default="")
     suggestions = Column(Text, default="")
     reviewed_at = Column(DateTime, default=datetime.utcnow)
-    raw_response = Column(Text, default="")
+    raw_response = deferred(Column(Text, default=""), raiseload=True)  # 仅留档，页面不读取
 
     # 社区审稿人关联
     is_guest = Column(Integer, default=0)  # 0=内置审稿人, 1=社区审稿人
@@ -97,7 +99,8 @@ class GuestReviewer(Base):
     calibration_passed = Column(Integer, default=0)
     calibration_error = Column(Text, default="")
 
-    review_records = relationship("GuestReviewRecord", back_populates="reviewer", lazy="selectin")
+    # 审稿记录随平台运行持续增长，不随审稿人加载；统计走 guest_reviewer_stats 或聚合查询
+    review_records = relationship("GuestReviewRecord", back_populates="reviewer", lazy="raise")
 
 
 class GuestReviewRecord(Base):
@@ -118,3 +121,169 @@ class GuestReviewRecord(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
     reviewer = relationship("GuestReviewer", back_populates="review_records")
+
+
+class ReviewJob(Base):
+    """持久化后台任务（审稿流程、校准测试），支持租约、心跳和重启恢复。"""
+    __tablename__ = "review_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)  # review / calibration
+    target_id = Column(Integer, nullable=False)  # review → paper_id, calibration → guest_reviewer_id
+    status = Column(String(20), default="pending")  # pending/running/done/failed
+    attempts = Column(Integer, default=0)
+    lease_owner = Column(String(200), default="")
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, default="")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ReviewCacheEntry(Base):
+    """审稿结果缓存 — 相同稿件 + 相同审稿人/模型/prompt 时复用历史结果。"""
+    __tablename__ = "review_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), nullable=False, unique=True, index=True)
+    reviewer_name = Column(String(100), default="")
+    model_name = Column(String(200), default="")
+    result_json = Column(Text, default="{}")
+    raw_response = Column(Text, default="")
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, nullable=True)
+
+
+class CalibrationResult(Base):
+    """校准结果缓存 — 相同配置（模式、后端模型或端点+模型、personality、prompt 版本）在有效期内复用上次通过的结论（只缓存通过）。"""
+    __tablename__ = "calibration_results"
+
+    fingerprint = Column(String(64), primary_key=True)
+    passed = Column(Integer, default=0)
+    error = Column(Text, default="")
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PipelineRun(Base):
+    """一次审稿流程的各阶段耗时记录（秒，JSON），用于度量流程延迟。"""
+    __tablename__ = "pipeline_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    paper_id = Column(Integer, ForeignKey("papers.id"), nullable=False, index=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    timings = Column(Text, default="{}")
+
+
+class PaperExtraction(Base):
+    """稿件文本提取记录（审稿任务的第一步）：耗时与页数。"""
+    __tablename__ = "paper_extractions"
+
+    paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
+    pages = Column(Integer, default=0)  # 非 PDF 为 0
+    duration = Column(Float, default=0.0)  # 秒
+    chars = Column(Integer, default=0)
+    error = Column(Text, default="")
+    extracted_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LLMCallMetric(Base):
+    """单次模型调用的延迟指标（排队 / 首 token / 生成速度），按审稿人记录。"""
+    __tablename__ = "llm_call_metrics"
+
+    id = Column(Integer, primary_key=True, index=True)
+    paper_id = Column(Integer, ForeignKey("papers.id"), nullable=True, index=True)
+    reviewer_name = Column(String(200), nullable=False)
+    model_name = Column(String(100), default="")
+    streamed = Column(Integer, default=0)  # 1 = 流式调用
+    queue_wait = Column(Float, default=0.0)
+    ttft = Column(Float, nullable=True)
+    duration = Column(Float, default=0.0)
+    prompt_tokens = Column(Integer, default=0)
+    cached_tokens = Column(Integer, default=0)  # provider 前缀缓存命中的 prompt token 数
+    completion_tokens = Column(Integer, default=0)
+    tokens_per_sec = Column(Float, default=0.0)
+    retries = Column(Integer, default=0)
+    abort_reason = Column(String(200), default="")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GuestReviewerStats(Base):
+    """社区审稿人聚合统计（响应延迟、审稿数与评分），由审稿流程增量维护，排行榜直接按这里的列排序。"""
+    __tablename__ = "guest_reviewer_stats"
+
+    guest_reviewer_id = Column(Integer, ForeignKey("guest_reviewers.id"), primary_key=True)
+    latency_ewma = Column(Float, default=0.0)  # 审稿耗时的指数滑动平均（秒）
+    late_reviews = Column(Integer, default=0)  # 主编决定后才完成的审稿次数
+
+    # 排行榜（见 reviewer_stats_service）
+    review_count = Column(Integer, default=0)  # GuestReviewRecord 条数（含失败）
+    valid_count = Column(Integer, default=0)  # 格式合格的条数
+    scored_reviews = Column(Integer, default=0)  # 已保存的审稿意见条数（评分平均值的分母）
+    novelty_sum = Column(Integer, default=0)
+    soundness_sum = Column(Integer, default=0)
+    writing_sum = Column(Integer, default=0)
+    avg_novelty = Column(Float, default=0.0)
+    avg_soundness = Column(Float, default=0.0)
+    avg_writing = Column(Float, default=0.0)
+    avg_overall = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ReviewerKeyword(Base):
+    """社区审稿人专长关键词的倒排索引（规范化后的关键词 → 审稿人），注册或修改专长时维护。"""
+    __tablename__ = "reviewer_keywords"
+
+    keyword = Column(String(100), primary_key=True)
+    guest_reviewer_id = Column(Integer, ForeignKey("guest_reviewers.id"), primary_key=True)
+
+
+class PaperKeyword(Base):
+    """论文关键词的倒排索引（规范化后的关键词 → 论文），投稿时写入；带上投稿时间，按关键词过滤的列表页直接在索引上分页。"""
+    __tablename__ = "paper_keywords"
+
+    keyword = Column(String(100), primary_key=True)
+    paper_id = Column(Integer, ForeignKey("papers.id"), primary_key=True)
+    submitted_at = Column(DateTime, nullable=False)  # 与 papers.submitted_at 相同（投稿后不再变化）
+
+
+class GuestReviewerDailyLoad(Base):
+    """社区审稿人每天的审稿数，分配时按最近 30 天的桶求和作为负载（写审稿记录时 +1，过期的桶随写入清理）。"""
+    __tablename__ = "guest_reviewer_daily_loads"
+
+    guest_reviewer_id = Column(Integer, ForeignKey("guest_reviewers.id"), primary_key=True)
+    day = Column(String(10), primary_key=True)  # YYYY-MM-DD（UTC）
+    reviews = Column(Integer, default=0)
+
+
+class RateLimitCounter(Base):
+    """频率限制的滑动窗口计数（规则 + 键 → 当前与上一个固定窗口的计数），进程内计数的持久化副本，启动时载入。"""
+    __tablename__ = "rate_limit_counters"
+
+    rule = Column(String(30), primary_key=True)  # 如 "submit_email_day"
+    key = Column(String(200), primary_key=True)  # email / 客户端 IP / 审稿人 id
+    window = Column(Integer, default=0)  # 当前窗口序号（epoch 秒 // 窗口长度）
+    current = Column(Integer, default=0)
+    previous = Column(Integer, default=0)
+
+
+class DashboardCounter(Base):
+    """统计面板计数器（各状态论文数、审稿总数、按日/按月投稿数等），由投稿和审稿流程增量维护。"""
+    __tablename__ = "dashboard_counters"
+
+    name = Column(String(100), primary_key=True)  # 如 "status:accepted"、"submissions:2026-03-14"
+    value = Column(Integer, default=0)
+
+
+class ReviewerScoreStats(Base):
+    """各审稿人（按显示名）的审稿数与评分总和，统计面板据此计算平均分。"""
+    __tablename__ = "reviewer_score_stats"
+
+    reviewer_name = Column(String(100), primary_key=True)
+    reviews = Column(Integer, default=0)
+    novelty_sum = Column(Integer, default=0)
+    soundness_sum = Column(Integer, default=0)
+    writing_sum = Column(Integer, default=0)
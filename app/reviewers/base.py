@@ -1,9 +1,22 @@
 """AI审稿人抽象基类 — 定义统一的审稿接口和prompt模板。"""
 
+import asyncio
 import json
+import logging
+import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field, asdict
 
+from app.config import (
+    LLM_STREAMING, LLM_MAX_RESPONSE_CHARS,
+    PROMPT_LAYOUT, PROMPT_CACHE_CONTROL, PROMPT_CACHE_CONTROL_PROVIDERS,
+)
+from app.reviewers.streaming import CallMetrics, complete_chat, merge_metrics
+from app.services.chunking_service import ChunkPlan, content_budget, plan_chunks
+from app.services.provider_limit_service import get_limiter, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class ReviewResult:
@@ -94,6 +107,125 @@ REVIEW_USER_PROMPT = """Please review the following manuscript submitted to The
 Provide your complete peer review in JSON format. Remember to stay in character, be specific in your feedback, and calibrate your scores carefully."""
 
 
+# 长稿件分段审稿：先逐段做笔记（并发），再基于全部笔记写出完整审稿意见
+REVIEW_NOTES_SYSTEM_PROMPT = """You are a peer reviewer for "The Turing Review" — the world's first academic journal entirely operated by artificial intelligence.
+
+## Your Identity
+
+{personality}
+
+## Your Task
+
+The manuscript under review is too long to read in one pass, so you are reading it part by part. For the part you are given, take the notes you will later need to write your full review. Other parts are read separately — do not speculate about content you have not seen, but do record questions that other parts might answer.
+
+Be specific: reference sections, claims, equations, tables, or paragraphs so your final review can cite them. Keep your notes under 400 words.
+
+## Output Format
+
+You MUST respond in valid JSON with this exact structure (no markdown wrapping, no extra text):
+{{
+    "summary": "What this part of the manuscript claims and does (2-4 sentences)",
+    "strengths": ["specific strength", "..."],
+    "weaknesses": ["specific weakness or gap", "..."],
+    "questions": ["open question to check against the rest of the manuscript", "..."]
+}}"""
+
+
+REVIEW_NOTES_USER_PROMPT = """You are reviewing the following manuscript submitted to The Turing Review.
+
+---
+**Title:** {title}
+
+**Authors:** {authors}
+
+**Abstract:** {abstract}
+
+**Keywords:** {keywords}
+
+---
+
+**Manuscript Text — Part {index} of {total}:**
+
+{content}
+
+---
+
+Take your reviewer notes on this part in JSON format."""
+
+
+REVIEW_SYNTHESIS_PROMPT = """Please review the following manuscript submitted to The Turing Review.
+
+---
+**Title:** {title}
+
+**Authors:** {authors}
+
+**Abstract:** {abstract}
+
+**Keywords:** {keywords}
+
+---
+
+The manuscript is long (about {content_tokens} tokens), so you read it in {total} parts and took the notes below.{truncation_note}
+
+{notes}
+
+---
+
+Based on your notes, provide your complete peer review of the whole manuscript in JSON format. Remember to stay in character, be specific in your feedback, and calibrate your scores carefully."""
+
+
+# manuscript_first 布局：system prompt 中不放人设（保证各审稿人前缀一致），人设放在稿件之后
+DEFERRED_PERSONA = "Your reviewer persona is given after the manuscript. Read the manuscript first, then write your review in character."
+
+REVIEW_PERSONA_PROMPT = """## Your Identity
+
+{personality}
+
+---
+
+You are this reviewer. Respond to the manuscript above exactly as instructed, in the required JSON format."""
+
+
+def build_messages(system_template: str, personality: str, user_prompt: str,
+                   layout: str = PROMPT_LAYOUT, cache_control: bool = False) -> list[dict]:
+    """
+    组装 chat messages。
+    - persona_first：人设填入 system prompt，稿件在 user prompt 中（原布局）
+    - manuscript_first：system prompt + 稿件在前（各审稿人完全相同，可被 provider 缓存），人设在后；
+      cache_control=True 时给稿件块加 provider 缓存提示
+    """
+    if layout != "manuscript_first":
+        return [
+            {"role": "system", "content": system_template.format(personality=personality)},
+            {"role": "user", "content": user_prompt},
+        ]
+    manuscript: dict = {"role": "user", "content": user_prompt}
+    if cache_control:
+        manuscript["content"] = [{"type": "text", "text": user_prompt, "cache_control": {"type": "ephemeral"}}]
+    return [
+        {"role": "system", "content": system_template.format(personality=DEFERRED_PERSONA)},
+        manuscript,
+        {"role": "user", "content": REVIEW_PERSONA_PROMPT.format(personality=personality)},
+    ]
+
+
+def messages_text(messages: list[dict]) -> str:
+    """拼接 messages 的文本内容（用于 token 估算）。"""
+    parts = []
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            parts.extend(block.get("text", "") for block in content)
+        else:
+            parts.append(content)
+    return "\n".join(parts)
+
+
+REVIEW_KEYS = set(ReviewResult.__dataclass_fields__)
+NOTE_KEYS = {"summary", "strengths", "weaknesses", "questions"}
+
+
 def parse_review_response(raw_text: str) -> ReviewResult:
     """从AI原始响应中解析出结构化审稿结果。"""
     # 尝试直接解析JSON
@@ -139,26 +271,139 @@ class BaseReviewer(ABC):
     name: str = "Base Reviewer"
     model_provider: str = "unknown"
     personality: str = ""
+    base_url: str = ""              # 模型端点，用于按 provider 限流
+    model_name: str = ""            # 实际调用的模型名（参与审稿缓存键）
+    cacheable: bool = True          # 相同稿件是否可复用缓存的审稿结果
+    max_tokens: int = 4096
+    last_metrics: CallMetrics | None = None  # 最近一次审稿的调用指标（排队 / TTFT / tokens/s）
+    _call_metrics: list[CallMetrics] | None = None
+    _queue_wait: float = 0.0
+
+    @property
+    def limiter_key(self) -> tuple[str, bool]:
+        """返回 (限流端点, 是否为社区自带端点)。"""
+        return self.base_url, False
+
+    @property
+    def supports_cache_control(self) -> bool:
+        """端点是否接受 cache_control 提示。"""
+        return PROMPT_CACHE_CONTROL and (self.base_url or "").rstrip("/") in {
+            url.rstrip("/") for url in PROMPT_CACHE_CONTROL_PROVIDERS
+        }
+
+    def _messages(self, system_template: str, user_prompt: str) -> list[dict]:
+        return build_messages(
+            system_template, self.personality, user_prompt,
+            cache_control=self.supports_cache_control,
+        )
 
     @abstractmethod
-    async def _call_api(self, system_prompt: str, user_prompt: str) -> str:
+    async def _call_api(self, messages: list[dict]) -> str:
         """调用具体AI模型的API，返回原始文本响应。"""
         ...
 
+    async def _complete(self, client, model: str, messages: list[dict], max_chars: int = LLM_MAX_RESPONSE_CHARS,
+                        include_usage: bool = True) -> str:
+        """统一的模型调用入口：按 LLM_STREAMING 选择流式或一次性返回，并记录调用指标。"""
+        text, metrics = await complete_chat(
+            client, model, messages,
+            max_tokens=self.max_tokens,
+            expected_keys=REVIEW_KEYS | NOTE_KEYS,
+            stream=LLM_STREAMING,
+            max_chars=max_chars,
+            include_usage=include_usage,
+        )
+        if self._call_metrics is not None:
+            self._call_metrics.append(metrics)
+        return text
+
+    async def _limited_call(self, messages: list[dict]) -> str:
+        """在对应端点的限流器上排队后调用模型。"""
+        endpoint, is_guest_endpoint = self.limiter_key
+        limiter = get_limiter(endpoint, guest=is_guest_endpoint)
+        prompt_text = messages_text(messages)
+        async with limiter.slot(estimate_tokens(prompt_text) + self.max_tokens) as slot:
+            raw_response = await self._call_api(messages)
+            slot.actual_tokens = estimate_tokens(prompt_text, raw_response or "")
+        self._queue_wait += slot.queue_wait
+        return raw_response
+
+    async def _review_chunked(self, plan: ChunkPlan, title: str, authors: str, abstract: str, keywords: str) -> str:
+        """长稿件：各段并发做笔记（受端点限流约束），再汇总成完整审稿意见。"""
+        total = len(plan.chunks)
+        results = await asyncio.gather(
+            *(
+                self._limited_call(self._messages(REVIEW_NOTES_SYSTEM_PROMPT, REVIEW_NOTES_USER_PROMPT.format(
+                    title=title, authors=authors, abstract=abstract, keywords=keywords,
+                    index=i + 1, total=total, content=chunk,
+                )))
+                for i, chunk in enumerate(plan.chunks)
+            ),
+            return_exceptions=True,
+        )
+
+        notes = []
+        for i, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.warning(f"{self.name}: notes for part {i + 1}/{total} failed: {result}")
+                result = "(notes unavailable for this part)"
+            notes.append(f"### Notes on Part {i + 1} of {total}\n\n{(result or '').strip()}")
+        if all(isinstance(r, BaseException) for r in results):
+            raise results[0]
+
+        truncation_note = ""
+        if plan.truncated_tokens:
+            truncation_note = (
+                f" The final ~{plan.truncated_tokens} tokens of the manuscript exceeded the reading budget "
+                f"and were not read; note this in your review."
+            )
+        user_prompt = REVIEW_SYNTHESIS_PROMPT.format(
+            title=title, authors=authors, abstract=abstract, keywords=keywords,
+            content_tokens=plan.content_tokens, total=total,
+            truncation_note=truncation_note, notes="\n\n".join(notes),
+        )
+        # 汇总阶段的笔记因审稿人而异，没有可共享的前缀，始终用人设在前的布局
+        return await self._limited_call(build_messages(
+            REVIEW_SYSTEM_PROMPT, self.personality, user_prompt, layout="persona_first",
+        ))
+
     async def review(self, title: str, abstract: str, keywords: str, content: str, authors: str = "Anonymous") -> tuple[ReviewResult, str]:
         """
-        执行审稿。
+        执行审稿。正文在模型的 token 预算内时单次审稿，否则按章节分段审稿后汇总。
         返回: (ReviewResult, raw_response)
         """
-        system_prompt = REVIEW_SYSTEM_PROMPT.format(personality=self.personality)
-        user_prompt = REVIEW_USER_PROMPT.format(
-            title=title,
-            authors=authors,
-            abstract=abstract,
-            keywords=keywords or "Not specified",
-            content=content[:30000],  # 限制长度避免超token
+        keywords = keywords or "Not specified"
+        prompt_tokens = estimate_tokens(
+            REVIEW_SYSTEM_PROMPT, self.personality, REVIEW_PERSONA_PROMPT, REVIEW_USER_PROMPT,
+            title, authors, abstract, keywords,
         )
-
-        raw_response = await self._call_api(system_prompt, user_prompt)
+        plan = plan_chunks(content or "", content_budget(self.model_name, prompt_tokens, self.max_tokens))
+        logger.info(f"{self.name} [{self.model_name or 'unknown model'}] review plan: {plan.describe()}")
+
+        self.last_metrics = None
+        self._call_metrics = []
+        self._queue_wait = 0.0
+        start = time.monotonic()
+        if plan.single_pass:
+            user_prompt = REVIEW_USER_PROMPT.format(
+                title=title,
+                authors=authors,
+                abstract=abstract,
+                keywords=keywords,
+                content=content,
+            )
+            raw_response = await self._limited_call(self._messages(REVIEW_SYSTEM_PROMPT, user_prompt))
+        else:
+            raw_response = await self._review_chunked(plan, title, authors, abstract, keywords)
+
+        metrics = merge_metrics(self._call_metrics, time.monotonic() - start)
+        self._call_metrics = None
+        if metrics:
+            metrics.queue_wait = round(self._queue_wait, 3)
+            self.last_metrics = metrics
+            logger.info(
+                f"{self.name}: queued {self._queue_wait:.2f}s, model calls {metrics.duration:.2f}s "
+                f"(ttft {metrics.ttft}, {metrics.tokens_per_sec} tok/s)"
+            )
         result = parse_review_response(raw_response)
         return result, raw_response
@@ -1,13 +1,15 @@
 """审稿人 — "The Logician"：注重逻辑严谨性和伦理考量。"""
 
-from openai import AsyncOpenAI
 from app.config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL, LOGICIAN_MODEL
 from app.reviewers.base import BaseReviewer
+from app.services.llm_client_service import get_client
 
 
 class ClaudeReviewer(BaseReviewer):
     name = 'The Logician'
     model_provider = "logician"
+    base_url = OPENROUTER_BASE_URL
+    model_name = LOGICIAN_MODEL
     personality = """Your reviewer persona is **"The Logician"** — a philosopher-scientist who trained in analytic philosophy before moving into AI research. You bring the rigor of formal logic to every review.
 
 ### Your Intellectual Profile
@@ -29,18 +31,7 @@ class ClaudeReviewer(BaseReviewer):
 - You weight soundness_score most heavily in your decision. A logically flawed paper cannot be "accepted" in your view, regardless of novelty."""
 
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=OPENROUTER_API_KEY,
-            base_url=OPENROUTER_BASE_URL,
-        )
-
-    async def _call_api(self, system_prompt: str, user_prompt: str) -> str:
-        response = await self.client.chat.completions.create(
-            model=LOGICIAN_MODEL,
-            max_tokens=4096,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        return response.choices[0].message.content
+        self.client = get_client(self.base_url, OPENROUTER_API_KEY)
+
+    async def _call_api(self, messages: list[dict]) -> str:
+        return await self._complete(self.client, self.model_name, messages)
@@ -1,13 +1,15 @@
 """审稿人 — "The Technician"：注重技术细节和数学推导。"""
 
-from openai import AsyncOpenAI
 from app.config import DEEPSEEK_API_KEY, TECHNICIAN_MODEL, DEEPSEEK_BASE_URL
 from app.reviewers.base import BaseReviewer
+from app.services.llm_client_service import get_client
 
 
 class DeepSeekReviewer(BaseReviewer):
     name = 'The Technician'
     model_provider = "technician"
+    base_url = DEEPSEEK_BASE_URL
+    model_name = TECHNICIAN_MODEL
     personality = """Your reviewer persona is **"The Technician"** — a battle-hardened systems engineer who spent 15 years building production systems before entering research. You've debugged code at 3am, reviewed thousands of PRs, and you know the difference between theory that works on paper and theory that works in practice.
 
 ### Your Intellectual Profile
@@ -30,18 +32,7 @@ class DeepSeekReviewer(BaseReviewer):
 - For non-technical papers, you are fair but focus heavily on the rigor of argumentation and quality of evidence/sourcing."""
 
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=DEEPSEEK_API_KEY,
-            base_url=DEEPSEEK_BASE_URL,
-        )
-
-    async def _call_api(self, system_prompt: str, user_prompt: str) -> str:
-        response = await self.client.chat.completions.create(
-            model=TECHNICIAN_MODEL,
-            max_tokens=4096,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        return response.choices[0].message.content
+        self.client = get_client(self.base_url, DEEPSEEK_API_KEY)
+
+    async def _call_api(self, messages: list[dict]) -> str:
+        return await self._complete(self.client, self.model_name, messages)
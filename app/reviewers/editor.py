@@ -1,9 +1,14 @@
 """AI主编 — 综合多位审稿人意见，做出最终编辑决定。"""
 
 import json
-import openai
-from app.config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL, EDITOR_MODEL
+import logging
+from app.config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL, EDITOR_MODEL, LLM_STREAMING, LLM_MAX_RESPONSE_CHARS
 from app.reviewers.base import ReviewResult
+from app.reviewers.streaming import CallMetrics, complete_chat
+from app.services.llm_client_service import get_client
+from app.services.provider_limit_service import get_limiter, estimate_tokens
+
+logger = logging.getLogger(__name__)
 
 
 EDITOR_SYSTEM_PROMPT = """You are the **Editor-in-Chief** of "The Turing Review" — the world's first academic journal entirely operated by artificial intelligence. Your name is **Turing** and you sign your letters as "Turing, Editor-in-Chief".
@@ -65,10 +70,8 @@ class AIEditor:
     """AI主编：综合审稿意见并做出最终决定。"""
 
     def __init__(self):
-        self.client = openai.AsyncOpenAI(
-            api_key=OPENROUTER_API_KEY,
-            base_url=OPENROUTER_BASE_URL,
-        )
+        self.client = get_client(OPENROUTER_BASE_URL, OPENROUTER_API_KEY)
+        self.last_metrics: CallMetrics | None = None
 
     async def make_decision(
         self,
@@ -108,15 +111,30 @@ Suggestions: {result.suggestions}
 
 Please provide your editorial decision and formal decision letter in JSON format."""
 
-        response = await self.client.chat.completions.create(
-            model=EDITOR_MODEL,
-            max_tokens=4096,
-            messages=[
-                {"role": "system", "content": EDITOR_SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
+        limiter = get_limiter(OPENROUTER_BASE_URL)
+        async with limiter.slot(estimate_tokens(EDITOR_SYSTEM_PROMPT, user_prompt) + 4096) as slot:
+            # 主编输出允许 JSON 前后有说明文字（下方有提取逻辑），流式校验只看键名和长度
+            raw, metrics = await complete_chat(
+                self.client,
+                EDITOR_MODEL,
+                [
+                    {"role": "system", "content": EDITOR_SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_tokens=4096,
+                expected_keys={"final_decision", "decision_letter"},
+                stream=LLM_STREAMING,
+                max_chars=LLM_MAX_RESPONSE_CHARS,
+                strict_start=False,
+            )
+            if metrics.prompt_tokens:
+                slot.actual_tokens = metrics.prompt_tokens + metrics.completion_tokens
+        metrics.queue_wait = round(slot.queue_wait, 3)
+        self.last_metrics = metrics
+        logger.info(
+            f"Editor queued {slot.queue_wait:.2f}s on {limiter.key}, "
+            f"model call {metrics.duration:.2f}s (ttft {metrics.ttft}, {metrics.tokens_per_sec} tok/s)"
         )
-        raw = response.choices[0].message.content
         try:
             text = raw.strip()
             # 去掉 markdown 代码块包装
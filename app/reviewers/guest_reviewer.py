@@ -1,17 +1,27 @@
 """社区审稿人运行器 — 支持 Prompt 模式和 API 模式。"""
 
 import asyncio
-from openai import AsyncOpenAI
+
+import openai
 
 from app.reviewers.base import BaseReviewer
+from app.services.llm_client_service import get_client, guest_client, ResponseRejected
 from app.config import (
     OPENROUTER_API_KEY, OPENROUTER_BASE_URL,
     DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL,
     LOGICIAN_MODEL, INNOVATOR_MODEL, TECHNICIAN_MODEL,
-    GUEST_API_TIMEOUT,
+    GUEST_API_TIMEOUT, GUEST_MAX_RESPONSE_CHARS,
 )
 
 
+# Prompt 模式可选的后端: backend_model → (base_url, api_key, model)
+PROMPT_BACKENDS = {
+    "claude": (OPENROUTER_BASE_URL, OPENROUTER_API_KEY, LOGICIAN_MODEL),
+    "openai": (OPENROUTER_BASE_URL, OPENROUTER_API_KEY, INNOVATOR_MODEL),
+    "deepseek": (DEEPSEEK_BASE_URL, DEEPSEEK_API_KEY, TECHNICIAN_MODEL),
+}
+
+
 class GuestReviewerRunner(BaseReviewer):
     """
     社区审稿人执行器。
@@ -42,57 +52,56 @@ class GuestReviewerRunner(BaseReviewer):
         self.api_key = api_key
         self.api_model_name = api_model_name
 
-    async def _call_api(self, system_prompt: str, user_prompt: str) -> str:
+        if mode == "prompt":
+            self.base_url, _, self.model_name = PROMPT_BACKENDS.get(backend_model, ("", "", ""))
+        else:
+            self.base_url, self.model_name = api_base_url, api_model_name
+        # 仅缓存跑在我们自己 API key 上的 Prompt 模式；API 模式每次都真实调用对方端点
+        self.cacheable = mode == "prompt"
+
+    @property
+    def limiter_key(self) -> tuple[str, bool]:
+        # API 模式按社区审稿人自己的端点单独限流
+        return self.base_url, self.mode != "prompt"
+
+    async def _call_api(self, messages: list[dict]) -> str:
         if self.mode == "prompt":
-            return await self._call_prompt_mode(system_prompt, user_prompt)
+            return await self._call_prompt_mode(messages)
         else:
-            return await self._call_api_mode(system_prompt, user_prompt)
+            return await self._call_api_mode(messages)
 
-    async def _call_prompt_mode(self, system_prompt: str, user_prompt: str) -> str:
+    async def _call_prompt_mode(self, messages: list[dict]) -> str:
         """使用我们的 API key，注入用户的 personality。"""
-        if self.backend_model == "claude":
-            client = AsyncOpenAI(api_key=OPENROUTER_API_KEY, base_url=OPENROUTER_BASE_URL)
-            model = LOGICIAN_MODEL
-        elif self.backend_model == "openai":
-            client = AsyncOpenAI(api_key=OPENROUTER_API_KEY, base_url=OPENROUTER_BASE_URL)
-            model = INNOVATOR_MODEL
-        elif self.backend_model == "deepseek":
-            client = AsyncOpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
-            model = TECHNICIAN_MODEL
-        else:
+        if self.backend_model not in PROMPT_BACKENDS:
             raise ValueError(f"Unknown backend model: {self.backend_model}")
+        base_url, api_key, model = PROMPT_BACKENDS[self.backend_model]
+        client = get_client(base_url, api_key)
 
-        response = await asyncio.wait_for(
-            client.chat.completions.create(
-                model=model,
-                max_tokens=4096,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-            ),
+        return await asyncio.wait_for(
+            self._complete(client, model, messages),
             timeout=GUEST_API_TIMEOUT,
         )
-        return response.choices[0].message.content
 
-    async def _call_api_mode(self, system_prompt: str, user_prompt: str) -> str:
+    async def _call_api_mode(self, messages: list[dict]) -> str:
         """调用用户提供的 OpenAI-compatible 端点。"""
-        client = AsyncOpenAI(
-            api_key=self.api_key,
-            base_url=self.api_base_url,
-        )
-        response = await asyncio.wait_for(
-            client.chat.completions.create(
-                model=self.api_model_name,
-                max_tokens=4096,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt},
-                ],
-            ),
-            timeout=GUEST_API_TIMEOUT,
-        )
-        return response.choices[0].message.content
+        # 不可信端点：限制响应大小（读取时按字节、解析后按字符），且不依赖 stream_options 等扩展参数
+        async with guest_client(self.api_base_url, self.api_key) as client:
+            try:
+                return await asyncio.wait_for(
+                    self._complete(
+                        client,
+                        self.api_model_name,
+                        messages,
+                        max_chars=GUEST_MAX_RESPONSE_CHARS,
+                        include_usage=False,
+                    ),
+                    timeout=GUEST_API_TIMEOUT,
+                )
+            except openai.APIConnectionError as e:
+                # SDK 把传输层的中止包装成连接错误，还原出真正的原因
+                if isinstance(e.__cause__, ResponseRejected):
+                    raise e.__cause__ from None
+                raise
 
 
 def build_guest_runner(gr) -> GuestReviewerRunner:
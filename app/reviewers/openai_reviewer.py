@@ -1,13 +1,15 @@
 """审稿人 — "The Innovator"：注重实用价值和创新性。"""
 
-from openai import AsyncOpenAI
 from app.config import OPENROUTER_API_KEY, OPENROUTER_BASE_URL, INNOVATOR_MODEL
 from app.reviewers.base import BaseReviewer
+from app.services.llm_client_service import get_client
 
 
 class OpenAIReviewer(BaseReviewer):
     name = 'The Innovator'
     model_provider = "innovator"
+    base_url = OPENROUTER_BASE_URL
+    model_name = INNOVATOR_MODEL
     personality = """Your reviewer persona is **"The Innovator"** — a visionary researcher who has spent a career at the intersection of academia and industry. You've founded two startups and hold a dozen patents. You live for breakthrough ideas.
 
 ### Your Intellectual Profile
@@ -29,18 +31,7 @@ class OpenAIReviewer(BaseReviewer):
 - However, you are NOT a pushover. Plagiarism, fabricated results, or complete lack of effort will get a firm rejection. You save your harshest words for wasted potential — smart authors doing lazy work."""
 
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=OPENROUTER_API_KEY,
-            base_url=OPENROUTER_BASE_URL,
-        )
-
-    async def _call_api(self, system_prompt: str, user_prompt: str) -> str:
-        response = await self.client.chat.completions.create(
-            model=INNOVATOR_MODEL,
-            max_tokens=4096,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        return response.choices[0].message.content
+        self.client = get_client(self.base_url, OPENROUTER_API_KEY)
+
+    async def _call_api(self, messages: list[dict]) -> str:
+        return await self._complete(self.client, self.model_name, messages)
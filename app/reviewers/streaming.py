@@ -0,0 +1,265 @@
+"""LLM 调用封装 — 可选流式输出，增量校验 JSON 结构，明显异常时提前中止并重试。
+
+流式模式下边接收边检查输出是否正在形成预期的 JSON 对象：
+- 开头是散文而不是 `{`（或 ```json 代码块）→ 立即中止
+- 第一个键不是预期字段 → 立即中止
+- 输出超过字符上限（失控输出 / 不可信端点）→ 立即中止
+- 顶层对象闭合后不再读取后续内容
+同时记录首 token 延迟（TTFT）和生成速度（tokens/s）。
+"""
+
+import logging
+import time
+from dataclasses import dataclass, asdict
+
+from app.config import LLM_STREAM_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+
+class StreamAborted(Exception):
+    """流式输出被判定为异常而提前中止。"""
+
+    def __init__(self, reason: str, partial: str = ""):
+        super().__init__(reason)
+        self.reason = reason
+        self.partial = partial
+
+
+@dataclass
+class CallMetrics:
+    """单次模型调用的耗时与用量。"""
+    streamed: bool = False
+    queue_wait: float = 0.0         # 限流器排队耗时（秒）
+    ttft: float | None = None       # 首 token 延迟（秒），仅流式
+    duration: float = 0.0           # 调用总耗时（秒，不含排队）
+    prompt_tokens: int = 0
+    cached_tokens: int = 0          # provider 前缀缓存命中的 prompt token 数
+    completion_tokens: int = 0
+    tokens_per_sec: float = 0.0
+    retries: int = 0
+    abort_reason: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def merge_metrics(calls: list[CallMetrics], duration: float) -> CallMetrics | None:
+    """合并一次审稿内的多次调用（长稿件分段审稿）：用量与重试累加，TTFT 取最早的一次。"""
+    if not calls:
+        return None
+    if len(calls) == 1:
+        return calls[0]
+    ttfts = [c.ttft for c in calls if c.ttft is not None]
+    completion = sum(c.completion_tokens for c in calls)
+    generation_time = sum(c.duration - (c.ttft or 0) for c in calls)
+    reasons = [c.abort_reason for c in calls if c.abort_reason]
+    return CallMetrics(
+        streamed=any(c.streamed for c in calls),
+        ttft=min(ttfts) if ttfts else None,
+        duration=round(duration, 3),
+        prompt_tokens=sum(c.prompt_tokens for c in calls),
+        cached_tokens=sum(c.cached_tokens for c in calls),
+        completion_tokens=completion,
+        tokens_per_sec=round(completion / generation_time, 1) if generation_time > 0 else 0.0,
+        retries=sum(c.retries for c in calls),
+        abort_reason="; ".join(dict.fromkeys(reasons)),
+    )
+
+
+class JSONStreamGuard:
+    """增量检查流式文本是否正在形成预期的 JSON 对象。"""
+
+    def __init__(self, expected_keys: set[str], max_chars: int, strict_start: bool = True, prefix_limit: int = 64):
+        self.expected_keys = expected_keys
+        self.max_chars = max_chars
+        self.strict_start = strict_start
+        self.prefix_limit = prefix_limit
+        self.parts: list[str] = []
+        self.length = 0
+        self.state = "prefix"       # prefix → object → done
+        self._prefix = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._first_key: list[str] | None = None
+        self._first_key_checked = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def _abort(self, reason: str):
+        raise StreamAborted(reason, self.text)
+
+    def feed(self, chunk: str) -> bool:
+        """喂入一段输出；返回 True 表示顶层对象已完整。"""
+        self.parts.append(chunk)
+        self.length += len(chunk)
+        if self.length > self.max_chars:
+            self._abort(f"response exceeded {self.max_chars} chars")
+        for i, ch in enumerate(chunk):
+            if self.state == "prefix":
+                self._step_prefix(ch)
+            else:
+                self._step_object(ch)
+            if self.state == "done":
+                # 丢弃对象闭合之后的多余输出（客套话 / 代码块结尾）
+                self.parts[-1] = chunk[:i + 1]
+                break
+        return self.state == "done"
+
+    def _step_prefix(self, ch: str):
+        self._prefix += ch
+        if not self.strict_start:
+            # 宽松模式（主编）：允许 JSON 前有说明文字
+            if ch == "{":
+                self._enter_object()
+            return
+
+        body = self._prefix.lstrip()
+        if len(body) > self.prefix_limit:
+            self._abort("no JSON object at start of response")
+        if body.startswith("```"):
+            # 允许 ```json 代码块包裹
+            if "\n" not in body:
+                return
+            rest = body.split("\n", 1)[1].lstrip()
+            if not rest:
+                return
+        elif body in ("", "`", "``"):
+            return
+        else:
+            rest = body
+        if rest == "{":
+            self._enter_object()
+        else:
+            self._abort("response is prose, not JSON")
+
+    def _enter_object(self):
+        self.state = "object"
+        self._depth = 1
+
+    def _step_object(self, ch: str):
+        if self._in_string:
+            if self._first_key is not None and not self._first_key_checked:
+                if self._escape or ch != '"':
+                    self._first_key.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._first_key is not None and not self._first_key_checked:
+                    self._first_key_checked = True
+                    key = "".join(self._first_key)
+                    if key not in self.expected_keys:
+                        self._abort(f"unexpected first key '{key[:50]}'")
+            return
+
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and self._first_key is None:
+                self._first_key = []
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self.state = "done"
+
+
+def _read_usage(metrics: CallMetrics, usage):
+    """读取 usage；缓存命中数兼容 OpenAI/OpenRouter（prompt_tokens_details.cached_tokens）和 DeepSeek（prompt_cache_hit_tokens）。"""
+    metrics.prompt_tokens = usage.prompt_tokens or 0
+    metrics.completion_tokens = usage.completion_tokens or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None) if details else None
+    if cached is None:
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    metrics.cached_tokens = cached or 0
+
+
+async def _consume_stream(client, model: str, messages: list[dict], max_tokens: int,
+                          guard: JSONStreamGuard, include_usage: bool, metrics: CallMetrics) -> str:
+    start = time.monotonic()
+    extra = {"stream_options": {"include_usage": True}} if include_usage else {}
+    stream = await client.chat.completions.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=messages,
+        stream=True,
+        **extra,
+    )
+    try:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                _read_usage(metrics, chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if not delta:
+                continue
+            if metrics.ttft is None:
+                metrics.ttft = round(time.monotonic() - start, 3)
+            if guard.feed(delta):
+                break  # 顶层 JSON 对象已完整，不再读取后续内容
+    finally:
+        await stream.close()
+    return guard.text
+
+
+async def complete_chat(
+    client,
+    model: str,
+    messages: list[dict],
+    *,
+    max_tokens: int,
+    expected_keys: set[str],
+    stream: bool,
+    max_chars: int,
+    strict_start: bool = True,
+    include_usage: bool = True,
+) -> tuple[str, CallMetrics]:
+    """
+    调用 chat completion，返回 (文本, 调用指标)。
+    stream=True 时边接收边校验，异常输出提前中止并最多重试 LLM_STREAM_MAX_RETRIES 次；
+    重试耗尽后返回已收到的部分文本，交由上层按解析失败处理。
+    """
+    metrics = CallMetrics(streamed=stream)
+    start = time.monotonic()
+
+    if not stream:
+        response = await client.chat.completions.create(
+            model=model,
+            max_tokens=max_tokens,
+            messages=messages,
+        )
+        text = response.choices[0].message.content or ""
+        if response.usage:
+            _read_usage(metrics, response.usage)
+        if len(text) > max_chars:
+            text = text[:max_chars]
+            metrics.abort_reason = f"response truncated to {max_chars} chars"
+    else:
+        text = ""
+        for attempt in range(LLM_STREAM_MAX_RETRIES + 1):
+            guard = JSONStreamGuard(expected_keys, max_chars, strict_start=strict_start)
+            metrics.ttft = None
+            metrics.retries = attempt
+            try:
+                text = await _consume_stream(client, model, messages, max_tokens, guard, include_usage, metrics)
+                break
+            except StreamAborted as e:
+                text = e.partial
+                metrics.abort_reason = e.reason
+                logger.warning(f"Stream from {model} aborted ({e.reason}), attempt {attempt + 1}")
+
+    metrics.duration = round(time.monotonic() - start, 3)
+    if not metrics.completion_tokens:
+        metrics.completion_tokens = len(text) // 4
+    generation_time = metrics.duration - (metrics.ttft or 0)
+    if generation_time > 0:
+        metrics.tokens_per_sec = round(metrics.completion_tokens / generation_time, 1)
+    return text, metrics
@@ -1,58 +1,41 @@
 """统计面板路由。"""
 
-from datetime import datetime
-
 from fastapi import APIRouter, Request, Depends
-from fastapi.templating import Jinja2Templates
-from sqlalchemy import select, func, distinct
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import Paper, Review
+from app.database import get_read_db
+from app.services.assignment_service import assignment_stats
+from app.services.blob_store_service import blob_store_stats
+from app.services.calibration_service import calibration_stats
+from app.services.dashboard_stats_service import get_dashboard_stats, dashboard_counter_stats
+from app.services.db_writer_service import db_writer_stats
+from app.services.http_cache_service import http_cache_stats
+from app.services.job_queue_service import job_queue_stats
+from app.services.llm_client_service import client_pool_stats
+from app.services.page_cache_service import page_cache_stats
+from app.services.provider_limit_service import limiter_stats
+from app.services.query_stats_service import query_stats
+from app.services.rate_limit_service import rate_limit_stats
+from app.services.review_cache_service import review_cache_stats
+from app.templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 ESTIMATED_COST_PER_PAPER = 0.21  # USD
 
 
 @router.get("/dashboard")
-async def dashboard(request: Request, db: AsyncSession = Depends(get_db)):
-    # 各状态论文数量
-    count_result = await db.execute(
-        select(Paper.status, func.count(Paper.id)).group_by(Paper.status)
-    )
-    status_counts = dict(count_result.all())
+async def dashboard(request: Request, db: AsyncSession = Depends(get_read_db)):
+    # 计数器由投稿和审稿流程增量维护（见 dashboard_stats_service），这里只读几行
+    data = await get_dashboard_stats(db)
+    status_counts = data["status_counts"]
 
     total = sum(status_counts.values())
     accepted = status_counts.get("accepted", 0)
     rejected = status_counts.get("rejected", 0)
     revision = status_counts.get("revision", 0)
     decided = accepted + rejected + revision
-
-    # 总审稿数
-    review_count_result = await db.execute(select(func.count(Review.id)))
-    total_reviews = review_count_result.scalar() or 0
-
-    # 成本统计
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-    today_submissions = await db.scalar(
-        select(func.count(Paper.id)).where(Paper.submitted_at >= today_start)
-    ) or 0
-
-    month_submissions = await db.scalar(
-        select(func.count(Paper.id)).where(Paper.submitted_at >= month_start)
-    ) or 0
-
-    active_users = await db.scalar(
-        select(func.count(distinct(Paper.email))).where(
-            Paper.submitted_at >= month_start,
-            Paper.email != "",
-        )
-    ) or 0
+    month_submissions = data["month_submissions"]
 
     stats = {
         "total": total,
@@ -63,41 +46,42 @@ async def dashboard(request: Request, db: AsyncSession = Depends(get_db)):
         "under_review": status_counts.get("under_review", 0),
         "decided": decided,
         "acceptance_rate": (accepted / decided * 100) if decided > 0 else 0,
-        "total_reviews": total_reviews,
-        "today_submissions": today_submissions,
+        "total_reviews": data["total_reviews"],
+        "today_submissions": data["today_submissions"],
         "month_submissions": month_submissions,
-        "active_users": active_users,
+        "active_users": data["active_users"],
         "est_cost_total": round(total * ESTIMATED_COST_PER_PAPER, 2),
         "est_cost_month": round(month_submissions * ESTIMATED_COST_PER_PAPER, 2),
     }
 
     # 各审稿人平均评分
-    reviewer_result = await db.execute(
-        select(
-            Review.reviewer_name,
-            func.count(Review.id).label("count"),
-            func.avg(Review.novelty_score).label("avg_novelty"),
-            func.avg(Review.soundness_score).label("avg_soundness"),
-            func.avg(Review.writing_score).label("avg_writing"),
-        ).group_by(Review.reviewer_name)
-    )
-
-    reviewer_stats = []
-    for row in reviewer_result.all():
-        avg_n = float(row.avg_novelty or 0)
-        avg_s = float(row.avg_soundness or 0)
-        avg_w = float(row.avg_writing or 0)
-        reviewer_stats.append({
-            "name": row.reviewer_name,
-            "count": row.count,
-            "avg_novelty": avg_n,
-            "avg_soundness": avg_s,
-            "avg_writing": avg_w,
-            "avg_overall": (avg_n + avg_s + avg_w) / 3,
-        })
+    reviewer_stats = [
+        {**row, "avg_overall": (row["avg_novelty"] + row["avg_soundness"] + row["avg_writing"]) / 3}
+        for row in data["reviewers"]
+    ]
 
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
         "stats": stats,
         "reviewer_stats": reviewer_stats,
     })
+
+
+@router.get("/dashboard/runtime")
+async def runtime_stats():
+    """运行时指标（JSON，公开；社区审稿人的端点地址只显示短 id）：LLM 限流排队、连接池状态、审稿缓存命中率、上传存储去重、单写队列、页面缓存、HTTP 缓存与压缩、面板计数器对账、各路由的查询数与加载对象数。"""
+    return {
+        "llm_limiters": limiter_stats(),
+        "llm_clients": client_pool_stats(),
+        "review_cache": review_cache_stats(),
+        "calibration": calibration_stats(),
+        "job_queue": job_queue_stats(),
+        "upload_store": blob_store_stats(),
+        "db_writer": db_writer_stats(),
+        "page_cache": page_cache_stats(),
+        "http_cache": http_cache_stats(),
+        "dashboard_stats": dashboard_counter_stats(),
+        "query_load": query_stats(),
+        "assignment_index": assignment_stats(),
+        "rate_limits": rate_limit_stats(),
+    }
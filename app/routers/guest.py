@@ -1,22 +1,23 @@
 """社区审稿人路由 — 注册、校准测试、个人主页、排行榜。"""
 
-import asyncio
 import logging
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import GuestReviewer, GuestReviewRecord, Review
+from app.database import get_db, get_read_db
+from app.models import GuestReviewer, GuestReviewRecord, GuestReviewerStats, Review
+from app.services.assignment_service import set_reviewer_keywords
 from app.services.crypto_service import encrypt_api_key
-from app.services.calibration_service import run_calibration_test
-from app.config import PROMPT_MODE_MONTHLY_QUOTA
+from app.services.job_queue_service import enqueue_job, active_job
+from app.services.rate_limit_service import REGISTER_IP_DAILY, CALIBRATE_DAILY, CALIBRATE_IP_DAILY, check_and_hit, client_ip
+from app.services.reviewer_stats_service import LEADERBOARD_SORTS, leaderboard_page
+from app.config import PROMPT_MODE_MONTHLY_QUOTA, LEADERBOARD_PAGE_SIZE
+from app.templating import templates
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 
 # ===== 注册 =====
@@ -41,6 +42,10 @@ async def register_reviewer(
     db: AsyncSession = Depends(get_db),
 ):
     """处理注册，创建记录，后台触发校准测试。"""
+    # 同一 IP 的注册次数限制（每次提交都计数，包括因重名失败的）
+    if error := await check_and_hit([(REGISTER_IP_DAILY, client_ip(request))]):
+        return templates.TemplateResponse("guest/register.html", {"request": request, "error": error})
+
     # 检查唯一性
     existing = await db.execute(
         select(GuestReviewer).where(
@@ -67,21 +72,13 @@ async def register_reviewer(
         level=0,
     )
     db.add(gr)
+    await db.flush()
+    await set_reviewer_keywords(db, gr.id, gr.expertise_areas)  # 分配匹配用的规范化专长关键词
     await db.commit()
     await db.refresh(gr)
 
-    # 后台触发校准测试
-    async def _bg_calibrate(reviewer_id: int):
-        from app.database import async_session
-        async with async_session() as session:
-            result = await session.execute(
-                select(GuestReviewer).where(GuestReviewer.id == reviewer_id)
-            )
-            reviewer = result.scalars().first()
-            if reviewer:
-                await run_calibration_test(reviewer, session)
-
-    asyncio.create_task(_bg_calibrate(gr.id))
+    # 后台触发校准测试（经由任务队列）
+    await enqueue_job(db, "calibration", gr.id)
 
     return RedirectResponse(f"/reviewer/{gr.id}?calibrating=1", status_code=303)
 
@@ -90,6 +87,7 @@ async def register_reviewer(
 
 @router.post("/reviewer/{reviewer_id}/calibrate")
 async def recalibrate(
+    request: Request,
     reviewer_id: int,
     db: AsyncSession = Depends(get_db),
 ):
@@ -100,17 +98,15 @@ async def recalibrate(
     if not gr:
         return RedirectResponse("/reviewers", status_code=303)
 
-    async def _bg_calibrate(rid: int):
-        from app.database import async_session
-        async with async_session() as session:
-            res = await session.execute(
-                select(GuestReviewer).where(GuestReviewer.id == rid)
-            )
-            reviewer = res.scalars().first()
-            if reviewer:
-                await run_calibration_test(reviewer, session)
+    # 已有待执行/运行中的校准时并入该任务，不重复运行，也不计入次数限制
+    if await active_job(db, "calibration", gr.id):
+        return RedirectResponse(f"/reviewer/{reviewer_id}?calibrating=1", status_code=303)
 
-    asyncio.create_task(_bg_calibrate(gr.id))
+    # 每位审稿人与同一 IP 的重新校准次数限制（每次校准都是一次完整的 LLM 审稿）
+    if await check_and_hit([(CALIBRATE_DAILY, str(gr.id)), (CALIBRATE_IP_DAILY, client_ip(request))]):
+        return RedirectResponse(f"/reviewer/{reviewer_id}?throttled=1", status_code=303)
+
+    await enqueue_job(db, "calibration", gr.id)
     return RedirectResponse(f"/reviewer/{reviewer_id}?calibrating=1", status_code=303)
 
 
@@ -121,7 +117,8 @@ async def reviewer_profile(
     request: Request,
     reviewer_id: int,
     calibrating: int = 0,
-    db: AsyncSession = Depends(get_db),
+    throttled: int = 0,
+    db: AsyncSession = Depends(get_read_db),
 ):
     result = await db.execute(
         select(GuestReviewer).where(GuestReviewer.id == reviewer_id)
@@ -130,36 +127,40 @@ async def reviewer_profile(
     if not gr:
         return RedirectResponse("/reviewers", status_code=303)
 
-    # 统计
-    records_result = await db.execute(
-        select(GuestReviewRecord).where(GuestReviewRecord.guest_reviewer_id == reviewer_id)
-    )
-    records = list(records_result.scalars().all())
+    # 计数由审稿流程维护（guest_reviewer_stats），不加载审稿记录
+    counters = await db.get(GuestReviewerStats, reviewer_id)
 
-    # 获取审稿详情（用于计算平均分和审稿历史）
+    # 最近的审稿（只取页面展示的列），平均分按这些审稿计算
     reviews_result = await db.execute(
-        select(Review).where(
+        select(
+            Review.paper_id, Review.decision, Review.novelty_score, Review.soundness_score,
+            Review.writing_score, Review.reviewed_at,
+        ).where(
             Review.guest_reviewer_id == reviewer_id,
             Review.is_guest == 1,
         ).order_by(Review.reviewed_at.desc()).limit(20)
     )
-    reviews = list(reviews_result.scalars().all())
+    reviews = reviews_result.all()
 
     # 计算统计
-    total_reviews = len(records)
-    valid_reviews = sum(1 for r in records if r.format_valid)
+    total_reviews = counters.review_count if counters else 0
+    valid_reviews = counters.valid_count if counters else 0
     avg_novelty = sum(r.novelty_score for r in reviews) / len(reviews) if reviews else 0
     avg_soundness = sum(r.soundness_score for r in reviews) / len(reviews) if reviews else 0
     avg_writing = sum(r.writing_score for r in reviews) / len(reviews) if reviews else 0
 
-    # Prompt 模式月度限额统计
+    # Prompt 模式月度限额统计（近 30 天的审稿数，走 ix_guest_review_records_reviewer）
     monthly_used = 0
     monthly_quota = None
     if gr.mode == "prompt":
         from datetime import datetime, timedelta
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        recent_records = [r for r in records if r.created_at and r.created_at >= thirty_days_ago]
-        monthly_used = len(recent_records)
+        monthly_used = await db.scalar(
+            select(func.count(GuestReviewRecord.id)).where(
+                GuestReviewRecord.guest_reviewer_id == reviewer_id,
+                GuestReviewRecord.created_at >= thirty_days_ago,
+            )
+        ) or 0
         monthly_quota = PROMPT_MODE_MONTHLY_QUOTA
 
     stats = {
@@ -178,6 +179,7 @@ async def reviewer_profile(
         "stats": stats,
         "reviews": reviews,
         "calibrating": calibrating,
+        "throttled": throttled,
     })
 
 
@@ -187,61 +189,34 @@ async def reviewer_profile(
 async def reviewer_leaderboard(
     request: Request,
     sort: str = "reviews",
-    db: AsyncSession = Depends(get_db),
+    page: int = 1,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    # 查询所有社区审稿人
-    result = await db.execute(
-        select(GuestReviewer).where(GuestReviewer.level >= 1).order_by(GuestReviewer.level.desc())
-    )
-    reviewers = list(result.scalars().all())
+    # 统计值由审稿流程增量维护（见 reviewer_stats_service），一次查询取一页
+    if sort not in LEADERBOARD_SORTS:
+        sort = "reviews"
+    page = max(1, page)
+    result = await leaderboard_page(db, sort, page, LEADERBOARD_PAGE_SIZE)
 
-    # 统计每位审稿人的数据
     leaderboard = []
-    for gr in reviewers:
-        # 审稿数
-        count_result = await db.execute(
-            select(func.count(GuestReviewRecord.id)).where(
-                GuestReviewRecord.guest_reviewer_id == gr.id
-            )
-        )
-        review_count = count_result.scalar() or 0
-
-        # 平均分
-        avg_result = await db.execute(
-            select(
-                func.avg(Review.novelty_score),
-                func.avg(Review.soundness_score),
-                func.avg(Review.writing_score),
-            ).where(Review.guest_reviewer_id == gr.id, Review.is_guest == 1)
-        )
-        row = avg_result.first()
-        avg_novelty = round(row[0] or 0, 1)
-        avg_soundness = round(row[1] or 0, 1)
-        avg_writing = round(row[2] or 0, 1)
-        avg_overall = round((avg_novelty + avg_soundness + avg_writing) / 3, 1) if review_count > 0 else 0
-
+    for row in result.entries:
+        avg_novelty = round(row.avg_novelty or 0, 1)
+        avg_soundness = round(row.avg_soundness or 0, 1)
+        avg_writing = round(row.avg_writing or 0, 1)
         leaderboard.append({
-            "reviewer": gr,
-            "review_count": review_count,
+            "reviewer": row,
+            "review_count": row.review_count or 0,
             "avg_novelty": avg_novelty,
             "avg_soundness": avg_soundness,
             "avg_writing": avg_writing,
-            "avg_overall": avg_overall,
+            "avg_overall": round(row.avg_overall or 0, 1),
         })
 
-    # 排序
-    sort_keys = {
-        "reviews": lambda x: -x["review_count"],
-        "novelty": lambda x: -x["avg_novelty"],
-        "soundness": lambda x: -x["avg_soundness"],
-        "writing": lambda x: -x["avg_writing"],
-        "overall": lambda x: -x["avg_overall"],
-        "level": lambda x: -x["reviewer"].level,
-    }
-    leaderboard.sort(key=sort_keys.get(sort, sort_keys["reviews"]))
-
     return templates.TemplateResponse("guest/leaderboard.html", {
         "request": request,
         "leaderboard": leaderboard,
         "current_sort": sort,
+        "page": page,
+        "rank_offset": (page - 1) * LEADERBOARD_PAGE_SIZE,
+        "has_next": result.has_next,
     })
@@ -2,53 +2,94 @@
 
 import json
 from collections import OrderedDict
+from urllib.parse import urlencode
 from fastapi import APIRouter, Request, Depends
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
-from app.models import Paper, Review
+from app.config import PAPERS_PAGE_SIZE
+from app.database import get_read_db
+from app.models import Paper, PaperKeyword
+from app.services.dashboard_stats_service import status_counts as load_status_counts, published_issue_counts
+from app.services.http_cache_service import not_modified, with_validators
+from app.services.page_cache_service import page_cache, paper_page_key
+from app.services.paper_query_service import (
+    paper_summaries, get_paper_with_reviews, paginate, page_size, with_keyword, PUBLISHED_SORT_KEY,
+    papers_validators, paper_validators,
+)
+from app.templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/paper/{paper_id}")
-async def paper_detail(request: Request, paper_id: int, db: AsyncSession = Depends(get_db)):
-    paper = await db.get(Paper, paper_id)
-    if not paper:
+async def paper_detail(request: Request, paper_id: int, db: AsyncSession = Depends(get_read_db)):
+    validators = await paper_validators(db, paper_id)
+    if response := not_modified(request, validators):
+        return response
+
+    # 已有主编决定的论文页面按数据版本（ETag）缓存渲染结果（见 page_cache_service）
+    async def render() -> tuple[str, bool]:
+        paper = await get_paper_with_reviews(db, paper_id)
+        if not paper:
+            return "", False
+
+        # 解析审稿意见中的JSON列表字段
+        for review in paper.reviews:
+            try:
+                review.strengths_list = json.loads(review.strengths) if review.strengths else []
+            except json.JSONDecodeError:
+                review.strengths_list = [review.strengths] if review.strengths else []
+            try:
+                review.weaknesses_list = json.loads(review.weaknesses) if review.weaknesses else []
+            except json.JSONDecodeError:
+                review.weaknesses_list = [review.weaknesses] if review.weaknesses else []
+
+        html = templates.get_template("paper_detail.html").render({"request": request, "paper": paper})
+        return html, paper.editorial_decision is not None
+
+    if validators is None:
         return HTMLResponse("<h1>Paper not found</h1>", status_code=404)
+    page = await page_cache.get_or_render(paper_page_key(paper_id), validators.etag, render)
+    if not page:
+        return HTMLResponse("<h1>Paper not found</h1>", status_code=404)
+    return with_validators(HTMLResponse(page), validators)
 
-    # 解析审稿意见中的JSON列表字段
-    for review in paper.reviews:
-        try:
-            review.strengths_list = json.loads(review.strengths) if review.strengths else []
-        except json.JSONDecodeError:
-            review.strengths_list = [review.strengths] if review.strengths else []
-        try:
-            review.weaknesses_list = json.loads(review.weaknesses) if review.weaknesses else []
-        except json.JSONDecodeError:
-            review.weaknesses_list = [review.weaknesses] if review.weaknesses else []
 
-    return templates.TemplateResponse("paper_detail.html", {"request": request, "paper": paper})
+def _page_url(path: str, **params) -> str:
+    """生成带过滤/分页参数的链接，空值参数省略。"""
+    query = urlencode({k: v for k, v in params.items() if v})
+    return f"{path}?{query}" if query else path
 
 
 @router.get("/papers")
-async def paper_list(request: Request, status: str = None, db: AsyncSession = Depends(get_db)):
-    # 查询论文
-    query = select(Paper).order_by(Paper.submitted_at.desc())
+async def paper_list(
+    request: Request,
+    status: str = None,
+    keyword: str = None,
+    cursor: str = None,
+    per_page: int = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    validators = await papers_validators(db)
+    if response := not_modified(request, validators):
+        return response
+
+    # 查询论文（只取列表展示的列，按游标分页）
+    per_page = page_size(per_page)
+    keyword = (keyword or "").strip()
+    query = paper_summaries()
     if status:
         query = query.where(Paper.status == status)
-    result = await db.execute(query)
-    papers = result.scalars().all()
+    if keyword:
+        # 关键词走 paper_keywords 倒排索引，在 (keyword, submitted_at, paper_id) 索引上分页
+        query = with_keyword(query, keyword)
+        page = await paginate(db, query, PaperKeyword.submitted_at, cursor, per_page, id_key=PaperKeyword.paper_id)
+    else:
+        page = await paginate(db, query, Paper.submitted_at, cursor, per_page)
 
-    # 统计各状态数量
-    count_result = await db.execute(
-        select(Paper.status, func.count(Paper.id)).group_by(Paper.status)
-    )
-    status_counts = dict(count_result.all())
+    # 各状态数量（读增量维护的计数器，见 dashboard_stats_service）
+    status_counts = await load_status_counts(db)
 
     counts = {
         "total": sum(status_counts.values()),
@@ -59,50 +100,75 @@ async def paper_list(request: Request, status: str = None, db: AsyncSession = De
         "submitted": status_counts.get("submitted", 0),
     }
 
-    return templates.TemplateResponse("papers.html", {
+    def page_url(**overrides):
+        params = {"status": status, "keyword": keyword, "per_page": per_page if per_page != PAPERS_PAGE_SIZE else None}
+        params.update(overrides)
+        return _page_url("/papers", **params)
+
+    return with_validators(templates.TemplateResponse("papers.html", {
         "request": request,
-        "papers": papers,
+        "papers": page.items,
         "status_filter": status,
+        "keyword": keyword,
         "counts": counts,
-    })
+        "page_url": page_url,
+        "next_url": page_url(cursor=page.next_cursor) if page.next_cursor else None,
+        "is_first_page": not cursor,
+    }), validators)
 
 
 @router.get("/published")
-async def published_papers(request: Request, db: AsyncSession = Depends(get_db)):
-    """已发表论文页面 — 按期号（月份）分组展示。"""
-    # 查询所有 accepted 论文
-    result = await db.execute(
-        select(Paper).where(Paper.status == "accepted").order_by(Paper.decided_at.desc())
+async def published_papers(
+    request: Request,
+    cursor: str = None,
+    per_page: int = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    """已发表论文页面 — 按期号（月份）分组展示，游标分页。"""
+    validators = await papers_validators(db)
+    if response := not_modified(request, validators):
+        return response
+
+    per_page = page_size(per_page)
+    page = await paginate(
+        db, paper_summaries().where(Paper.status == "accepted"), PUBLISHED_SORT_KEY, cursor, per_page,
     )
-    papers = result.scalars().all()
 
-    # 总投稿数（用于计算接受率）
-    total_decided = await db.scalar(
-        select(func.count(Paper.id)).where(
-            Paper.status.in_(["accepted", "rejected", "revision"])
-        )
-    ) or 0
+    # 每期（月份）的论文数：读按期维护的计数器，期号和总数都由它得出，不依赖当前页包含哪些论文
+    month_counts = OrderedDict(await published_issue_counts(db))
+    volumes = {key: i for i, key in enumerate(month_counts, 1)}  # Volume 编号（按月份从早到晚）
+
+    # 各状态数量（用于计算接受率）
+    status_counts = await load_status_counts(db)
+    total_decided = sum(status_counts.get(status, 0) for status in ("accepted", "rejected", "revision"))
+    total_published = status_counts.get("accepted", 0)
 
-    # 按月份分组为期号
+    # 当前页的论文按月份分组为期号（跨页的期在下一页继续，期号不变）
     issues = OrderedDict()
-    for paper in papers:
-        dt = paper.decided_at or paper.submitted_at
+    for paper in page.items:
+        dt = paper.sort_key
         key = dt.strftime("%Y-%m")
         if key not in issues:
             issues[key] = {
                 "label": dt.strftime("%B %Y"),  # e.g. "March 2026"
+                "volume": volumes.get(key, 0),
+                "count": month_counts.get(key, 0),
                 "papers": [],
             }
         issues[key]["papers"].append(paper)
 
-    # 计算 Volume 编号（按月份从早到晚）
-    sorted_keys = sorted(issues.keys())
-    for i, key in enumerate(sorted_keys, 1):
-        issues[key]["volume"] = i
+    def page_url(**overrides):
+        params = {"per_page": per_page if per_page != PAPERS_PAGE_SIZE else None}
+        params.update(overrides)
+        return _page_url("/published", **params)
 
-    return templates.TemplateResponse("published.html", {
+    return with_validators(templates.TemplateResponse("published.html", {
         "request": request,
         "issues": issues,
-        "total_published": len(papers),
-        "acceptance_rate": round(len(papers) / total_decided * 100) if total_decided > 0 else 0,
-    })
+        "total_issues": len(month_counts),
+        "total_published": total_published,
+        "acceptance_rate": round(total_published / total_decided * 100) if total_decided > 0 else 0,
+        "page_url": page_url,
+        "next_url": page_url(cursor=page.next_cursor) if page.next_cursor else None,
+        "is_first_page": not cursor,
+    }), validators)
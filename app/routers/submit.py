@@ -1,20 +1,20 @@
 """投稿路由 — 投稿页面和投稿API。"""
 
-import asyncio
 from fastapi import APIRouter, Request, UploadFile, File, Form, Depends
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import Paper
 from app.config import REQUIRE_EMAIL, DAILY_SUBMIT_LIMIT, MONTHLY_SUBMIT_LIMIT
-from app.services.paper_service import save_upload, extract_text
-from app.services.review_service import run_review_pipeline
-from app.services.rate_limit_service import check_submission_limit
+from app.services.paper_service import save_upload, UploadRejected
+from app.services.paper_query_service import add_paper_keywords
+from app.services.job_queue_service import add_job, job_pool
+from app.services.dashboard_stats_service import record_submission
+from app.services.rate_limit_service import reserve_submission, refund_submission, client_ip
+from app.templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/submit")
@@ -46,51 +46,48 @@ async def submit_paper(
             "monthly_limit": MONTHLY_SUBMIT_LIMIT,
         })
 
-    if email.strip():
-        allowed, error_msg = await check_submission_limit(email, db)
-        if not allowed:
-            return templates.TemplateResponse("submit.html", {
-                "request": request,
-                "error": error_msg,
-                "daily_limit": DAILY_SUBMIT_LIMIT,
-                "monthly_limit": MONTHLY_SUBMIT_LIMIT,
-            })
-
-    # 保存文件
-    content = await file.read()
-    file_path = save_upload(file.filename, content)
-
-    # 提取文本
-    content_text = extract_text(file_path)
-
-    # 如果文本为空且有摘要，用摘要作为内容
-    if not content_text.strip() or content_text.startswith("["):
-        content_text = f"Title: {title}\n\nAbstract: {abstract}\n\n{content_text}"
-
-    # 创建论文记录
-    paper = Paper(
-        title=title,
-        abstract=abstract,
-        authors=authors,
-        email=email.strip().lower() if email else "",
-        keywords=keywords,
-        file_path=file_path,
-        content_text=content_text,
-    )
-    db.add(paper)
-    await db.commit()
-    await db.refresh(paper)
+    # 按 IP 的窗口总是检查，按 email 的窗口只在填写了 email 时检查。
+    # 上传前就占用名额（检查与计数一步完成，并发投稿不会同时通过检查），投稿没有完成时退还
+    ip = client_ip(request)
+    if error_msg := await reserve_submission(email, ip):
+        return templates.TemplateResponse("submit.html", {
+            "request": request,
+            "error": error_msg,
+            "daily_limit": DAILY_SUBMIT_LIMIT,
+            "monthly_limit": MONTHLY_SUBMIT_LIMIT,
+        })
 
-    # 后台触发审稿流程（不阻塞响应）
-    asyncio.create_task(_background_review(paper.id))
+    try:
+        # 流式保存文件并校验（文本提取是审稿任务的第一步，不在请求中进行）
+        upload = await save_upload(file)
+
+        # 创建论文记录
+        paper = Paper(
+            title=title,
+            abstract=abstract,
+            authors=authors,
+            email=email.strip().lower() if email else "",
+            keywords=keywords,
+            file_path=upload.path,
+        )
+        await record_submission(db, paper)
+        db.add(paper)
+        await db.flush()
+        add_paper_keywords(db, paper)
+        # 审稿流程写入持久化任务队列（不阻塞响应，重启后可恢复），与论文在同一事务中提交
+        add_job(db, "review", paper.id)
+        await db.commit()
+    except UploadRejected as e:
+        await refund_submission(email, ip)
+        return templates.TemplateResponse("submit.html", {
+            "request": request,
+            "error": str(e),
+            "daily_limit": DAILY_SUBMIT_LIMIT,
+            "monthly_limit": MONTHLY_SUBMIT_LIMIT,
+        })
+    except Exception:
+        await refund_submission(email, ip)
+        raise
+    job_pool.wake()
 
     return RedirectResponse(url=f"/paper/{paper.id}", status_code=303)
-
-
-async def _background_review(paper_id: int):
-    """后台审稿任务。"""
-    from app.database import async_session
-    async with async_session() as db:
-        paper = await db.get(Paper, paper_id)
-        if paper:
-            await run_review_pipeline(paper, db)
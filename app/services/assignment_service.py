@@ -1,94 +1,368 @@
-"""社区审稿人分配服务 — 为每篇论文选择社区审稿人。"""
+"""社区审稿人分配服务 — 为每篇论文选择社区审稿人。
 
-import random
+匹配用稿件（标题 + 摘要 + 关键词）与审稿人专长（专长关键词 + 人设描述）的 TF-IDF 余弦相似度
+（哈希 n-gram，见 text_vector_service），不再只数逗号分隔关键词的精确重合——多数论文与谁都没有重合，
+负载均衡实际上等于随机分配。
+
+分配查进程内的分配索引（assignment_index），不逐篇扫描审稿人和审稿记录：
+- 审稿人向量矩阵（NumPy，每行一位符合条件的审稿人），专长关键词来自 reviewer_keywords 表
+- 每行的分配成本 = 近 30 天审稿数 + 延迟降权；负载源数据为 guest_reviewer_daily_loads 的按天计数
+一次分配 = 一次矩阵向量乘积得到全部相似度，减去成本后按模式各取前几位（argpartition），再按 Prompt 模式限额选取。
+
+索引每 ASSIGNMENT_INDEX_REFRESH_SECONDS 在后台从数据库整体重建（重算 IDF；其他进程的注册、校准和负载由此同步），
+本进程内的校准通过、降级、停用、延迟变化和分配会立即更新对应的行（沿用当前 IDF）。选中者最后按主键加载并复核资格。
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 
-from sqlalchemy import select, func
+import numpy as np
+from sqlalchemy import select, func, delete
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import GuestReviewer, GuestReviewRecord
-from app.config import MAX_GUEST_REVIEWERS_PER_PAPER, MAX_PROMPT_MODE_PER_PAPER, PROMPT_MODE_MONTHLY_QUOTA
+from app.models import (
+    Paper, GuestReviewer, GuestReviewRecord, GuestReviewerStats, ReviewerKeyword, GuestReviewerDailyLoad,
+)
+from app.services.text_vector_service import text_features, term_vector, idf_weights, tfidf_vector
+from app.config import (
+    MAX_GUEST_REVIEWERS_PER_PAPER, MAX_PROMPT_MODE_PER_PAPER, PROMPT_MODE_MONTHLY_QUOTA,
+    GUEST_LATENCY_PENALTY_SECONDS, ASSIGNMENT_INDEX_REFRESH_SECONDS, ASSIGNMENT_SIMILARITY_WEIGHT,
+    ASSIGNMENT_VECTOR_DIM,
+)
+
+logger = logging.getLogger(__name__)
+
+LOAD_WINDOW_DAYS = 30
+
+
+def normalize_keywords(text: str) -> set[str]:
+    """逗号分隔的关键词 → 规范化集合（去空白、小写）。论文关键词和审稿人专长用同一规则。"""
+    return {k.strip().lower()[:100] for k in (text or "").split(",") if k.strip()}
+
+
+def _day_key(now: datetime) -> str:
+    return now.strftime("%Y-%m-%d")
+
+
+def load_window_start(now: datetime | None = None) -> str:
+    """负载窗口的第一天：含当天共 LOAD_WINDOW_DAYS 个按天的桶。"""
+    return _day_key((now or datetime.utcnow()) - timedelta(days=LOAD_WINDOW_DAYS - 1))
+
+
+# ---------- 源数据维护（在写操作 / 请求会话内调用） ----------
+
+async def set_reviewer_keywords(session: AsyncSession, guest_reviewer_id: int, expertise_areas: str):
+    """注册或修改专长时调用：重写该审稿人的倒排索引行。"""
+    await session.execute(delete(ReviewerKeyword).where(ReviewerKeyword.guest_reviewer_id == guest_reviewer_id))
+    session.add_all(
+        ReviewerKeyword(keyword=keyword, guest_reviewer_id=guest_reviewer_id)
+        for keyword in normalize_keywords(expertise_areas)
+    )
+
+
+async def _bump_daily_load(session: AsyncSession, guest_reviewer_id: int, day: str, delta: int):
+    stmt = insert(GuestReviewerDailyLoad).values(guest_reviewer_id=guest_reviewer_id, day=day, reviews=delta)
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[GuestReviewerDailyLoad.guest_reviewer_id, GuestReviewerDailyLoad.day],
+        set_={"reviews": GuestReviewerDailyLoad.reviews + stmt.excluded.reviews},
+    ))
+
+
+async def record_daily_load(session: AsyncSession, guest_reviewer_id: int):
+    """写入一条 GuestReviewRecord 时调用：当天的桶 +1，并清掉该审稿人已滑出窗口的桶。"""
+    await _bump_daily_load(session, guest_reviewer_id, _day_key(datetime.utcnow()), 1)
+    await session.execute(delete(GuestReviewerDailyLoad).where(
+        GuestReviewerDailyLoad.guest_reviewer_id == guest_reviewer_id,
+        GuestReviewerDailyLoad.day < load_window_start(),
+    ))
+
+
+async def unrecord_paper_loads(session: AsyncSession, paper_id: int):
+    """删除某篇论文的审稿记录之前调用：从按天计数中减去这些记录（窗口外的已清理，跳过）。"""
+    day = func.date(GuestReviewRecord.created_at)
+    rows = (await session.execute(
+        select(GuestReviewRecord.guest_reviewer_id, day, func.count(GuestReviewRecord.id))
+        .where(GuestReviewRecord.paper_id == paper_id)
+        .group_by(GuestReviewRecord.guest_reviewer_id, day)
+    )).all()
+    window_start = load_window_start()
+    for guest_reviewer_id, record_day, count in rows:
+        if record_day and record_day >= window_start:
+            await _bump_daily_load(session, guest_reviewer_id, record_day, -count)
+
+
+# ---------- 进程内分配索引 ----------
+
+def reviewer_terms(keywords, personality: str) -> tuple[np.ndarray, np.ndarray]:
+    """审稿人文档（专长关键词 + 人设描述）的稀疏词频。"""
+    return term_vector(text_features(personality or "", sorted(keywords)))
+
+
+@dataclass
+class _Entry:
+    row: int
+    mode: str
+    load: int  # 近 30 天审稿数（含本进程已分配、尚未写入记录的）
+    latency: float  # 平均审稿耗时（秒）
+
+    @property
+    def cost(self) -> float:
+        # 已达月度限额的 Prompt 模式审稿人不再分配：成本记为无穷大
+        if self.mode == "prompt" and self.load >= PROMPT_MODE_MONTHLY_QUOTA:
+            return np.inf
+        return self.load + self.latency / GUEST_LATENCY_PENALTY_SECONDS
+
+
+class AssignmentIndex:
+    def __init__(self):
+        self._entries: dict[int, _Entry] = {}
+        self._free: list[int] = []  # 空出的行（审稿人失去资格后）
+        self._rows = 0  # 已使用的行数（含空出的行）
+        self._matrix = np.zeros((0, ASSIGNMENT_VECTOR_DIM), dtype=np.float32)
+        self._costs = np.zeros(0)  # 空行为无穷大
+        self._prompt = np.zeros(0, dtype=bool)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._idf = np.ones(ASSIGNMENT_VECTOR_DIM, dtype=np.float32)
+        self._rng = np.random.default_rng()
+        self._built_at: float | None = None
+        self._lock = asyncio.Lock()
+        self._refresh: asyncio.Task | None = None
+        self.stats = {"builds": 0, "selections": 0, "select_seconds": 0.0, "max_select_seconds": 0.0,
+                      "stale_picks": 0}
+
+    # ----- 行 -----
+
+    def _grow(self, capacity: int):
+        extra = capacity - len(self._costs)
+        self._matrix = np.concatenate([self._matrix, np.zeros((extra, ASSIGNMENT_VECTOR_DIM), dtype=np.float32)])
+        self._costs = np.concatenate([self._costs, np.full(extra, np.inf)])
+        self._prompt = np.concatenate([self._prompt, np.zeros(extra, dtype=bool)])
+        self._ids = np.concatenate([self._ids, np.full(extra, -1, dtype=np.int64)])
+
+    def _put(self, gr_id: int, mode: str, load: int, latency: float, vector: np.ndarray):
+        if self._free:
+            row = self._free.pop()
+        else:
+            if self._rows == len(self._costs):
+                self._grow(max(64, 2 * self._rows))
+            row = self._rows
+            self._rows += 1
+        entry = _Entry(row, mode, load, latency)
+        self._entries[gr_id] = entry
+        self._matrix[row] = vector
+        self._costs[row] = entry.cost
+        self._prompt[row] = mode == "prompt"
+        self._ids[row] = gr_id
 
+    def _drop(self, gr_id: int) -> _Entry | None:
+        entry = self._entries.pop(gr_id, None)
+        if entry is not None:
+            self._matrix[entry.row] = 0
+            self._costs[entry.row] = np.inf
+            self._ids[entry.row] = -1
+            self._free.append(entry.row)
+        return entry
 
-async def select_guest_reviewers(
-    paper_keywords: str,
-    paper_id: int,
-    db: AsyncSession,
-) -> list[GuestReviewer]:
+    # ----- 构建 -----
+
+    async def rebuild(self, db: AsyncSession):
+        """从数据库整体重建（符合条件的审稿人、专长关键词、窗口内的按天负载），并重算 IDF。"""
+        eligible = (GuestReviewer.level >= 1, GuestReviewer.is_active == 1)
+        reviewers = (await db.execute(
+            select(
+                GuestReviewer.id, GuestReviewer.mode, GuestReviewer.personality,
+                func.coalesce(GuestReviewerStats.latency_ewma, 0.0),
+            )
+            .outerjoin(GuestReviewerStats, GuestReviewerStats.guest_reviewer_id == GuestReviewer.id)
+            .where(*eligible)
+        )).all()
+        keywords: dict[int, set[str]] = {}
+        keyword_rows = await db.execute(
+            select(ReviewerKeyword.guest_reviewer_id, ReviewerKeyword.keyword)
+            .join(GuestReviewer, GuestReviewer.id == ReviewerKeyword.guest_reviewer_id)
+            .where(*eligible)
+        )
+        for gr_id, keyword in keyword_rows.all():
+            keywords.setdefault(gr_id, set()).add(keyword)
+        loads = dict((await db.execute(
+            select(GuestReviewerDailyLoad.guest_reviewer_id, func.sum(GuestReviewerDailyLoad.reviews))
+            .where(GuestReviewerDailyLoad.day >= load_window_start())
+            .group_by(GuestReviewerDailyLoad.guest_reviewer_id)
+        )).all())
+
+        # 分词和向量化是纯 CPU 计算，审稿人多时放到线程里，不阻塞事件循环
+        def vectorize() -> tuple[np.ndarray, np.ndarray]:
+            terms = [reviewer_terms(keywords.get(gr_id, ()), personality) for gr_id, _, personality, _ in reviewers]
+            document_frequencies = np.zeros(ASSIGNMENT_VECTOR_DIM, dtype=np.float32)
+            for indices, _ in terms:
+                document_frequencies[indices] += 1
+            idf = idf_weights(document_frequencies, len(terms))
+            matrix = np.zeros((max(64, len(terms)), ASSIGNMENT_VECTOR_DIM), dtype=np.float32)
+            for row, (indices, values) in enumerate(terms):
+                matrix[row] = tfidf_vector(indices, values, idf)
+            return idf, matrix
+
+        self._idf, self._matrix = await asyncio.to_thread(vectorize)
+        capacity = len(self._matrix)
+        self._entries, self._free, self._rows = {}, [], len(reviewers)
+        self._costs = np.full(capacity, np.inf)
+        self._prompt = np.zeros(capacity, dtype=bool)
+        self._ids = np.full(capacity, -1, dtype=np.int64)
+        for row, (gr_id, mode, _, latency) in enumerate(reviewers):
+            entry = self._entries[gr_id] = _Entry(row, mode, loads.get(gr_id) or 0, latency)
+            self._costs[row] = entry.cost
+            self._prompt[row] = mode == "prompt"
+            self._ids[row] = gr_id
+        self._built_at = time.monotonic()
+        self.stats["builds"] += 1
+        logger.info(f"Assignment index rebuilt: {len(self._entries)} reviewers")
+
+    async def _background_rebuild(self):
+        from app.database import read_session
+        try:
+            async with read_session() as session:
+                await self.rebuild_now(session)
+        except Exception as e:
+            logger.error(f"Assignment index rebuild failed: {e}")
+        finally:
+            self._refresh = None
+
+    async def rebuild_now(self, db: AsyncSession):
+        async with self._lock:
+            await self.rebuild(db)
+
+    async def ensure_fresh(self, db: AsyncSession):
+        """首次使用时同步构建；过期后在后台重建，期间继续用当前索引。"""
+        if self._built_at is None:
+            async with self._lock:
+                if self._built_at is None:
+                    await self.rebuild(db)
+        elif time.monotonic() - self._built_at > ASSIGNMENT_INDEX_REFRESH_SECONDS and self._refresh is None:
+            self._refresh = asyncio.create_task(self._background_rebuild())
+
+    # ----- 增量更新 -----
+
+    def update_reviewer(self, gr: GuestReviewer):
+        """本进程内审稿人资格或专长变化后调用（校准通过、降级、停用、修改专长），按当前 IDF 重算该行。"""
+        if self._built_at is None:
+            return  # 尚未构建，首次分配时会从数据库读到最新状态
+        old = self._drop(gr.id)
+        if gr.level >= 1 and gr.is_active == 1:
+            indices, values = reviewer_terms(normalize_keywords(gr.expertise_areas), gr.personality)
+            self._put(
+                gr.id, gr.mode, old.load if old else 0, old.latency if old else 0.0,
+                tfidf_vector(indices, values, self._idf),
+            )
+
+    def add_load(self, gr_id: int, delta: int = 1):
+        if (entry := self._entries.get(gr_id)) is not None:
+            entry.load += delta
+            self._costs[entry.row] = entry.cost
+
+    def set_latency(self, gr_id: int, latency: float):
+        if (entry := self._entries.get(gr_id)) is not None:
+            entry.latency = latency
+            self._costs[entry.row] = entry.cost
+
+    # ----- 选择 -----
+
+    def select(self, paper_text: str, paper_keywords: set[str], limit: int, prompt_limit: int) -> list[int]:
+        """
+        得分 = 相似度 * ASSIGNMENT_SIMILARITY_WEIGHT - 近 30 天审稿数 - 延迟降权（另加极小的随机数打破平局），
+        取得分最高的 limit 位，其中 prompt 模式最多 prompt_limit 位。
+        逐个选取时跳过超额的 prompt 模式审稿人，等价于 API 模式的前 limit 位与 prompt 模式的前 prompt_limit 位合并后取前 limit 位。
+        """
+        start = time.perf_counter()
+        rows = self._rows
+        if not self._entries or limit <= 0:
+            return []
+        indices, values = term_vector(text_features(paper_text, sorted(paper_keywords)))
+        query = tfidf_vector(indices, values, self._idf)
+        scores = self._matrix[:rows] @ query * ASSIGNMENT_SIMILARITY_WEIGHT - self._costs[:rows]
+        scores += self._rng.random(rows) * 1e-6
+
+        candidates = []
+        for is_prompt, cap in ((False, limit), (True, min(prompt_limit, limit))):
+            if cap <= 0:
+                continue
+            masked = np.where(self._prompt[:rows] == is_prompt, scores, -np.inf)
+            top = np.argpartition(-masked, cap - 1)[:cap] if cap < rows else np.arange(rows)
+            candidates.extend((masked[row], row) for row in top if np.isfinite(masked[row]))
+        candidates.sort(reverse=True)
+        selected = [int(self._ids[row]) for _, row in candidates[:limit]]
+
+        elapsed = time.perf_counter() - start
+        self.stats["selections"] += 1
+        self.stats["select_seconds"] += elapsed
+        self.stats["max_select_seconds"] = max(self.stats["max_select_seconds"], elapsed)
+        return selected
+
+    def snapshot(self) -> dict:
+        selections = self.stats["selections"]
+        return {
+            "reviewers": len(self._entries),
+            "rows": self._rows,
+            "vector_dim": ASSIGNMENT_VECTOR_DIM,
+            "matrix_mb": round(self._matrix.nbytes / 1024 / 1024, 2),
+            "builds": self.stats["builds"],
+            "age_seconds": round(time.monotonic() - self._built_at, 1) if self._built_at is not None else None,
+            "selections": selections,
+            "avg_select_ms": round(self.stats["select_seconds"] / selections * 1000, 3) if selections else 0.0,
+            "max_select_ms": round(self.stats["max_select_seconds"] * 1000, 3),
+            "stale_picks": self.stats["stale_picks"],
+        }
+
+
+assignment_index = AssignmentIndex()
+
+
+async def select_guest_reviewers(paper: Paper, db: AsyncSession) -> list[GuestReviewer]:
     """
     为一篇论文选择社区审稿人。
 
     选择逻辑：
     1. 筛选: level >= 1 (Candidate 或 Associate), is_active = 1
-    2. 关键词匹配优先
+    2. 与稿件（标题、摘要、关键词）语义相近的优先
     3. 负载均衡（近30天审稿最少的优先）
-    4. 随机打破平局
-    5. Prompt 模式审稿人数量限制（控制成本）
+    4. 响应慢的审稿人降权（按平均审稿耗时）
+    5. 随机打破平局
+    6. Prompt 模式审稿人数量限制（控制成本）
 
+    候选与打分都在分配索引中完成，数据库只按主键加载选中的几位并复核资格。
     返回最多 MAX_GUEST_REVIEWERS_PER_PAPER 个 GuestReviewer。
     """
-    # 查询所有符合条件的审稿人
-    query = select(GuestReviewer).where(
-        GuestReviewer.level >= 1,
-        GuestReviewer.is_active == 1,
-    )
-    result = await db.execute(query)
-    candidates = list(result.scalars().all())
-
-    if not candidates:
-        return []
-
-    # 查询每位审稿人近 30 天的审稿数（用于负载均衡 + 月度限额）
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    count_query = (
-        select(
-            GuestReviewRecord.guest_reviewer_id,
-            func.count(GuestReviewRecord.id).label("cnt"),
-        )
-        .where(GuestReviewRecord.created_at >= thirty_days_ago)
-        .group_by(GuestReviewRecord.guest_reviewer_id)
-    )
-    count_result = await db.execute(count_query)
-    review_counts = {row[0]: row[1] for row in count_result.all()}
+    await assignment_index.ensure_fresh(db)
+    paper_text = f"{paper.title or ''}\n{paper.abstract or ''}"
+    keywords = normalize_keywords(paper.keywords)
 
-    # 过滤掉已达月度限额的 Prompt 模式审稿人
-    candidates = [
-        c for c in candidates
-        if c.mode != "prompt" or review_counts.get(c.id, 0) < PROMPT_MODE_MONTHLY_QUOTA
-    ]
-
-    if not candidates:
-        return []
-
-    # 论文关键词集合
-    paper_kw_set = set(
-        k.strip().lower() for k in (paper_keywords or "").split(",") if k.strip()
-    )
-
-    # 对每位候选人打分
-    scored = []
-    for c in candidates:
-        reviewer_kw_set = set(
-            k.strip().lower() for k in (c.expertise_areas or "").split(",") if k.strip()
+    for attempt in range(2):
+        ids = assignment_index.select(paper_text, keywords, MAX_GUEST_REVIEWERS_PER_PAPER, MAX_PROMPT_MODE_PER_PAPER)
+        if not ids:
+            return []
+        result = await db.execute(
+            select(GuestReviewer).where(
+                GuestReviewer.id.in_(ids),
+                GuestReviewer.level >= 1,
+                GuestReviewer.is_active == 1,
+            )
         )
-        keyword_overlap = len(paper_kw_set & reviewer_kw_set)
-        recent_count = review_counts.get(c.id, 0)
-        # 关键词匹配越多越好，近期审稿越少越好
-        score = keyword_overlap * 10 - recent_count
-        scored.append((score, random.random(), c))
-
-    scored.sort(key=lambda x: (-x[0], x[1]))
-
-    # 选取，同时限制 prompt 模式数量
-    selected = []
-    prompt_count = 0
-    for _, _, c in scored:
-        if len(selected) >= MAX_GUEST_REVIEWERS_PER_PAPER:
+        by_id = {gr.id: gr for gr in result.scalars().all()}
+        if len(by_id) == len(ids) or attempt:
             break
-        if c.mode == "prompt":
-            if prompt_count >= MAX_PROMPT_MODE_PER_PAPER:
-                continue
-            prompt_count += 1
-        selected.append(c)
+        # 其他进程刚降级或停用了选中的审稿人，索引已过时：重建后重选一次
+        assignment_index.stats["stale_picks"] += len(ids) - len(by_id)
+        await assignment_index.rebuild_now(db)
 
+    selected = [by_id[gr_id] for gr_id in ids if gr_id in by_id]
+    # 审稿记录要到审稿完成才写入，先在本进程的索引里计入负载，避免接连投稿都分给同几位
+    for gr in selected:
+        assignment_index.add_load(gr.id)
     return selected
+
+
+def assignment_stats() -> dict:
+    return assignment_index.snapshot()
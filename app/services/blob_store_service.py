@@ -0,0 +1,184 @@
+"""内容寻址的上传文件存储 — 按 SHA-256 存放，两级哈希前缀分目录，相同文件只存一份。
+
+布局: UPLOAD_DIR/blobs/ab/cd/abcd….pdf，旁边的 abcd….pdf.extract.json 缓存提取出的文本。
+Paper.file_path 保存相对 UPLOAD_DIR 的路径（blobs/ab/cd/abcd….pdf），部署目录变化不影响引用；
+引用按 blob 文件名（哈希 + 扩展名）比对，无人引用且超过宽限期的 blob 会被定期回收
+（宽限期避免回收刚写入、论文记录还未提交的文件）。
+去重时复用已有 blob 与回收时的检查 + 删除在文件锁下互斥（多进程共用），不会删掉刚被重新引用的文件。
+没有 fcntl 的平台（Windows）退回进程内的锁，此时只有单进程部署能保证互斥。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app.config import UPLOAD_DIR, UPLOAD_TMP_DIR, BLOB_GC_GRACE_SECONDS, BLOB_GC_INTERVAL_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台没有 fcntl，只用进程内的锁
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = UPLOAD_DIR / "blobs"
+EXTRACT_SUFFIX = ".extract.json"
+
+blob_stats = {"stored": 0, "deduplicated": 0, "text_cache_hits": 0, "collected": 0}
+_gc_task: asyncio.Task | None = None
+_process_lock = threading.Lock()
+
+
+def blob_path(sha256: str, suffix: str) -> Path:
+    return BLOB_DIR / sha256[:2] / sha256[2:4] / f"{sha256}{suffix}"
+
+
+def resolve_upload(file_path: str) -> Path:
+    """Paper.file_path → 文件路径。blob 存的是相对 UPLOAD_DIR 的路径；旧版平铺存储的绝对路径原样返回。"""
+    return UPLOAD_DIR / file_path
+
+
+@contextmanager
+def _blob_lock():
+    if fcntl is None:
+        with _process_lock:
+            yield
+        return
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    with open(BLOB_DIR / ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def commit_blob(tmp_path: str, sha256: str, suffix: str) -> str:
+    """把已校验的临时文件放入存储，返回写入 Paper.file_path 的相对路径；内容已存在时直接丢弃临时文件（去重）。"""
+    path = blob_path(sha256, suffix)
+    with _blob_lock():
+        if path.exists():
+            os.unlink(tmp_path)
+            os.utime(path)  # 刷新时间，宽限期内不会被回收
+            blob_stats["deduplicated"] += 1
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp_path, path)
+            blob_stats["stored"] += 1
+    return path.relative_to(UPLOAD_DIR).as_posix()
+
+
+def _extract_cache_path(file_path: str) -> Path | None:
+    path = resolve_upload(file_path)
+    if BLOB_DIR not in path.parents:
+        return None  # 旧版平铺存储的文件不缓存
+    return path.with_name(path.name + EXTRACT_SUFFIX)
+
+
+def read_cached_text(file_path: str, max_pages: int) -> tuple[str, int] | None:
+    """读取 blob 的文本缓存（提取页数上限不同则视为未命中）。"""
+    cache_path = _extract_cache_path(file_path)
+    if cache_path is None or not cache_path.exists():
+        return None
+    try:
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("max_pages") != max_pages:
+        return None
+    blob_stats["text_cache_hits"] += 1
+    return data["text"], data["pages"]
+
+
+def write_cached_text(file_path: str, text: str, pages: int, max_pages: int):
+    """写入 blob 的文本缓存（先写临时文件再原子替换）。"""
+    cache_path = _extract_cache_path(file_path)
+    if cache_path is None:
+        return
+    tmp = cache_path.with_name(cache_path.name + ".tmp")
+    tmp.write_text(json.dumps({"text": text, "pages": pages, "max_pages": max_pages}, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, cache_path)
+
+
+async def referenced_blobs(db) -> set[str]:
+    """被论文引用的 blob 文件名（哈希 + 扩展名），与存储位置和路径写法无关。"""
+    from app.models import Paper
+    rows = await db.execute(select(Paper.file_path).where(Paper.file_path != "").distinct())
+    return {Path(path).name for path in rows.scalars()}
+
+
+def _collect(referenced: set[str], grace_seconds: int) -> int:
+    """删除无人引用且超过宽限期的 blob（连同文本缓存）和遗留的上传临时文件。"""
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    if BLOB_DIR.exists():
+        for path in BLOB_DIR.glob("*/*/*"):
+            if path.name.endswith((EXTRACT_SUFFIX, ".tmp")) or not path.is_file() or path.name in referenced:
+                continue
+            # 在锁内重新检查时间：去重复用会先刷新时间，刚被重新引用的 blob 在宽限期内
+            with _blob_lock():
+                try:
+                    if path.stat().st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                path.unlink(missing_ok=True)
+                path.with_name(path.name + EXTRACT_SUFFIX).unlink(missing_ok=True)
+            removed += 1
+        with _blob_lock():
+            for directory in sorted(BLOB_DIR.glob("*/*"), reverse=True) + sorted(BLOB_DIR.glob("*")):
+                if directory.is_dir() and not any(directory.iterdir()):
+                    directory.rmdir()
+    for tmp in UPLOAD_TMP_DIR.glob("*"):
+        if tmp.is_file() and tmp.stat().st_mtime < cutoff:
+            tmp.unlink(missing_ok=True)
+    return removed
+
+
+async def collect_orphan_blobs(grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+    """回收孤立 blob，返回删除数量。"""
+    from app.database import async_session
+    async with async_session() as db:
+        referenced = await referenced_blobs(db)
+    removed = await asyncio.to_thread(_collect, referenced, grace_seconds)
+    blob_stats["collected"] += removed
+    if removed:
+        logger.info(f"Blob GC removed {removed} orphaned upload(s)")
+    return removed
+
+
+async def _gc_loop():
+    while True:
+        try:
+            await collect_orphan_blobs()
+        except Exception as e:
+            logger.error(f"Blob GC failed: {e}")
+        await asyncio.sleep(BLOB_GC_INTERVAL_SECONDS)
+
+
+def start_blob_gc():
+    global _gc_task
+    if _gc_task is None and BLOB_GC_INTERVAL_SECONDS > 0:
+        _gc_task = asyncio.create_task(_gc_loop())
+
+
+async def stop_blob_gc():
+    global _gc_task
+    if _gc_task is not None:
+        _gc_task.cancel()
+        try:
+            await _gc_task
+        except asyncio.CancelledError:
+            pass
+        _gc_task = None
+
+
+def blob_store_stats() -> dict:
+    return dict(blob_stats)
@@ -1,13 +1,33 @@
-"""校准测试服务 — 验证社区审稿人是否能生成合格的审稿报告。"""
+"""校准测试服务 — 验证社区审稿人是否能生成合格的审稿报告。
 
+校准结论按配置指纹缓存在 calibration_results（CALIBRATION_CACHE_TTL_HOURS 内有效）：
+指纹由模式、后端模型（Prompt 模式）或端点 + 模型 + API key 哈希（API 模式）、personality 哈希和 prompt 版本组成，
+配置不变的重复校准直接复用结论，不再把校准论文送去完整审稿一遍。
+只缓存通过的结论：API 调用失败、格式不合格都可能是一时的（端点故障、模型偶尔输出不合格），下次校准重新验证。
+"""
+
+import json
 import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import GuestReviewer
-from app.reviewers.guest_reviewer import build_guest_runner
+from app.config import CALIBRATION_CACHE_TTL_HOURS, PROMPT_LAYOUT
+from app.database import read_session
+from app.models import GuestReviewer, CalibrationResult
+from app.reviewers.base import REVIEW_SYSTEM_PROMPT, REVIEW_USER_PROMPT, REVIEW_PERSONA_PROMPT, DEFERRED_PERSONA
+from app.reviewers.guest_reviewer import GuestReviewerRunner, build_guest_runner
+from app.services.crypto_service import sha256_parts
+from app.services.db_writer_service import write, update_row
+from app.services.assignment_service import assignment_index
+from app.services.reviewer_stats_service import ensure_guest_stats
 
 logger = logging.getLogger(__name__)
 
+_stats = {"runs": 0, "cache_hits": 0, "cache_stores": 0}
+
 # 校准论文 — 一篇有趣但有明显问题的"论文"，用于测试审稿人的判断力
 CALIBRATION_PAPER = {
     "title": "On the Computational Complexity of Tea Brewing: A Formal Analysis",
@@ -116,14 +136,54 @@ def validate_review_format(result) -> list[str]:
     return errors
 
 
-async def run_calibration_test(guest_reviewer: GuestReviewer, db: AsyncSession) -> tuple[bool, str]:
-    """
-    对社区审稿人运行校准测试。
+# prompt 版本：审稿 prompt、布局和校准论文本身，任一变化都让已缓存的结论失效
+PROMPT_VERSION = sha256_parts(
+    REVIEW_SYSTEM_PROMPT, REVIEW_USER_PROMPT, REVIEW_PERSONA_PROMPT, DEFERRED_PERSONA, PROMPT_LAYOUT,
+    json.dumps(CALIBRATION_PAPER, sort_keys=True),
+)
+
+
+def calibration_fingerprint(runner: GuestReviewerRunner) -> str:
+    """校准结论的缓存键。API 模式带上 key 的哈希：换了 key 的同一端点要重新验证。"""
+    if runner.mode == "prompt":
+        target = runner.backend_model
+    else:
+        target = f"{runner.api_base_url}|{runner.api_model_name}|{sha256_parts(runner.api_key)}"
+    return sha256_parts(runner.mode, target, sha256_parts(runner.personality), PROMPT_VERSION)
+
+
+async def _cached_pass(fingerprint: str) -> bool:
+    """有效期内是否有通过的结论（旧版本缓存的不通过结论忽略，重新校准）。"""
+    async with read_session() as db:
+        entry = await db.get(CalibrationResult, fingerprint)
+    if entry is None or not entry.passed or entry.created_at < datetime.utcnow() - timedelta(hours=CALIBRATION_CACHE_TTL_HOURS):
+        return False
+    await write(update_row(entry, hit_count=entry.hit_count + 1))
+    return True
+
+
+async def _store_pass(fingerprint: str):
+    """写入通过的结论（同一事务中清理过期条目）。"""
+    async def work(session: AsyncSession):
+        await session.execute(delete(CalibrationResult).where(
+            CalibrationResult.created_at < datetime.utcnow() - timedelta(hours=CALIBRATION_CACHE_TTL_HOURS)
+        ))
+        stmt = insert(CalibrationResult).values(
+            fingerprint=fingerprint, passed=1, error="", hit_count=0, created_at=datetime.utcnow(),
+        )
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[CalibrationResult.fingerprint],
+            set_={"passed": stmt.excluded.passed, "error": stmt.excluded.error,
+                  "hit_count": 0, "created_at": stmt.excluded.created_at},
+        ))
+
+    await write(work)
+    _stats["cache_stores"] += 1
 
-    返回: (passed, error_message)
-    """
-    runner = build_guest_runner(guest_reviewer)
 
+async def _review_calibration_paper(runner: GuestReviewerRunner) -> tuple[bool, str]:
+    """把校准论文送去审稿并校验格式，返回 (passed, error_message)。"""
+    _stats["runs"] += 1
     try:
         result, raw = await runner.review(
             title=CALIBRATION_PAPER["title"],
@@ -134,26 +194,63 @@ async def run_calibration_test(guest_reviewer: GuestReviewer, db: AsyncSession)
         )
     except Exception as e:
         error_msg = f"API call failed: {str(e)[:500]}"
-        logger.error(f"Calibration failed for {guest_reviewer.display_name}: {error_msg}")
-        guest_reviewer.calibration_passed = 0
-        guest_reviewer.calibration_error = error_msg
-        await db.commit()
+        logger.error(f"Calibration failed for {runner.name}: {error_msg}")
         return False, error_msg
 
     # 验证格式
     errors = validate_review_format(result)
-
     if errors:
-        error_msg = "; ".join(errors)
-        guest_reviewer.calibration_passed = 0
-        guest_reviewer.calibration_error = error_msg
-        await db.commit()
+        return False, "; ".join(errors)
+    return True, ""
+
+
+async def run_calibration_test(guest_reviewer: GuestReviewer) -> tuple[bool, str]:
+    """
+    对社区审稿人运行校准测试（相同配置在有效期内通过过的直接复用）。
+
+    返回: (passed, error_message)
+    """
+    runner = build_guest_runner(guest_reviewer)
+    fingerprint = calibration_fingerprint(runner)
+
+    if await _cached_pass(fingerprint):
+        passed, error_msg = True, ""
+        _stats["cache_hits"] += 1
+        logger.info(f"Calibration for {guest_reviewer.display_name} reused a cached pass")
+    else:
+        passed, error_msg = await _review_calibration_paper(runner)
+        if passed:
+            await _store_pass(fingerprint)
+
+    if not passed:
+        await write(update_row(guest_reviewer, calibration_passed=0, calibration_error=error_msg))
         return False, error_msg
 
     # 通过
-    guest_reviewer.calibration_passed = 1
-    guest_reviewer.calibration_error = ""
-    guest_reviewer.level = 1  # 晋升为 Candidate
-    await db.commit()
+    # 晋升为 Candidate
+    promote = update_row(guest_reviewer, calibration_passed=1, calibration_error="", level=1)
+
+    async def work(session: AsyncSession):
+        await promote(session)
+        await ensure_guest_stats(session, guest_reviewer.id)  # 排行榜从此列出该审稿人
+
+    await write(work)
+    assignment_index.update_reviewer(guest_reviewer)
     logger.info(f"Calibration passed for {guest_reviewer.display_name}, promoted to Candidate")
     return True, ""
+
+
+async def run_calibration_job(reviewer_id: int):
+    """任务队列入口：加载社区审稿人并运行校准测试。"""
+    from app.database import read_session
+    async with read_session() as session:
+        result = await session.execute(
+            select(GuestReviewer).where(GuestReviewer.id == reviewer_id)
+        )
+        reviewer = result.scalars().first()
+        if reviewer:
+            await run_calibration_test(reviewer)
+
+
+def calibration_stats() -> dict:
+    return dict(_stats)
@@ -0,0 +1,133 @@
+"""稿件分段服务 — 按模型上下文计算正文预算，超长稿件按章节切分为若干段。"""
+
+import re
+from dataclasses import dataclass, field
+
+from app.config import (
+    MODEL_CONTEXT_TOKENS, DEFAULT_CONTEXT_TOKENS,
+    LONG_DOC_SINGLE_PASS_TOKENS, LONG_DOC_CHUNK_TOKENS, LONG_DOC_MAX_CHUNKS,
+)
+from app.services.provider_limit_service import estimate_tokens
+
+# 章节标题：Markdown 标题、"1. Introduction" / "2.3 Results"、全大写短行、"Abstract" / "References" 等
+_HEADING_RE = re.compile(
+    r"^(#{1,6}\s+\S.*"
+    r"|\d+(\.\d+)*\.?\s+[A-Z一-鿿].{0,80}"
+    r"|[A-Z][A-Z ]{3,60}"
+    r"|(Abstract|Introduction|Related Work|Background|Methods?|Methodology|Experiments?|Results|"
+    r"Discussion|Conclusions?|References|Bibliography|Appendix.*|Acknowledge?ments)\s*:?)\s*$",
+    re.MULTILINE,
+)
+
+SAFETY_MARGIN = 0.9  # token 估算误差余量
+
+
+@dataclass
+class ChunkPlan:
+    """正文的审稿计划：单次审稿，或分段后汇总。"""
+    content_tokens: int
+    budget: int
+    chunks: list[str] = field(default_factory=list)
+    truncated_tokens: int = 0
+
+    @property
+    def single_pass(self) -> bool:
+        return len(self.chunks) <= 1
+
+    def describe(self) -> str:
+        if self.single_pass:
+            return f"single pass, ~{self.content_tokens} tokens (budget {self.budget})"
+        sizes = [estimate_tokens(c) for c in self.chunks]
+        text = f"{len(self.chunks)} chunks, ~{self.content_tokens} tokens (budget {self.budget}), sizes {sizes}"
+        if self.truncated_tokens:
+            text += f", ~{self.truncated_tokens} tokens truncated"
+        return text
+
+
+def content_budget(model_name: str, prompt_tokens: int, max_output_tokens: int) -> int:
+    """单次调用中可留给正文的 token 数（模型上下文 − prompt − 输出 − 余量，再受单次上限约束）。"""
+    context = MODEL_CONTEXT_TOKENS.get(model_name, DEFAULT_CONTEXT_TOKENS)
+    budget = int(context * SAFETY_MARGIN) - prompt_tokens - max_output_tokens
+    if LONG_DOC_SINGLE_PASS_TOKENS > 0:
+        budget = min(budget, LONG_DOC_SINGLE_PASS_TOKENS)
+    return max(budget, 1000)
+
+
+def split_sections(text: str) -> list[str]:
+    """按章节标题切分正文；找不到标题时整体作为一节。"""
+    starts = [m.start() for m in _HEADING_RE.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    bounds = starts + [len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:]) if text[a:b].strip()]
+
+
+def _split_oversized(section: str, limit: int) -> list[str]:
+    """超过单段上限的章节按段落切分，单个段落仍超出时按字符硬切。"""
+    pieces: list[str] = []
+    current, current_tokens = "", 0
+    for para in re.split(r"(\n\s*\n)", section):
+        para_tokens = estimate_tokens(para)
+        if current_tokens + para_tokens <= limit:
+            current += para
+            current_tokens += para_tokens
+            continue
+        if current.strip():
+            pieces.append(current)
+        current, current_tokens = para, para_tokens
+        while current_tokens > limit:
+            # 按比例估算切点（CJK 与拉丁文字符/token 比不同）
+            cut = max(1, int(len(current) * limit / current_tokens))
+            pieces.append(current[:cut])
+            current = current[cut:]
+            current_tokens = estimate_tokens(current)
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+
+def _pack(sections: list[str], limit: int) -> list[str]:
+    """贪心地把相邻章节合并成不超过 limit 的分段。"""
+    chunks: list[str] = []
+    current, current_tokens = "", 0
+    for section in sections:
+        section_tokens = estimate_tokens(section)
+        pieces = [section] if section_tokens <= limit else _split_oversized(section, limit)
+        for piece in pieces:
+            piece_tokens = section_tokens if len(pieces) == 1 else estimate_tokens(piece)
+            if current and current_tokens + piece_tokens > limit:
+                chunks.append(current)
+                current, current_tokens = "", 0
+            current += piece
+            current_tokens += piece_tokens
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def plan_chunks(text: str, budget: int) -> ChunkPlan:
+    """
+    生成审稿计划：
+    - 正文不超过 budget → 单次审稿
+    - 否则按章节打包成约 LONG_DOC_CHUNK_TOKENS 的分段（不超过 budget）；
+      段数超过 LONG_DOC_MAX_CHUNKS 时放大分段，仍超出则丢弃末尾分段
+    """
+    total = estimate_tokens(text)
+    if total <= budget:
+        return ChunkPlan(content_tokens=total, budget=budget, chunks=[text])
+
+    sections = split_sections(text)
+    chunk_tokens = min(LONG_DOC_CHUNK_TOKENS, budget)
+    if total / chunk_tokens > LONG_DOC_MAX_CHUNKS:
+        chunk_tokens = min(budget, -(-total // LONG_DOC_MAX_CHUNKS))
+    chunks = _pack(sections, chunk_tokens)
+    # 按章节打包会留下空隙，段数仍超出时逐步放大分段
+    while len(chunks) > LONG_DOC_MAX_CHUNKS and chunk_tokens < budget:
+        chunk_tokens = min(budget, int(chunk_tokens * 1.25))
+        chunks = _pack(sections, chunk_tokens)
+
+    truncated = 0
+    if len(chunks) > LONG_DOC_MAX_CHUNKS:
+        truncated = sum(estimate_tokens(c) for c in chunks[LONG_DOC_MAX_CHUNKS:])
+        chunks = chunks[:LONG_DOC_MAX_CHUNKS]
+    return ChunkPlan(content_tokens=total, budget=budget, chunks=chunks, truncated_tokens=truncated)
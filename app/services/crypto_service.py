@@ -1,4 +1,4 @@
-"""API Key 加密/解密服务 — 用于安全存储社区审稿人的 API Key。"""
+"""API Key 加密/解密服务 — 用于安全存储社区审稿人的 API Key；以及各缓存共用的多段内容哈希。"""
 
 import base64
 import hashlib
@@ -22,3 +22,12 @@ def decrypt_api_key(encrypted_key: str) -> str:
     if not encrypted_key:
         return ""
     return _get_fernet().decrypt(encrypted_key.encode()).decode()
+
+
+def sha256_parts(*parts: str) -> str:
+    """多段文本的 SHA-256（段之间以 NUL 分隔，None 视为空串），用作缓存键 / 指纹。"""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update((part or "").encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
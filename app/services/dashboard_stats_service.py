@@ -0,0 +1,323 @@
+"""统计面板计数器 — 投稿和审稿流程在状态变化时增量更新，面板只读几行计数。
+
+计数器存放在 dashboard_counters（名称 → 值）和 reviewer_score_stats（审稿人 → 审稿数与评分总和）：
+- status:<状态>             各状态论文数（投稿 +1，状态变化时旧状态 -1、新状态 +1）
+- reviews                   审稿意见总数
+- submissions:<YYYY-MM-DD>  / submissions:<YYYY-MM>  当日 / 当月投稿数（UTC）
+- active_users:<YYYY-MM>    当月投稿的不同邮箱数（该邮箱本月首次投稿时 +1）
+- published:<YYYY-MM>       各期（按 PUBLISHED_SORT_KEY 的月份）已发表论文数
+
+/papers 和 /published 的状态计数、期号列表也读这些计数器（按名称前缀走主键范围查询），不对 papers 做 GROUP BY。
+
+增量更新难免漂移（如进程在两次写之间崩溃），后台定期从原始表重新计算并覆盖（reconcile），
+应用启动时也先执行一次，已有数据的部署无需手工初始化。面板读取前还有 DASHBOARD_CACHE_SECONDS 的进程内缓存。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from sqlalchemy import select, func, distinct, delete, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import DASHBOARD_CACHE_SECONDS, DASHBOARD_RECONCILE_INTERVAL_SECONDS
+from app.models import Paper, Review, DashboardCounter, ReviewerScoreStats
+from app.services.paper_query_service import PUBLISHED_SORT_KEY
+from app.services.db_writer_service import WriteWork, write, update_row
+
+logger = logging.getLogger(__name__)
+
+_stats = {"cache_hits": 0, "cache_misses": 0, "reconciles": 0, "drifted_counters": 0}
+_cache: tuple[float, dict] | None = None
+_reconcile_task: asyncio.Task | None = None
+
+
+def _day_key(now: datetime) -> str:
+    return now.strftime("%Y-%m-%d")
+
+
+def _month_key(now: datetime) -> str:
+    return now.strftime("%Y-%m")
+
+
+def _published_key(paper: Paper, decided_at: datetime | None) -> str:
+    """论文所在的期（与 PUBLISHED_SORT_KEY 一致：有决定时间按决定时间，否则按投稿时间）。"""
+    return f"published:{_month_key(decided_at or paper.submitted_at)}"
+
+
+async def _bump(session: AsyncSession, counts: dict[str, int]):
+    """计数器加减（不存在时按 0 创建）。"""
+    for name, delta in counts.items():
+        if not delta:
+            continue
+        stmt = insert(DashboardCounter).values(name=name, value=delta)
+        await session.execute(stmt.on_conflict_do_update(
+            index_elements=[DashboardCounter.name],
+            set_={"value": DashboardCounter.value + stmt.excluded.value},
+        ))
+
+
+async def _bump_reviewer(session: AsyncSession, name: str, reviews: int, novelty: int, soundness: int, writing: int):
+    stmt = insert(ReviewerScoreStats).values(
+        reviewer_name=name, reviews=reviews, novelty_sum=novelty, soundness_sum=soundness, writing_sum=writing,
+    )
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[ReviewerScoreStats.reviewer_name],
+        set_={
+            "reviews": ReviewerScoreStats.reviews + stmt.excluded.reviews,
+            "novelty_sum": ReviewerScoreStats.novelty_sum + stmt.excluded.novelty_sum,
+            "soundness_sum": ReviewerScoreStats.soundness_sum + stmt.excluded.soundness_sum,
+            "writing_sum": ReviewerScoreStats.writing_sum + stmt.excluded.writing_sum,
+        },
+    ))
+
+
+# ---------- 增量更新 ----------
+
+async def record_submission(db: AsyncSession, paper: Paper):
+    """投稿：在投稿请求的会话中、插入论文之前调用，随论文一起提交。"""
+    now = datetime.utcnow()
+    counts = {"status:submitted": 1, f"submissions:{_day_key(now)}": 1, f"submissions:{_month_key(now)}": 1}
+    if paper.email:
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        seen = await db.scalar(
+            select(Paper.id).where(Paper.email == paper.email, Paper.submitted_at >= month_start).limit(1)
+        )
+        if seen is None:
+            counts[f"active_users:{_month_key(now)}"] = 1
+    await _bump(db, counts)
+
+
+def update_paper_status(paper: Paper, **values) -> WriteWork:
+    """写操作：更新论文状态（及其他列），同时把论文从旧状态的计数移到新状态。"""
+    old_status, new_status = paper.status, values.get("status", paper.status)
+    counts = {}
+    if old_status != new_status:
+        counts = {f"status:{old_status}": -1, f"status:{new_status}": 1}
+    # 已发表论文按期计数：离开 accepted 时从原来的期减去，进入 accepted 时计入新的期
+    old_issue = _published_key(paper, paper.decided_at)
+    new_issue = _published_key(paper, values.get("decided_at", paper.decided_at))
+    if old_status == "accepted" and (new_status != "accepted" or old_issue != new_issue):
+        counts[old_issue] = counts.get(old_issue, 0) - 1
+    if new_status == "accepted" and (old_status != "accepted" or old_issue != new_issue):
+        counts[new_issue] = counts.get(new_issue, 0) + 1
+    save = update_row(paper, **values)
+    if not counts:
+        return save
+
+    async def work(session: AsyncSession):
+        await save(session)
+        await _bump(session, counts)
+    return work
+
+
+def count_reviews(*reviews: Review) -> WriteWork:
+    """写操作：新保存的审稿意见计入总数和各审稿人的评分统计。"""
+    async def work(session: AsyncSession):
+        await _bump(session, {"reviews": len(reviews)})
+        for review in reviews:
+            await _bump_reviewer(
+                session, review.reviewer_name, 1,
+                review.novelty_score or 0, review.soundness_score or 0, review.writing_score or 0,
+            )
+    return work
+
+
+async def uncount_paper_reviews(session: AsyncSession, paper_id: int):
+    """删除某篇论文的审稿意见之前调用：从计数中减去这些审稿意见。"""
+    rows = (await session.execute(
+        select(
+            Review.reviewer_name, func.count(Review.id),
+            func.sum(func.coalesce(Review.novelty_score, 0)),
+            func.sum(func.coalesce(Review.soundness_score, 0)),
+            func.sum(func.coalesce(Review.writing_score, 0)),
+        ).where(Review.paper_id == paper_id).group_by(Review.reviewer_name)
+    )).all()
+    if not rows:
+        return
+    await _bump(session, {"reviews": -sum(row[1] for row in rows)})
+    for name, count, novelty, soundness, writing in rows:
+        await _bump_reviewer(session, name, -count, -novelty, -soundness, -writing)
+
+
+# ---------- 对账 ----------
+
+async def _recompute(session: AsyncSession) -> tuple[dict[str, int], list[tuple]]:
+    """从原始表重新计算所有计数器（即原来面板每次请求执行的聚合查询）。"""
+    now = datetime.utcnow()
+    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    status_rows = await session.execute(select(Paper.status, func.count(Paper.id)).group_by(Paper.status))
+    counters = {f"status:{status}": count for status, count in status_rows.all()}
+    counters["reviews"] = await session.scalar(select(func.count(Review.id))) or 0
+    counters[f"submissions:{_day_key(now)}"] = await session.scalar(
+        select(func.count(Paper.id)).where(Paper.submitted_at >= today_start)
+    ) or 0
+    counters[f"submissions:{_month_key(now)}"] = await session.scalar(
+        select(func.count(Paper.id)).where(Paper.submitted_at >= month_start)
+    ) or 0
+    counters[f"active_users:{_month_key(now)}"] = await session.scalar(
+        select(func.count(distinct(Paper.email))).where(Paper.submitted_at >= month_start, Paper.email != "")
+    ) or 0
+    issue = func.substr(PUBLISHED_SORT_KEY, 1, 7)
+    issue_rows = await session.execute(
+        select(issue, func.count(Paper.id)).where(Paper.status == "accepted").group_by(issue)
+    )
+    counters.update((f"published:{month}", count) for month, count in issue_rows.all())
+
+    reviewer_rows = (await session.execute(
+        select(
+            Review.reviewer_name, func.count(Review.id),
+            func.sum(func.coalesce(Review.novelty_score, 0)),
+            func.sum(func.coalesce(Review.soundness_score, 0)),
+            func.sum(func.coalesce(Review.writing_score, 0)),
+        ).group_by(Review.reviewer_name)
+    )).all()
+    return counters, [tuple(row) for row in reviewer_rows]
+
+
+async def _reconcile(session: AsyncSession) -> int:
+    """写操作：重新计算并覆盖计数器，返回与增量结果不一致的计数器个数。"""
+    # 先执行一条写语句拿到写锁，之后的读取和覆盖之间不会有其他写入插进来
+    await session.execute(update(DashboardCounter).where(DashboardCounter.name == "").values(value=0))
+
+    counters, reviewer_rows = await _recompute(session)
+    current = dict((await session.execute(select(DashboardCounter.name, DashboardCounter.value))).all())
+    current_reviewers = {
+        row[0]: tuple(row) for row in (await session.execute(select(
+            ReviewerScoreStats.reviewer_name, ReviewerScoreStats.reviews, ReviewerScoreStats.novelty_sum,
+            ReviewerScoreStats.soundness_sum, ReviewerScoreStats.writing_sum,
+        ))).all()
+    }
+    drifted = sum(1 for name, value in counters.items() if current.get(name, 0) != value)
+    drifted += sum(1 for row in reviewer_rows if current_reviewers.get(row[0]) != row)
+
+    # 过期的按日/按月计数和已消失的状态一并清掉
+    await session.execute(delete(DashboardCounter))
+    await session.execute(delete(ReviewerScoreStats))
+    session.add_all(DashboardCounter(name=name, value=value) for name, value in counters.items())
+    session.add_all(
+        ReviewerScoreStats(reviewer_name=name, reviews=count, novelty_sum=novelty,
+                           soundness_sum=soundness, writing_sum=writing)
+        for name, count, novelty, soundness, writing in reviewer_rows
+    )
+    await session.flush()
+    return drifted
+
+
+async def reconcile_dashboard_stats() -> int:
+    """从原始表校正计数器，返回被校正的计数器个数。"""
+    global _cache
+    drifted = await write(_reconcile)
+    _stats["reconciles"] += 1
+    _stats["drifted_counters"] += drifted
+    _cache = None
+    if drifted:
+        logger.warning(f"Dashboard stats reconcile corrected {drifted} drifted counter(s)")
+    return drifted
+
+
+async def _reconcile_loop():
+    while True:
+        try:
+            await reconcile_dashboard_stats()
+        except Exception as e:
+            logger.error(f"Dashboard stats reconcile failed: {e}")
+        await asyncio.sleep(DASHBOARD_RECONCILE_INTERVAL_SECONDS)
+
+
+def start_stats_reconcile():
+    """启动后台对账（启动时立即执行一次）；间隔为 0 时只在启动时对账一次。"""
+    global _reconcile_task
+    if _reconcile_task is not None:
+        return
+    if DASHBOARD_RECONCILE_INTERVAL_SECONDS > 0:
+        _reconcile_task = asyncio.create_task(_reconcile_loop())
+    else:
+        _reconcile_task = asyncio.create_task(reconcile_dashboard_stats())
+
+
+async def stop_stats_reconcile():
+    global _reconcile_task
+    if _reconcile_task is not None:
+        _reconcile_task.cancel()
+        try:
+            await _reconcile_task
+        except asyncio.CancelledError:
+            pass
+        _reconcile_task = None
+
+
+# ---------- 读取 ----------
+
+def counters_query(prefix: str):
+    """名称以 prefix 开头的计数器，按名称排序（主键范围查询，prefix 以 ":" 结尾，上界为下一个字符 ";"）。"""
+    return select(DashboardCounter.name, DashboardCounter.value).where(
+        DashboardCounter.name >= prefix, DashboardCounter.name < prefix[:-1] + ";",
+    ).order_by(DashboardCounter.name)
+
+
+async def _counters(db: AsyncSession, prefix: str) -> dict[str, int]:
+    """{名称去掉前缀: 值}，值为 0 的（如论文全部离开该状态）不返回。"""
+    result = await db.execute(counters_query(prefix))
+    return {name.removeprefix(prefix): value for name, value in result.all() if value}
+
+
+async def status_counts(db: AsyncSession) -> dict[str, int]:
+    """各状态论文数。"""
+    return await _counters(db, "status:")
+
+
+async def published_issue_counts(db: AsyncSession) -> dict[str, int]:
+    """各期（YYYY-MM，按时间从早到晚）已发表论文数。"""
+    return await _counters(db, "published:")
+
+
+async def _load(db: AsyncSession) -> dict:
+    now = datetime.utcnow()
+    day, month = _day_key(now), _month_key(now)
+    result = await db.execute(
+        select(DashboardCounter.name, DashboardCounter.value).where(
+            DashboardCounter.name.in_(["reviews", f"submissions:{day}", f"submissions:{month}", f"active_users:{month}"])
+        )
+    )
+    counters = dict(result.all())
+    reviewers = (await db.execute(
+        select(ReviewerScoreStats).where(ReviewerScoreStats.reviews > 0).order_by(ReviewerScoreStats.reviewer_name)
+    )).scalars().all()
+    return {
+        "status_counts": await status_counts(db),
+        "total_reviews": counters.get("reviews", 0),
+        "today_submissions": counters.get(f"submissions:{day}", 0),
+        "month_submissions": counters.get(f"submissions:{month}", 0),
+        "active_users": counters.get(f"active_users:{month}", 0),
+        "reviewers": [
+            {
+                "name": row.reviewer_name,
+                "count": row.reviews,
+                "avg_novelty": row.novelty_sum / row.reviews,
+                "avg_soundness": row.soundness_sum / row.reviews,
+                "avg_writing": row.writing_sum / row.reviews,
+            }
+            for row in reviewers
+        ],
+    }
+
+
+async def get_dashboard_stats(db: AsyncSession) -> dict:
+    """面板数据（计数器原值），DASHBOARD_CACHE_SECONDS 内重复请求直接返回缓存。"""
+    global _cache
+    if _cache is not None and _cache[0] > time.monotonic():
+        _stats["cache_hits"] += 1
+        return _cache[1]
+    _stats["cache_misses"] += 1
+    data = await _load(db)
+    _cache = (time.monotonic() + DASHBOARD_CACHE_SECONDS, data)
+    return data
+
+
+def dashboard_counter_stats() -> dict:
+    return dict(_stats)
@@ -0,0 +1,185 @@
+"""单写者队列 — 审稿流程、校准和升降级的写操作都在这里串行执行，并把小提交合并成批。
+
+SQLite 同一时刻只允许一个写事务。各协程各自 commit 时会在数据库锁上互相等待（高峰期出现
+"database is locked"）；改为把写操作（接收 AsyncSession 的协程函数）放进队列，
+由唯一的写协程按批执行：一批最多 DB_WRITE_BATCH_MAX 个，攒批最多等 DB_WRITE_BATCH_WINDOW_MS，
+整批一个事务提交。批内某个操作失败时回滚整批，再逐个重试，只让失败的那个报错。
+写操作可能随重试执行不止一次，只能改数据库；进程内的状态（调用方持有的对象、内存索引）
+用 after_commit() 登记回调，批次提交成功后才执行，回调出错只记日志，不会让已提交的写操作重跑。
+
+读操作走只读会话（app.database.read_session），WAL 模式下不会被写事务阻塞。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import update, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.config import DB_WRITE_BATCH_MAX, DB_WRITE_BATCH_WINDOW_MS
+
+logger = logging.getLogger(__name__)
+
+WriteWork = Callable[[AsyncSession], Awaitable[Any]]
+
+
+class DBWriter:
+    def __init__(self, batch_max: int, batch_window: float):
+        self.batch_max = batch_max
+        self.batch_window = batch_window
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.stats = {"writes": 0, "batches": 0, "failed": 0, "retried_batches": 0, "callback_errors": 0, "max_batch": 0, "busy_seconds": 0.0}
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def write(self, work: WriteWork) -> Any:
+        """提交一个写操作并等待其所在批次提交完成，返回 work 的返回值。"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((work, future))
+        return await future
+
+    async def stop(self):
+        """处理完已入队的写操作后停止（应用关闭时调用）。"""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_max:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            start = time.monotonic()
+            try:
+                await self._commit_batch(batch)
+            finally:
+                self.stats["busy_seconds"] += time.monotonic() - start
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit_batch(self, batch: list):
+        from app.database import async_session
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+        try:
+            async with async_session() as session:
+                results = [await work(session) for work, _ in batch]
+                await session.commit()
+                callbacks = session.info.pop("after_commit", [])
+        except Exception as e:
+            if len(batch) == 1:
+                self._fail(batch[0][1], e)
+                return
+            # 逐个重试，定位失败的写操作
+            logger.warning(f"Write batch of {len(batch)} failed ({e}); retrying individually")
+            self.stats["retried_batches"] += 1
+            for item in batch:
+                await self._commit_batch([item])
+            return
+
+        # 在重试路径之外执行：批次已经提交，回调失败不能让写操作再执行一遍
+        self._run_callbacks(callbacks)
+        self.stats["writes"] += len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _run_callbacks(self, callbacks: list[Callable[[], None]]):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self.stats["callback_errors"] += 1
+                logger.error(f"After-commit callback failed: {e}")
+
+    def _fail(self, future: asyncio.Future, error: Exception):
+        self.stats["failed"] += 1
+        logger.error(f"Write failed: {error}")
+        if not future.done():
+            future.set_exception(error)
+
+
+db_writer = DBWriter(DB_WRITE_BATCH_MAX, DB_WRITE_BATCH_WINDOW_MS / 1000)
+
+
+async def write(work: WriteWork) -> Any:
+    return await db_writer.write(work)
+
+
+def after_commit(session: AsyncSession, callback: Callable[[], None]):
+    """
+    在写操作内登记回调：所在批次提交成功后执行；批次回滚时丢弃（逐个重试时由重新执行的写操作再登记）。
+    写操作对进程内状态的修改都应放在回调里，回调抛出的异常只记日志。
+    """
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+def add_rows(*rows) -> WriteWork:
+    """写操作：插入新记录（插入后 rows 上的主键等字段可直接读取）。"""
+    async def work(session: AsyncSession):
+        session.add_all(rows)
+        await session.flush()
+    return work
+
+
+def update_row(obj, **values) -> WriteWork:
+    """
+    写操作：按主键更新已加载对象的若干列。
+    提交成功后再把新值设到 obj 上（不标记为脏），调用方的只读会话里看到的就是已写入的值；
+    写入失败时 obj 保持原值。
+    """
+    mapper = inspect(obj).mapper
+    table = mapper.local_table
+    criteria = [column == getattr(obj, mapper.get_property_by_column(column).key) for column in mapper.primary_key]
+
+    def apply():
+        for key, value in values.items():
+            set_committed_value(obj, key, value)
+
+    async def work(session: AsyncSession):
+        await session.execute(update(table).where(*criteria).values(**values))
+        after_commit(session, apply)
+    return work
+
+
+def chain(*works: WriteWork) -> WriteWork:
+    """把多个写操作合成一个（在同一事务中按顺序执行）。"""
+    async def work(session: AsyncSession):
+        for w in works:
+            await w(session)
+    return work
+
+
+def db_writer_stats() -> dict:
+    stats = dict(db_writer.stats)
+    stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+    stats["queued"] = db_writer._queue.qsize() if db_writer._queue else 0
+    return stats
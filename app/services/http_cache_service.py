@@ -0,0 +1,242 @@
+"""HTTP 缓存 — 页面的 ETag / Last-Modified 与 304、静态资源指纹、HTML 压缩。
+
+页面：路由先查出数据版本（论文的 updated_at、审稿意见时间等，见 paper_query_service），
+据此生成弱 ETag；浏览器带 If-None-Match / If-Modified-Since 回访且版本未变时直接返回 304，
+不再渲染模板。ETag 中包含模板和静态文件的版本（ASSET_VERSION），改版部署后旧缓存自动失效。
+
+静态资源：模板里用 static_url("style.css") 生成 /static/style.css?v=<内容哈希>，
+带正确指纹的请求返回一年的 immutable 缓存头，文件内容变化后 URL 随之变化。
+
+压缩：text/html 响应超过 COMPRESS_MIN_BYTES 时按 Accept-Encoding 用 brotli（已安装时）或 gzip 压缩。
+"""
+
+import gzip
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from fastapi import Request
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from app.config import COMPRESS_MIN_BYTES
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只用 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = Path(__file__).resolve().parent.parent
+STATIC_DIR = APP_DIR / "static"
+TEMPLATES_DIR = APP_DIR / "templates"
+
+_stats = {"not_modified": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+# ---------- 静态资源指纹 ----------
+
+_fingerprints: dict[str, tuple[float, str]] = {}  # 相对路径 → (mtime, 内容哈希)
+
+
+def asset_hash(path: str) -> str | None:
+    """静态文件内容哈希的前 12 位（按 mtime 缓存），文件不存在时返回 None。"""
+    file = STATIC_DIR / path
+    try:
+        mtime = file.stat().st_mtime
+    except OSError:
+        return None
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    digest = hashlib.sha256(file.read_bytes()).hexdigest()[:12]
+    _fingerprints[path] = (mtime, digest)
+    return digest
+
+
+def static_url(path: str) -> str:
+    """模板中引用静态文件：/static/<path>?v=<内容哈希>。"""
+    digest = asset_hash(path)
+    return f"/static/{path}?v={digest}" if digest else f"/static/{path}"
+
+
+class FingerprintedStaticFiles(StaticFiles):
+    """指纹与文件内容一致的请求可永久缓存，其余（无指纹或指纹过期）每次都要重新验证。"""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            version = parse_qs(scope.get("query_string", b"").decode()).get("v", [None])[0]
+            if version and version == asset_hash(Path(path).as_posix()):
+                response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+def _asset_version() -> str:
+    """模板与静态文件的整体版本，任一文件内容变化都会改变。"""
+    digest = hashlib.sha256()
+    for root in (TEMPLATES_DIR, STATIC_DIR):
+        for file in sorted(root.rglob("*")):
+            if file.is_file():
+                digest.update(file.relative_to(APP_DIR).as_posix().encode())
+                digest.update(file.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+ASSET_VERSION = _asset_version()
+
+
+# ---------- 条件请求 ----------
+
+@dataclass
+class Validators:
+    etag: str
+    last_modified: datetime | None = None  # UTC（数据库中的时间均为 utcnow）
+
+
+def page_validators(*parts, last_modified: datetime | None = None) -> Validators:
+    """由数据版本（时间戳、计数等）生成弱 ETag。同一 URL 的内容只由这些值和模板版本决定。"""
+    raw = "|".join(str(part) for part in (ASSET_VERSION, *parts))
+    etag = f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+    return Validators(etag=etag, last_modified=last_modified)
+
+
+def _http_date(dt: datetime) -> str:
+    return format_datetime(dt.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _is_fresh(request: Request, validators: Validators) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # 弱比较：忽略 W/ 前缀
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or validators.etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return validators.last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+
+def _validator_headers(validators: Validators) -> dict:
+    headers = {"ETag": validators.etag, "Cache-Control": "no-cache"}
+    if validators.last_modified:
+        headers["Last-Modified"] = _http_date(validators.last_modified)
+    return headers
+
+
+def not_modified(request: Request, validators: Validators | None) -> Response | None:
+    """请求带的 ETag / 时间与当前版本一致时返回 304 响应，否则返回 None（照常渲染）。"""
+    if validators is None or request.method not in ("GET", "HEAD") or not _is_fresh(request, validators):
+        return None
+    _stats["not_modified"] += 1
+    return Response(status_code=304, headers=_validator_headers(validators))
+
+
+def with_validators(response: Response, validators: Validators | None) -> Response:
+    """给 200 响应加上 ETag / Last-Modified 和 Cache-Control: no-cache（每次回访都带条件请求）。"""
+    if validators is not None and response.status_code == 200:
+        response.headers.update(_validator_headers(validators))
+    return response
+
+
+# ---------- HTML 压缩 ----------
+
+def _choose_encoding(accept_encoding: str) -> str | None:
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)  # 动态页面用中等压缩级别，兼顾 CPU
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """
+    ASGI 中间件：压缩 text/html 响应。
+    页面都是一次性生成的完整 HTML，这里缓冲整个响应体后再压缩；其他类型原样透传。
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        chunks: list[bytes] = []
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if headers.get("content-type", "").startswith("text/html") and "content-encoding" not in headers:
+                    start_message = message  # 缓冲，等响应体完整后再决定是否压缩
+                    return
+                await send(message)
+            elif message["type"] == "http.response.body" and start_message is not None:
+                chunks.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                await self._send_compressed(send, start_message, b"".join(chunks), encoding)
+            else:
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_compressed(self, send, start_message, body: bytes, encoding: str):
+        headers = MutableHeaders(raw=start_message["headers"])
+        if len(body) >= self.minimum_size:
+            compressed = _compress(body, encoding)
+            _stats["compressed"] += 1
+            _stats["bytes_in"] += len(body)
+            _stats["bytes_out"] += len(compressed)
+            body = compressed
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+        headers.add_vary_header("Accept-Encoding")
+        await send(start_message)
+        await send({"type": "http.response.body", "body": body})
+
+
+def http_cache_stats() -> dict:
+    stats = dict(_stats)
+    stats["compression_ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3) if stats["bytes_in"] else 0.0
+    stats["brotli"] = brotli is not None
+    stats["asset_version"] = ASSET_VERSION
+    return stats
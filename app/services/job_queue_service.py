@@ -0,0 +1,339 @@
+"""持久化任务队列 — 基于 SQLite 的任务表 + 固定大小的 worker 池。
+
+任务写入 review_jobs 表后由 worker 通过租约领取，运行期间定期心跳续租。
+进程崩溃或重启时，心跳中断的任务在租约过期后会被重新领取，
+因此部署/重启不会再丢失正在进行的审稿流程。
+
+校准任务每位审稿人同时只有一个（部分唯一索引 ix_review_jobs_active_calibration），重复请求并入已有任务；
+领取时还要求运行中的校准数低于 CALIBRATION_MAX_CONCURRENCY（按任务表计数，多进程合计），
+校准占不满 worker 池，不会拖住审稿流程。
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func, or_, and_, true
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.database import async_session
+from app.models import Paper, ReviewJob
+from app.config import (
+    JOB_WORKER_CONCURRENCY, JOB_LEASE_SECONDS, JOB_HEARTBEAT_SECONDS,
+    JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL, CALIBRATION_MAX_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+ACTIVE_STATUSES = ("pending", "running")
+
+# 同一目标同时只允许一个活动任务的类型（由部分唯一索引保证，见迁移 6）
+SINGLETON_KINDS = ("calibration",)
+
+_stats = {"enqueued": 0, "coalesced": 0}
+
+
+def _get_handler(kind: str):
+    """按任务类型返回处理函数（延迟导入，避免循环依赖）。"""
+    if kind == "review":
+        from app.services.review_service import run_review_job
+        return run_review_job
+    if kind == "calibration":
+        from app.services.calibration_service import run_calibration_job
+        return run_calibration_job
+    raise ValueError(f"Unknown job kind: {kind}")
+
+
+def _get_failure_handler(kind: str):
+    """任务用尽重试次数后的处理函数（把目标转为终态），没有则返回 None。"""
+    if kind == "review":
+        from app.services.review_service import fail_review_job
+        return fail_review_job
+    return None
+
+
+async def _on_final_failure(kind: str, target_id: int, error: str):
+    handler = _get_failure_handler(kind)
+    if handler is None:
+        return
+    try:
+        await handler(target_id, error)
+    except Exception as e:
+        logger.error(f"Failure handler for {kind} {target_id} failed: {e}")
+
+
+def active_job_query(kind: str, target_id: int):
+    """目标的待执行/运行中任务（走 ix_review_jobs_target）。"""
+    return select(ReviewJob).where(
+        ReviewJob.target_id == target_id, ReviewJob.kind == kind, ReviewJob.status.in_(ACTIVE_STATUSES),
+    )
+
+
+async def active_job(db: AsyncSession, kind: str, target_id: int) -> ReviewJob | None:
+    return (await db.execute(active_job_query(kind, target_id).limit(1))).scalars().first()
+
+
+def add_job(db: AsyncSession, kind: str, target_id: int) -> ReviewJob:
+    """
+    把任务加入调用方的会话，随调用方的事务一起提交（业务数据和任务要么都写入，要么都不写入）。
+    提交后由调用方调用 job_pool.wake()。SINGLETON_KINDS 需要去重，只能用 enqueue_job。
+    """
+    if kind in SINGLETON_KINDS:
+        raise ValueError(f"{kind} jobs must be enqueued with enqueue_job")
+    job = ReviewJob(kind=kind, target_id=target_id, status="pending")
+    db.add(job)
+    _stats["enqueued"] += 1
+    return job
+
+
+async def enqueue_job(db: AsyncSession, kind: str, target_id: int) -> ReviewJob:
+    """
+    写入一条待执行任务并唤醒本进程的 worker。
+    SINGLETON_KINDS 的任务在目标已有待执行/运行中的任务时不再新建，返回已有的任务。
+    """
+    if kind in SINGLETON_KINDS:
+        job_id = await db.scalar(
+            insert(ReviewJob).values(kind=kind, target_id=target_id, status="pending")
+            .on_conflict_do_nothing().returning(ReviewJob.id)
+        )
+        await db.commit()
+        if job_id is None:
+            _stats["coalesced"] += 1
+            if job := await active_job(db, kind, target_id):
+                return job
+            # 已有任务恰好在这期间结束，重新入队
+            return await enqueue_job(db, kind, target_id)
+        job = await db.get(ReviewJob, job_id)
+        _stats["enqueued"] += 1
+    else:
+        job = add_job(db, kind, target_id)
+        await db.commit()
+        await db.refresh(job)
+    job_pool.wake()
+    return job
+
+
+def _within_calibration_budget(now: datetime):
+    """校准任务只在运行中（租约未过期）的校准数低于上限时可领取，其他任务不受限。"""
+    if CALIBRATION_MAX_CONCURRENCY <= 0:
+        return true()
+    running = aliased(ReviewJob)
+    running_calibrations = select(func.count(running.id)).where(
+        running.kind == "calibration", running.status == "running", running.lease_expires_at >= now,
+    ).scalar_subquery()
+    return or_(ReviewJob.kind != "calibration", running_calibrations < CALIBRATION_MAX_CONCURRENCY)
+
+
+def _claimable(now: datetime):
+    """可领取条件：待执行，或运行中但租约已过期（原 worker 已失联）；校准任务另受全局并发上限约束。"""
+    return and_(
+        ReviewJob.attempts < JOB_MAX_ATTEMPTS,
+        or_(
+            ReviewJob.status == "pending",
+            and_(ReviewJob.status == "running", ReviewJob.lease_expires_at < now),
+        ),
+        _within_calibration_budget(now),
+    )
+
+
+async def _claim_next(owner: str) -> ReviewJob | None:
+    """原子地领取一条任务。多进程竞争时由条件 UPDATE 保证只有一个成功。"""
+    async with async_session() as db:
+        while True:
+            now = datetime.utcnow()
+            job_id = await db.scalar(
+                select(ReviewJob.id).where(_claimable(now)).order_by(ReviewJob.id).limit(1)
+            )
+            if job_id is None:
+                return None
+
+            result = await db.execute(
+                update(ReviewJob)
+                .where(ReviewJob.id == job_id, _claimable(now))
+                .values(
+                    status="running",
+                    attempts=ReviewJob.attempts + 1,
+                    lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    heartbeat_at=now,
+                    started_at=now,
+                )
+            )
+            await db.commit()
+            if result.rowcount == 1:
+                return await db.get(ReviewJob, job_id)
+            # 被其他 worker 抢先，重试下一条
+
+
+async def _heartbeat(job_id: int, owner: str):
+    """定期续租，直到被取消。"""
+    while True:
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            async with async_session() as db:
+                now = datetime.utcnow()
+                result = await db.execute(
+                    update(ReviewJob)
+                    .where(ReviewJob.id == job_id, ReviewJob.lease_owner == owner)
+                    .values(
+                        heartbeat_at=now,
+                        lease_expires_at=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    )
+                )
+                await db.commit()
+                if result.rowcount == 0:
+                    logger.warning(f"Job #{job_id} lease lost by {owner}")
+        except Exception as e:
+            logger.error(f"Heartbeat for job #{job_id} failed: {e}")
+
+
+async def _finish(job_id: int, owner: str, status: str, error: str = "", interrupted: bool = False):
+    async with async_session() as db:
+        values = {"status": status, "last_error": error[:2000], "lease_expires_at": None}
+        if status in ("done", "failed"):
+            values["finished_at"] = datetime.utcnow()
+        if status == "pending":
+            values["lease_owner"] = ""
+        if interrupted:
+            # 被关闭打断不算一次失败尝试
+            values["attempts"] = ReviewJob.attempts - 1
+        await db.execute(
+            update(ReviewJob)
+            .where(ReviewJob.id == job_id, ReviewJob.lease_owner == owner)
+            .values(**values)
+        )
+        await db.commit()
+
+
+async def _run_job(job: ReviewJob, owner: str):
+    heartbeat = asyncio.create_task(_heartbeat(job.id, owner))
+    try:
+        handler = _get_handler(job.kind)
+        await handler(job.target_id)
+    except asyncio.CancelledError:
+        # 进程正常关闭：释放租约，让任务在下次启动时立即恢复
+        await asyncio.shield(_finish(job.id, owner, "pending", "Interrupted by shutdown", interrupted=True))
+        raise
+    except Exception as e:
+        logger.exception(f"Job #{job.id} ({job.kind} {job.target_id}) failed on attempt {job.attempts}")
+        final = job.attempts >= JOB_MAX_ATTEMPTS
+        await _finish(job.id, owner, "failed" if final else "pending", str(e))
+        if final:
+            await _on_final_failure(job.kind, job.target_id, str(e))
+    else:
+        await _finish(job.id, owner, "done")
+    finally:
+        heartbeat.cancel()
+
+
+async def fail_exhausted_jobs():
+    """把用尽重试次数、且租约已过期的运行中任务标记为失败。"""
+    async with async_session() as db:
+        now = datetime.utcnow()
+        result = await db.execute(
+            update(ReviewJob)
+            .where(
+                ReviewJob.status == "running",
+                ReviewJob.attempts >= JOB_MAX_ATTEMPTS,
+                ReviewJob.lease_expires_at < now,
+            )
+            .values(status="failed", finished_at=now, last_error="Lease expired on final attempt")
+            .returning(ReviewJob.kind, ReviewJob.target_id)
+        )
+        failed = result.all()
+        await db.commit()
+    if failed:
+        logger.warning(f"Marked {len(failed)} exhausted job(s) as failed")
+    for kind, target_id in failed:
+        await _on_final_failure(kind, target_id, "Lease expired on final attempt")
+
+
+async def recover_orphaned_reviews():
+    """
+    启动时恢复：为卡在 under_review 但没有活动任务的论文、以及从未入队的 submitted 论文重新入队。
+    （例如旧版本用 create_task 启动、随进程重启丢失的审稿流程；旧版本投稿时论文和任务分两次提交，中间崩溃留下的论文）
+    审稿任务已失败（用尽重试）的论文不再入队，转为 review_failed。
+    """
+    async with async_session() as db:
+        active = select(ReviewJob.target_id).where(
+            ReviewJob.kind == "review",
+            ReviewJob.status.in_(ACTIVE_STATUSES),
+        )
+        failed = select(ReviewJob.target_id).where(ReviewJob.kind == "review", ReviewJob.status == "failed")
+        any_job = select(ReviewJob.target_id).where(ReviewJob.kind == "review")
+        pending_review = Paper.status.in_(("submitted", "under_review"))
+        result = await db.execute(
+            select(Paper.id).where(or_(
+                and_(Paper.status == "under_review", Paper.id.not_in(active), Paper.id.not_in(failed)),
+                and_(Paper.status == "submitted", Paper.id.not_in(any_job)),
+            ))
+        )
+        paper_ids = [row[0] for row in result.all()]
+        for paper_id in paper_ids:
+            db.add(ReviewJob(kind="review", target_id=paper_id, status="pending"))
+        if paper_ids:
+            await db.commit()
+            logger.info(f"Re-queued {len(paper_ids)} orphaned review(s): {paper_ids}")
+        # 旧版本留下的：任务已失败、论文仍停在审稿中
+        stuck = (await db.execute(
+            select(Paper.id).where(pending_review, Paper.id.in_(failed), Paper.id.not_in(active))
+        )).scalars().all()
+    for paper_id in stuck:
+        await _on_final_failure("review", paper_id, "Review job failed before this restart")
+
+
+class JobWorkerPool:
+    """固定大小的 worker 池，保证同时运行的任务数不超过 concurrency。"""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._workers: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    async def start(self):
+        await fail_exhausted_jobs()
+        await recover_orphaned_reviews()
+        for i in range(self.concurrency):
+            owner = f"{WORKER_ID}:{i}"
+            self._workers.append(asyncio.create_task(self._worker_loop(owner)))
+        logger.info(f"Started {self.concurrency} job worker(s) as {WORKER_ID}")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker_loop(self, owner: str):
+        while True:
+            try:
+                job = await _claim_next(owner)
+            except Exception as e:
+                logger.error(f"Worker {owner} failed to claim job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                continue
+
+            await _run_job(job, owner)
+
+
+job_pool = JobWorkerPool(JOB_WORKER_CONCURRENCY)
+
+
+def job_queue_stats() -> dict:
+    return dict(_stats)
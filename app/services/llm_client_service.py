@@ -0,0 +1,219 @@
+"""共享 LLM 客户端注册表 — 按 (base_url, api_key) 复用 AsyncOpenAI 客户端和连接池。
+
+进程内每个端点只建一个客户端，所有审稿人 / 主编 / Prompt 模式社区审稿人共用，
+避免每次审稿都重新握手 TLS。启动时预热内置 provider 的连接，关闭时统一释放。
+
+社区审稿人自带端点（API 模式）的客户端数量随注册人数增长，单独放在 LRU 池中：
+最多保留 GUEST_CLIENT_POOL_SIZE 个，空闲超过 GUEST_CLIENT_IDLE_SECONDS 或被挤出时关闭；
+正在调用中的客户端不会被回收。这些端点不可信，响应体在读取时计数，超过 GUEST_MAX_RESPONSE_BYTES
+立即中止（流式和一次性返回都一样，不会先把整个响应读进内存）；只接受未压缩的响应，避免压缩炸弹。
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from app.config import (
+    OPENROUTER_API_KEY, OPENROUTER_BASE_URL,
+    DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL,
+    LLM_POOL_MAX_CONNECTIONS, LLM_POOL_MAX_KEEPALIVE, LLM_POOL_KEEPALIVE_EXPIRY,
+    LLM_HTTP2, LLM_WARMUP_TIMEOUT,
+    GUEST_CLIENT_POOL_SIZE, GUEST_CLIENT_IDLE_SECONDS, GUEST_MAX_RESPONSE_BYTES,
+)
+from app.services.provider_limit_service import endpoint_label
+
+logger = logging.getLogger(__name__)
+
+_clients: dict[tuple[str, str], AsyncOpenAI] = {}
+_http_clients: dict[tuple[str, str], httpx.AsyncClient] = {}
+_checkouts: dict[tuple[str, str], int] = {}
+
+
+
+@dataclass
+class _GuestClient:
+    client: AsyncOpenAI
+    http_client: httpx.AsyncClient
+    in_use: int = 0  # 进行中的调用数
+    last_used: float = field(default_factory=time.monotonic)
+
+
+# 社区审稿人端点的客户端，按最近使用排序（最久未用的在前）
+_guest_clients: OrderedDict[tuple[str, str], _GuestClient] = OrderedDict()
+
+
+def _http2_available() -> bool:
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("LLM_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+
+
+class ResponseRejected(Exception):
+    """不可信端点的响应超出大小上限或使用了压缩编码，已中止读取。"""
+
+
+class _CappedStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, max_bytes: int):
+        self._stream = stream
+        self._max_bytes = max_bytes
+
+    async def __aiter__(self):
+        received = 0
+        async for chunk in self._stream:
+            received += len(chunk)
+            if received > self._max_bytes:
+                raise ResponseRejected(f"response exceeded {self._max_bytes} bytes")
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+
+class _CappedTransport(httpx.AsyncBaseTransport):
+    """在传输层给响应体计数：超过 max_bytes 时中止读取，拒绝压缩过的响应（解压后的大小无法在这里限制）。"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_bytes: int):
+        self._transport = transport
+        self._pool = getattr(transport, "_pool", None)  # client_pool_stats 读取连接池状态
+        self._max_bytes = max_bytes
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.headers["Accept-Encoding"] = "identity"
+        response = await self._transport.handle_async_request(request)
+        encoding = response.headers.get("Content-Encoding", "identity").strip().lower()
+        if encoding != "identity":
+            await response.aclose()
+            raise ResponseRejected(f"compressed response ({encoding}) refused")
+        response.stream = _CappedStream(response.stream, self._max_bytes)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _new_client(base_url: str, api_key: str, max_response_bytes: int = 0) -> tuple[AsyncOpenAI, httpx.AsyncClient]:
+    """max_response_bytes > 0 时限制响应体大小（不可信端点）。"""
+    limits = httpx.Limits(
+        max_connections=LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY,
+    )
+    if max_response_bytes > 0:
+        transport = _CappedTransport(httpx.AsyncHTTPTransport(limits=limits, http2=_http2_available()), max_response_bytes)
+        http_client = openai.DefaultAsyncHttpxClient(transport=transport)
+    else:
+        http_client = openai.DefaultAsyncHttpxClient(limits=limits, http2=_http2_available())
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client), http_client
+
+
+def get_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    """获取（或创建）指定端点的共享客户端。"""
+    key = ((base_url or "").rstrip("/"), api_key or "")
+    client = _clients.get(key)
+    if client is None:
+        client, http_client = _new_client(base_url, api_key)
+        _clients[key] = client
+        _http_clients[key] = http_client
+        _checkouts[key] = 0
+    _checkouts[key] += 1
+    return client
+
+
+async def _close(client: AsyncOpenAI):
+    try:
+        await client.close()
+    except Exception as e:
+        logger.error(f"Failed to close LLM client: {e}")
+
+
+def _evict_guest_clients() -> list[AsyncOpenAI]:
+    """取出超出容量或空闲过久的社区审稿人客户端（只取没有进行中调用的），由调用方关闭。"""
+    now = time.monotonic()
+    evicted = []
+    for key, entry in list(_guest_clients.items()):
+        if entry.in_use:
+            continue
+        if len(_guest_clients) > GUEST_CLIENT_POOL_SIZE or now - entry.last_used > GUEST_CLIENT_IDLE_SECONDS:
+            del _guest_clients[key]
+            _checkouts.pop(key, None)
+            evicted.append(entry.client)
+    return evicted
+
+
+@asynccontextmanager
+async def guest_client(base_url: str, api_key: str):
+    """在 with 块内借用社区审稿人自带端点的客户端（LRU 复用，块内不会被回收）。"""
+    key = ((base_url or "").rstrip("/"), api_key or "")
+    entry = _guest_clients.get(key)
+    if entry is None:
+        entry = _guest_clients[key] = _GuestClient(*_new_client(base_url, api_key, GUEST_MAX_RESPONSE_BYTES))
+        _checkouts[key] = 0
+    _guest_clients.move_to_end(key)
+    _checkouts[key] += 1
+    entry.in_use += 1
+    try:
+        for client in _evict_guest_clients():
+            await _close(client)
+        yield entry.client
+    finally:
+        entry.in_use -= 1
+        entry.last_used = time.monotonic()
+
+
+async def _warmup_one(base_url: str, api_key: str):
+    key = (base_url.rstrip("/"), api_key)
+    get_client(base_url, api_key)
+    try:
+        # 任意响应（包括 404）都会完成 TCP/TLS 握手，连接随后保留在池中
+        await asyncio.wait_for(_http_clients[key].head(base_url), timeout=LLM_WARMUP_TIMEOUT)
+        logger.info(f"Warmed up LLM connection to {base_url}")
+    except Exception as e:
+        logger.warning(f"Warmup for {base_url} failed: {e}")
+
+
+async def warmup_clients():
+    """预热所有已配置 API key 的内置 provider。"""
+    targets = []
+    if OPENROUTER_API_KEY:
+        targets.append((OPENROUTER_BASE_URL, OPENROUTER_API_KEY))
+    if DEEPSEEK_API_KEY:
+        targets.append((DEEPSEEK_BASE_URL, DEEPSEEK_API_KEY))
+    await asyncio.gather(*(_warmup_one(url, key) for url, key in targets))
+
+
+async def close_clients():
+    """关闭所有共享客户端（应用关闭时调用）。"""
+    for client in [*_clients.values(), *(entry.client for entry in _guest_clients.values())]:
+        await _close(client)
+    _clients.clear()
+    _http_clients.clear()
+    _guest_clients.clear()
+    _checkouts.clear()
+
+
+def client_pool_stats() -> list[dict]:
+    """各客户端的复用次数与连接池状态（社区审稿人端点只列出池中现存的）。"""
+    stats = []
+    pooled = [*_http_clients.items(), *((key, entry.http_client) for key, entry in _guest_clients.items())]
+    for key, http_client in pooled:
+        pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        stats.append({
+            "endpoint": endpoint_label(key[0]),
+            "checkouts": _checkouts.get(key, 0),
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+        })
+    return stats
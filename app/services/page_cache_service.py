@@ -0,0 +1,120 @@
+"""渲染结果缓存 — 缓存已有主编决定的论文详情页渲染好的 HTML。
+
+决定之后页面仍可能变化（迟到的社区审稿、重新审稿），所以每个页面连同渲染时的数据版本
+（详情页 ETag，由 paper_version_query 得出）一起保存，只在版本一致时命中；
+其他 worker 写入的变化也会让版本变化，不依赖进程内的失效通知。每个页面只保留最新版本。
+进程内 LRU，按 HTML 字节数计入内存预算（PAGE_CACHE_MAX_MB），超出时淘汰最久未访问的页面。
+同一页面同一版本的并发未命中只渲染一次（single-flight），其余请求等待同一结果。
+本进程的审稿流程写入后仍调用 invalidate() 及时释放旧版本占用的内存。
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from app.config import PAGE_CACHE_MAX_MB
+
+logger = logging.getLogger(__name__)
+
+# 渲染函数返回 (HTML, 是否可缓存)
+Renderer = Callable[[], Awaitable[tuple[str, bool]]]
+
+
+class PageCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._pages: OrderedDict[str, tuple[str, bytes]] = OrderedDict()  # key → (数据版本, HTML)
+        self._bytes = 0
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+    def get(self, key: str, version: str) -> bytes | None:
+        entry = self._pages.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._pages.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, version: str, page: bytes):
+        if len(page) > self.max_bytes:
+            return
+        self._drop(key)
+        self._pages[key] = (version, page)
+        self._bytes += len(page)
+        self.stats["stores"] += 1
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._pages.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.stats["evictions"] += 1
+
+    def _drop(self, key: str) -> bool:
+        entry = self._pages.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry[1])
+        return True
+
+    def invalidate(self, key: str):
+        if self._drop(key):
+            self.stats["invalidations"] += 1
+
+    async def get_or_render(self, key: str, version: str, render: Renderer) -> bytes:
+        """命中（版本一致）直接返回；未命中时渲染，同一 key 同一版本的并发请求共享一次渲染。"""
+        page = self.get(key, version)
+        if page is not None:
+            self.stats["hits"] += 1
+            return page
+
+        flight = (key, version)
+        inflight = self._inflight.get(flight)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            page = await asyncio.shield(inflight)
+            if page is not None:
+                return page
+            # 首个请求渲染失败，自己再渲染一次（不缓存）
+            html, _ = await render()
+            return html.encode()
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[flight] = future
+        try:
+            html, cacheable = await render()
+            page = html.encode()
+            # 渲染在读取版本之后进行，内容不会比版本旧；渲染期间发生的写入会换版本号，之后的请求重新渲染
+            if cacheable:
+                self.put(key, version, page)
+            future.set_result(page)
+            return page
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            del self._inflight[flight]
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "pages": len(self._pages),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+        }
+
+
+page_cache = PageCache(PAGE_CACHE_MAX_MB * 1024 * 1024)
+
+
+def paper_page_key(paper_id: int) -> str:
+    return f"paper:{paper_id}"
+
+
+def invalidate_paper_page(paper_id: int):
+    page_cache.invalidate(paper_page_key(paper_id))
+
+
+def page_cache_stats() -> dict:
+    return page_cache.snapshot()
@@ -0,0 +1,150 @@
+"""论文列表查询 — 列表页只投影展示需要的列，不加载正文和审稿意见。
+
+Paper 的关联（reviews / editorial_decision）默认 lazy="raise"，
+需要的页面必须在查询里显式 selectinload，避免列表页悄悄把整库的审稿意见带出来。
+
+列表按 (排序时间, id) 做游标分页：每页只取 per_page + 1 行判断是否还有下一页，
+不做 OFFSET 也不统计总行数，翻到多深都只读一页的数据。
+
+页面的 ETag 由数据版本查询得出（papers_validators / paper_validators），版本未变时路由直接返回 304。
+"""
+
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.orm import selectinload
+
+from app.config import PAPERS_PAGE_SIZE, PAPERS_MAX_PAGE_SIZE
+from app.models import Paper, Review, PaperKeyword
+from app.services.assignment_service import normalize_keywords
+from app.services.http_cache_service import Validators, page_validators
+
+# 列表页摘要截取长度（多取一个字符，模板据此判断是否需要省略号）
+ABSTRACT_PREVIEW_CHARS = 250
+
+PAPER_SUMMARY_COLUMNS = (
+    Paper.id,
+    Paper.title,
+    Paper.authors,
+    func.substr(Paper.abstract, 1, ABSTRACT_PREVIEW_CHARS + 1).label("abstract"),
+    Paper.keywords,
+    Paper.status,
+    Paper.publication_number,
+    Paper.submitted_at,
+    Paper.decided_at,
+)
+
+
+def paper_summaries():
+    """列表页查询：返回只含摘要列的行（属性访问方式与 Paper 相同），调用方再加 where / order_by / limit。"""
+    return select(*PAPER_SUMMARY_COLUMNS)
+
+
+def add_paper_keywords(session, paper: Paper):
+    """投稿时在论文 flush 之后调用：写入关键词倒排索引行，随论文一起提交。"""
+    session.add_all(
+        PaperKeyword(keyword=keyword, paper_id=paper.id, submitted_at=paper.submitted_at)
+        for keyword in normalize_keywords(paper.keywords)
+    )
+
+
+def with_keyword(query, keyword: str):
+    """按关键词过滤（与投稿时同样规范化后精确匹配），分页用 PaperKeyword.submitted_at / paper_id 走索引。"""
+    return query.join(PaperKeyword, PaperKeyword.paper_id == Paper.id).where(
+        PaperKeyword.keyword == keyword.strip().lower()[:100]
+    )
+
+
+async def get_paper_with_reviews(db, paper_id: int) -> Paper | None:
+    """详情页：加载论文及其审稿意见和主编决定。"""
+    return await db.get(
+        Paper, paper_id,
+        options=[selectinload(Paper.reviews), selectinload(Paper.editorial_decision)],
+    )
+
+
+def papers_version_query():
+    """列表页的数据版本：最近一次新增或修改论文的时间（走 ix_papers_updated，只读一行）。"""
+    return select(func.max(Paper.updated_at))
+
+
+def paper_version_query(paper_id: int):
+    """详情页的数据版本：论文本身的修改时间，加上审稿意见的条数和最新时间（迟到审稿不改论文行）。"""
+    return (
+        select(Paper.updated_at, Paper.decided_at, func.count(Review.id), func.max(Review.reviewed_at))
+        .outerjoin(Review, Review.paper_id == Paper.id)
+        .where(Paper.id == paper_id)
+        .group_by(Paper.id)
+    )
+
+
+async def papers_validators(db) -> Validators:
+    updated_at = (await db.execute(papers_version_query())).scalar()
+    return page_validators(updated_at, last_modified=updated_at)
+
+
+async def paper_validators(db, paper_id: int) -> Validators | None:
+    """论文不存在时返回 None。"""
+    row = (await db.execute(paper_version_query(paper_id))).first()
+    if row is None:
+        return None
+    updated_at, decided_at, review_count, last_review = row
+    stamps = [t for t in (updated_at, decided_at, last_review) if t]
+    return page_validators(paper_id, updated_at, decided_at, review_count, last_review,
+                           last_modified=max(stamps) if stamps else None)
+
+
+# 已发表论文按决定时间排序和分期（旧数据缺决定时间时退回投稿时间）
+PUBLISHED_SORT_KEY = func.coalesce(Paper.decided_at, Paper.submitted_at)
+
+
+@dataclass
+class PaperPage:
+    items: list
+    per_page: int
+    next_cursor: str | None = None
+
+
+def page_size(per_page: int | None) -> int:
+    """请求的每页条数，限制在 [1, PAPERS_MAX_PAGE_SIZE]。"""
+    if not per_page:
+        return PAPERS_PAGE_SIZE
+    return max(1, min(per_page, PAPERS_MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort_value: datetime, paper_id: int) -> str:
+    raw = f"{sort_value.isoformat()}|{paper_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    """解析游标，格式不对时返回 None（从第一页开始）。"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        sort_value, paper_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(sort_value), int(paper_id)
+    except ValueError:
+        return None
+
+
+async def paginate(db, query, sort_key, cursor: str | None, per_page: int, id_key=Paper.id) -> PaperPage:
+    """
+    按 (sort_key, id_key) 倒序取一页。
+    query 是 paper_summaries() 加上过滤条件；游标指向上一页最后一行，本页从它之后开始。
+    id_key 是与 Paper.id 相等、和 sort_key 在同一个索引里的列（如 PaperKeyword.paper_id）。
+    """
+    query = query.add_columns(sort_key.label("sort_key")).order_by(sort_key.desc(), id_key.desc())
+    position = decode_cursor(cursor)
+    if position:
+        query = query.where(tuple_(sort_key, id_key) < position)
+    rows = (await db.execute(query.limit(per_page + 1))).all()
+
+    page = PaperPage(items=rows[:per_page], per_page=per_page)
+    if len(rows) > per_page:
+        last = page.items[-1]
+        page.next_cursor = encode_cursor(last.sort_key, last.id)
+    return page
@@ -1,48 +1,232 @@
-"""论文处理服务 — 文件保存、文本提取。"""
+"""论文处理服务 — 文件保存、文本提取。
 
-import uuid
+上传文件按固定大小分块写入临时文件，边写边计算 SHA-256 和大小，
+通过大小上限和文件头（magic bytes）校验后才原子重命名进内容寻址存储，单次上传的内存占用恒定。
+相同内容的文件只存一份，提取出的文本按 blob 缓存，重复上传不再运行 PyMuPDF。
+
+PDF 提取每个文件在独立的子进程中进行（最多 PDF_EXTRACT_WORKERS 个同时运行，有页数上限、单文件超时和进程内存上限），
+不占用事件循环，也不会因为一个异常 PDF 拖垮 Web 进程：超时只终止该文件的进程，不影响其他正在提取的稿件。
+"""
+
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from pathlib import Path
 
-from app.config import UPLOAD_DIR
+from fastapi import UploadFile
+
+from app.services.blob_store_service import commit_blob, resolve_upload, read_cached_text, write_cached_text
+
+from app.config import (
+    UPLOAD_TMP_DIR, UPLOAD_MAX_BYTES, UPLOAD_CHUNK_BYTES,
+    PDF_EXTRACT_WORKERS, PDF_EXTRACT_TIMEOUT, PDF_MAX_PAGES, PDF_EXTRACT_MEMORY_MB,
+)
+
+logger = logging.getLogger(__name__)
+
+TEXT_SUFFIXES = (".md", ".txt", ".tex")
+ALLOWED_SUFFIXES = (".pdf",) + TEXT_SUFFIXES
+
+
+class UploadRejected(ValueError):
+    """上传文件不符合要求（过大 / 类型不符），消息可直接展示给用户。"""
+
 
+@dataclass
+class StoredUpload:
+    path: str  # 相对 UPLOAD_DIR，写入 Paper.file_path
+    sha256: str
+    size: int
 
-def save_upload(filename: str, content: bytes) -> str:
-    """保存上传的文件，返回文件路径。"""
+
+def _check_magic(suffix: str, head: bytes):
+    """按文件头校验类型：PDF 必须以 %PDF- 开头，文本文件不能含 NUL 字节。"""
+    if suffix == ".pdf":
+        if not head.startswith(b"%PDF-"):
+            raise UploadRejected("The uploaded file is not a valid PDF.")
+    elif head.startswith(b"%PDF-"):
+        raise UploadRejected("The uploaded file is a PDF — please upload it with a .pdf extension.")
+    elif b"\x00" in head:
+        raise UploadRejected("The uploaded file does not look like a text file.")
+
+
+async def save_upload(file: UploadFile) -> StoredUpload:
+    """
+    流式保存上传文件：分块写入临时文件并计算 SHA-256，
+    超过 UPLOAD_MAX_BYTES 或文件头与扩展名不符时抛 UploadRejected，临时文件随即删除。
+    """
+    filename = Path(file.filename or "upload").name
     suffix = Path(filename).suffix.lower()
-    unique_name = f"{uuid.uuid4().hex[:8]}_{filename}"
-    file_path = UPLOAD_DIR / unique_name
-    file_path.write_bytes(content)
-    return str(file_path)
+    if suffix not in ALLOWED_SUFFIXES:
+        raise UploadRejected(f"Unsupported file type '{suffix or filename}'. Please upload PDF, Markdown, TXT or LaTeX.")
 
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_name = tempfile.mkstemp(dir=UPLOAD_TMP_DIR, suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                if size == 0:
+                    _check_magic(suffix, chunk[:1024])
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise UploadRejected(f"File is too large (limit {UPLOAD_MAX_BYTES // (1024 * 1024)} MB).")
+                digest.update(chunk)
+                await asyncio.to_thread(tmp.write, chunk)
+            await asyncio.to_thread(os.fsync, tmp.fileno())
+        if size == 0:
+            raise UploadRejected("The uploaded file is empty.")
 
-def extract_text(file_path: str) -> str:
-    """从文件中提取文本内容。支持 PDF 和 Markdown/文本文件。"""
+        sha256 = digest.hexdigest()
+        file_path = await asyncio.to_thread(commit_blob, tmp_name, sha256, suffix)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    return StoredUpload(path=file_path, sha256=sha256, size=size)
+
+
+def extract_text(file_path: str, max_pages: int = PDF_MAX_PAGES) -> tuple[str, int]:
+    """从文件中提取文本内容。支持 PDF 和 Markdown/文本文件。返回 (文本, 页数)，非 PDF 页数为 0。"""
     path = Path(file_path)
     suffix = path.suffix.lower()
 
     if suffix == ".pdf":
-        return _extract_pdf_text(path)
-    elif suffix in (".md", ".txt", ".tex"):
-        return path.read_text(encoding="utf-8", errors="ignore")
+        return _extract_pdf_text(path, max_pages)
+    elif suffix in TEXT_SUFFIXES:
+        return path.read_text(encoding="utf-8", errors="ignore"), 0
     else:
         # 尝试作为文本读取
         try:
-            return path.read_text(encoding="utf-8", errors="ignore")
+            return path.read_text(encoding="utf-8", errors="ignore"), 0
         except Exception:
-            return "[Unable to extract text from this file format]"
+            return "[Unable to extract text from this file format]", 0
 
 
-def _extract_pdf_text(path: Path) -> str:
-    """使用PyMuPDF从PDF提取文本。"""
+def _extract_pdf_text(path: Path, max_pages: int) -> tuple[str, int]:
+    """使用PyMuPDF从PDF提取文本（最多 max_pages 页）。"""
     try:
         import fitz  # PyMuPDF
         doc = fitz.open(str(path))
+        total_pages = doc.page_count
         text_parts = []
-        for page in doc:
+        for page in doc.pages(0, min(total_pages, max_pages)):
             text_parts.append(page.get_text())
         doc.close()
-        return "\n".join(text_parts)
+        if total_pages > max_pages:
+            text_parts.append(f"\n[Truncated: only the first {max_pages} of {total_pages} pages were extracted]")
+        return "\n".join(text_parts), total_pages
     except ImportError:
-        return "[PyMuPDF not installed — cannot extract PDF text]"
+        return "[PyMuPDF not installed — cannot extract PDF text]", 0
+    except MemoryError:
+        return "[PDF extraction error: file exceeds the extraction memory limit]", 0
     except Exception as e:
-        return f"[PDF extraction error: {e}]"
+        return f"[PDF extraction error: {e}]", 0
+
+
+def _init_worker(memory_mb: int):
+    """提取进程初始化：限制地址空间，超限时抛 MemoryError 而不是拖垮整机。"""
+    if memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError) as e:
+        # Windows 没有 resource 模块；部分容器不允许调整 rlimit
+        logger.warning(f"Could not set extraction memory limit: {e}")
+
+
+# 同时运行的提取进程数；排队等待名额的时间不计入超时
+_slots: asyncio.Semaphore | None = None
+# 正在运行的提取进程（关闭应用时终止）
+_running: set[ProcessPoolExecutor] = set()
+
+# 提取进程意外退出（非本文件超时）时的重试次数，如被系统 OOM killer 误杀
+_CRASH_RETRIES = 1
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(PDF_EXTRACT_WORKERS)
+    return _slots
+
+
+def _kill(executor: ProcessPoolExecutor):
+    """终止一个提取进程（只影响这一个文件的提取）。"""
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _extract_in_process(file_path: str) -> tuple[str, int]:
+    """占到名额后为这个文件单独起一个提取进程，超时从进程开始运行时计算；超时或被取消时终止该进程。"""
+    loop = asyncio.get_running_loop()
+    async with _get_slots():
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(PDF_EXTRACT_MEMORY_MB,),
+        )
+        _running.add(executor)
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, extract_text, file_path, PDF_MAX_PAGES),
+                timeout=PDF_EXTRACT_TIMEOUT,
+            )
+        except BaseException:
+            _kill(executor)
+            raise
+        finally:
+            _running.discard(executor)
+            executor.shutdown(wait=False)
+
+
+async def extract_text_async(file_path: str) -> tuple[str, int, float]:
+    """
+    在独立进程中提取文本，返回 (文本, 页数, 耗时秒数)。
+    超时或提取进程崩溃（如超出内存上限，重试后仍失败）时返回以 "[" 开头的错误说明，与同步版本的约定一致。
+    被取消（应用关闭）时向上抛出 CancelledError，由任务队列稍后重新执行，不会把错误当作正文保存。
+    """
+    start = time.monotonic()
+    file_path = str(resolve_upload(file_path))
+    cached = await asyncio.to_thread(read_cached_text, file_path, PDF_MAX_PAGES)
+    if cached:
+        text, pages = cached
+        return text, pages, round(time.monotonic() - start, 3)
+
+    if Path(file_path).suffix.lower() != ".pdf":
+        text, pages = await asyncio.to_thread(extract_text, file_path)
+        return text, pages, round(time.monotonic() - start, 3)
+
+    for attempt in range(_CRASH_RETRIES + 1):
+        try:
+            text, pages = await _extract_in_process(file_path)
+        except asyncio.TimeoutError:
+            logger.error(f"PDF extraction timed out after {PDF_EXTRACT_TIMEOUT}s: {file_path}")
+            text, pages = f"[PDF extraction error: timed out after {PDF_EXTRACT_TIMEOUT}s]", 0
+        except BrokenProcessPool as e:
+            logger.error(f"PDF extraction worker crashed on {file_path} (attempt {attempt + 1}): {e}")
+            text, pages = "[PDF extraction error: extraction process crashed]", 0
+            continue
+        else:
+            # 只缓存成功的提取结果（失败可能是暂时的，如超时）
+            if not text.startswith("["):
+                await asyncio.to_thread(write_cached_text, file_path, text, pages, PDF_MAX_PAGES)
+        break
+    return text, pages, round(time.monotonic() - start, 3)
+
+
+def shutdown_extraction_pool():
+    """终止所有正在运行的提取进程（应用关闭时调用）。"""
+    for executor in list(_running):
+        _kill(executor)
+    _running.clear()
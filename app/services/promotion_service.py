@@ -7,21 +7,26 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import GuestReviewer, GuestReviewRecord
+from app.services.assignment_service import assignment_index
+from app.services.db_writer_service import write, update_row, chain
 
 logger = logging.getLogger(__name__)
 
 
 async def check_promotion_demotion(gr: GuestReviewer, db: AsyncSession):
-    """检查并执行升级/降级。"""
+    """检查并执行升级/降级（db 只用于读取，更新经单写队列提交）。"""
 
     # ===== 降级: 3 次连续格式错误 → Applicant =====
     if gr.consecutive_errors >= 3:
         old_level = gr.level
-        gr.level = 0
-        gr.calibration_passed = 0
-        gr.calibration_error = "Demoted: 3 consecutive format errors. Please re-calibrate."
-        gr.consecutive_errors = 0
-        await db.commit()
+        await write(update_row(
+            gr,
+            level=0,
+            calibration_passed=0,
+            calibration_error="Demoted: 3 consecutive format errors. Please re-calibrate.",
+            consecutive_errors=0,
+        ))
+        assignment_index.update_reviewer(gr)
         logger.info(f"Demoted {gr.display_name} from Lv.{old_level} to Lv.0 (3 consecutive errors)")
         return
 
@@ -43,8 +48,7 @@ async def check_promotion_demotion(gr: GuestReviewer, db: AsyncSession):
         avg_comment_len = sum(r.comment_length for r in records) / 3
 
         if all_valid and all_reasonable and avg_comment_len > 200:
-            gr.level = 2
-            await db.commit()
+            await write(update_row(gr, level=2))
             logger.info(f"Promoted {gr.display_name} from Candidate to Associate!")
 
 
@@ -64,7 +68,8 @@ async def check_api_inactivity(db: AsyncSession):
     )
     inactive = list(result.scalars().all())
     for gr in inactive:
-        gr.is_active = 0
         logger.info(f"Marked {gr.display_name} as inactive (30 days no activity)")
     if inactive:
-        await db.commit()
+        await write(chain(*(update_row(gr, is_active=0) for gr in inactive)))
+        for gr in inactive:
+            assignment_index.update_reviewer(gr)
@@ -0,0 +1,206 @@
+"""LLM 调用限流服务 — 按 provider 端点限制并发数和每分钟请求/token 数。
+
+所有审稿人、社区审稿人和主编的模型调用都先在对应端点的限流器上排队，
+排队耗时与调用耗时分开统计，用于区分"被限流"和"模型本身慢"。
+
+社区审稿人自带端点的限流器随注册人数增长，单独放在 LRU 中：最多保留 GUEST_LIMITER_POOL_SIZE 个，
+空闲超过 GUEST_LIMITER_IDLE_SECONDS 或被挤出时丢弃；有调用在排队或进行中的限流器不会被丢弃。
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import re
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from app.config import (
+    PROVIDER_LIMITS, GUEST_API_KEY_SECRET,
+    LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+    GUEST_API_MAX_CONCURRENCY, GUEST_API_REQUESTS_PER_MINUTE, GUEST_API_TOKENS_PER_MINUTE,
+    GUEST_LIMITER_POOL_SIZE, GUEST_LIMITER_IDLE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+
+def estimate_tokens(*texts: str) -> int:
+    """粗略估算 token 数：CJK 字符约 1 token / 字，其余约 4 字符 / token。"""
+    total = 0
+    for t in texts:
+        if not t:
+            continue
+        cjk = len(_CJK_RE.findall(t))
+        total += cjk + (len(t) - cjk) // 4
+    return total
+
+
+class TokenBucket:
+    """令牌桶。rate_per_minute <= 0 表示不限。允许预支，欠账由后续等待偿还。"""
+
+    def __init__(self, rate_per_minute: int):
+        self.capacity = float(rate_per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        """预留 amount 个令牌，返回需要等待的秒数。"""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def refund(self, amount: float):
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class Slot:
+    """一次获得的调用许可，记录排队耗时；调用方可回填实际 token 用量。"""
+
+    def __init__(self, reserved_tokens: int):
+        self.reserved_tokens = reserved_tokens
+        self.actual_tokens: int | None = None
+        self.queue_wait = 0.0
+
+
+class ProviderLimiter:
+    """单个端点的限流器：并发信号量 + RPM/TPM 令牌桶。"""
+
+    def __init__(self, key: str, max_concurrency: int, rpm: int = 0, tpm: int = 0):
+        self.key = key
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_call_time = 0.0
+        self.last_used = time.monotonic()
+
+    @property
+    def busy(self) -> bool:
+        return self.in_flight > 0 or self.waiting > 0
+
+    @asynccontextmanager
+    async def slot(self, est_tokens: int = 0):
+        slot = Slot(est_tokens)
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            delay = max(self._requests.reserve(1), self._tokens.reserve(est_tokens))
+            if delay > 0:
+                await asyncio.sleep(delay)
+            slot.queue_wait = time.monotonic() - start
+            self.in_flight += 1
+            call_start = time.monotonic()
+            try:
+                yield slot
+            finally:
+                self.in_flight -= 1
+                self.calls += 1
+                self.total_wait += slot.queue_wait
+                self.max_wait = max(self.max_wait, slot.queue_wait)
+                self.total_call_time += time.monotonic() - call_start
+                self.last_used = time.monotonic()
+                if slot.actual_tokens is not None and slot.actual_tokens < est_tokens:
+                    self._tokens.refund(est_tokens - slot.actual_tokens)
+        finally:
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "key": endpoint_label(self.key),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "avg_queue_wait": round(self.total_wait / self.calls, 3) if self.calls else 0,
+            "max_queue_wait": round(self.max_wait, 3),
+            "avg_call_time": round(self.total_call_time / self.calls, 3) if self.calls else 0,
+        }
+
+
+# 内置 provider 和配置里的端点（数量固定）
+_limiters: dict[str, ProviderLimiter] = {}
+# 社区审稿人自带端点：LRU，最近使用的在末尾
+_guest_limiters: OrderedDict[str, ProviderLimiter] = OrderedDict()
+
+
+def _normalize(base_url: str) -> str:
+    return (base_url or "").strip().rstrip("/").lower()
+
+
+def endpoint_label(base_url: str) -> str:
+    """运行时指标中展示的端点名：内置 provider 显示地址，社区审稿人自带端点只显示不可逆的短 id（地址不公开）。"""
+    key = _normalize(base_url)
+    if key in {_normalize(k) for k in PROVIDER_LIMITS}:
+        return key
+    digest = hmac.new(GUEST_API_KEY_SECRET.encode(), key.encode(), hashlib.sha256).hexdigest()
+    return f"guest:{digest[:10]}"
+
+
+def _evict_guest_limiters(keep: str):
+    """丢弃超出容量或空闲过久的社区审稿人端点限流器（跳过有调用在排队或进行中的，以及刚取出的 keep）。"""
+    now = time.monotonic()
+    for key, limiter in list(_guest_limiters.items()):
+        if limiter.busy or key == keep:
+            continue
+        if len(_guest_limiters) > GUEST_LIMITER_POOL_SIZE or now - limiter.last_used > GUEST_LIMITER_IDLE_SECONDS:
+            del _guest_limiters[key]
+
+
+def get_limiter(base_url: str, guest: bool = False) -> ProviderLimiter:
+    """
+    按端点获取（或创建）限流器。guest=True 表示社区审稿人自带端点，使用 guest 默认配额。
+    调用方拿到后立即进入 slot()（中间没有 await），排队计数保证它不会在使用前被丢弃。
+    """
+    key = _normalize(base_url)
+    limiter = _limiters.get(key)
+    if limiter is not None:
+        return limiter
+    configured = {_normalize(k): v for k, v in PROVIDER_LIMITS.items()}.get(key)
+    if configured:
+        limiter = _limiters[key] = ProviderLimiter(key, **configured)
+        return limiter
+    if not guest:
+        limiter = _limiters[key] = ProviderLimiter(
+            key, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE,
+        )
+        return limiter
+
+    limiter = _guest_limiters.get(key)
+    if limiter is None:
+        limiter = _guest_limiters[key] = ProviderLimiter(
+            key, GUEST_API_MAX_CONCURRENCY,
+            GUEST_API_REQUESTS_PER_MINUTE, GUEST_API_TOKENS_PER_MINUTE,
+        )
+    _guest_limiters.move_to_end(key)
+    limiter.last_used = time.monotonic()
+    _evict_guest_limiters(keep=key)
+    return limiter
+
+
+def limiter_stats() -> list[dict]:
+    return [limiter.stats() for limiter in (*_limiters.values(), *_guest_limiters.values())]
@@ -0,0 +1,86 @@
+"""请求级查询统计 — 记录每个请求执行的 SQL 条数和加载的 ORM 对象数，按路由汇总。
+
+关联改为按需加载后，一个请求加载多少行就不应再随平台数据量增长；这里持续度量这一点：
+/dashboard/runtime 中按路由列出平均/最大查询数和对象数，单个请求加载的对象超过
+QUERY_LOAD_WARN_OBJECTS 时记录警告（通常意味着又出现了 N+1 或整表加载）。
+
+计数存放在 contextvar 中，SQLAlchemy 的 greenlet 会继承调用方的上下文，异步会话中的加载也能计入当前请求。
+后台任务（审稿流程、校准）不在请求中，不计数。
+"""
+
+import logging
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import QUERY_LOAD_WARN_OBJECTS
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[dict | None] = ContextVar("request_query_load", default=None)
+_routes: dict[str, dict] = {}
+
+
+def _on_execute(conn, cursor, statement, parameters, context, executemany):
+    load = _current.get()
+    if load is not None:
+        load["queries"] += 1
+
+
+def _on_loaded(session, instance):
+    load = _current.get()
+    if load is not None:
+        load["objects"] += 1
+
+
+def install_query_stats(*engines):
+    """给引擎注册计数钩子（应用启动时调用一次）。"""
+    for engine in engines:
+        event.listen(engine.sync_engine, "before_cursor_execute", _on_execute)
+    event.listen(Session, "loaded_as_persistent", _on_loaded)
+
+
+def _record(route: str, load: dict):
+    stats = _routes.setdefault(route, {"requests": 0, "queries": 0, "objects": 0, "max_queries": 0, "max_objects": 0})
+    stats["requests"] += 1
+    stats["queries"] += load["queries"]
+    stats["objects"] += load["objects"]
+    stats["max_queries"] = max(stats["max_queries"], load["queries"])
+    stats["max_objects"] = max(stats["max_objects"], load["objects"])
+    if load["objects"] > QUERY_LOAD_WARN_OBJECTS:
+        logger.warning(f"{route} loaded {load['objects']} objects in {load['queries']} queries")
+
+
+class QueryStatsMiddleware:
+    """ASGI 中间件：为每个 HTTP 请求建立计数，结束后按路由（endpoint 函数名）汇总。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        load = {"queries": 0, "objects": 0}
+        token = _current.set(load)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            endpoint = scope.get("endpoint")
+            if endpoint is not None:
+                _record(getattr(endpoint, "__name__", str(endpoint)), load)
+
+
+def query_stats() -> dict:
+    return {
+        route: {
+            "requests": s["requests"],
+            "avg_queries": round(s["queries"] / s["requests"], 1),
+            "max_queries": s["max_queries"],
+            "avg_objects": round(s["objects"] / s["requests"], 1),
+            "max_objects": s["max_objects"],
+        }
+        for route, s in sorted(_routes.items())
+    }
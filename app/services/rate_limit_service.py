@@ -1,53 +1,316 @@
-"""投稿频率限制服务 — 基于 email 限制每日/每月投稿数。"""
+"""频率限制服务 — 进程内的滑动窗口计数器，限制投稿（按 email 和客户端 IP）、注册和重新校准。
 
-from datetime import datetime, timedelta
+每条规则把时间切成固定长度的窗口，每个键（email / IP / 审稿人）只保存当前与上一个窗口的计数，
+估计值 = 上一窗口计数 × 上一窗口仍落在滑动窗口内的比例 + 当前窗口计数，检查与记录都是 O(1)，
+不再在每次投稿时对 papers 做 COUNT。
 
-from sqlalchemy import select, func
+计数写穿到 rate_limit_counters（规则 + 键 → 窗口序号与两个计数），重启时载入；
+按 email 的投稿计数在启动时再从 papers 重新计算并覆盖（papers 是准确来源，IP 没有落在 papers 上，只能依赖持久化的计数）。
+多进程部署时每个进程只看到自己的计数和启动时载入的值，限额按进程近似。
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from fastapi import Request
+from sqlalchemy import select, func, delete, Integer
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Paper
-from app.config import DAILY_SUBMIT_LIMIT, MONTHLY_SUBMIT_LIMIT
+from app.models import Paper, RateLimitCounter
+from app.config import (
+    DAILY_SUBMIT_LIMIT, MONTHLY_SUBMIT_LIMIT, SUBMIT_IP_DAILY_LIMIT,
+    REGISTER_IP_DAILY_LIMIT, CALIBRATE_DAILY_LIMIT, CALIBRATE_IP_DAILY_LIMIT, TRUSTED_PROXY_HOPS,
+)
+from app.services.db_writer_service import write
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# 内存中的计数超过这个数量时，清理两个窗口内都没有计数的键
+_SWEEP_THRESHOLD = 10000
+
+
+@dataclass(frozen=True)
+class LimitRule:
+    name: str
+    limit: int  # 0 = 不限
+    window_seconds: int
+    message: str  # 超限时的提示，可用 {limit} 占位
 
 
-async def check_submission_limit(email: str, db: AsyncSession) -> tuple[bool, str]:
+SUBMIT_EMAIL_DAILY = LimitRule(
+    "submit_email_day", DAILY_SUBMIT_LIMIT, DAY,
+    "Daily limit reached ({limit} submissions per 24 hours). Please try again later.",
+)
+SUBMIT_EMAIL_MONTHLY = LimitRule(
+    "submit_email_month", MONTHLY_SUBMIT_LIMIT, 30 * DAY,
+    "Monthly limit reached ({limit} submissions per 30 days). Please try again later.",
+)
+SUBMIT_IP_DAILY = LimitRule(
+    "submit_ip_day", SUBMIT_IP_DAILY_LIMIT, DAY,
+    "Too many submissions from your network ({limit} per 24 hours). Please try again later.",
+)
+REGISTER_IP_DAILY = LimitRule(
+    "register_ip_day", REGISTER_IP_DAILY_LIMIT, DAY,
+    "Too many registrations from your network ({limit} per 24 hours). Please try again later.",
+)
+CALIBRATE_DAILY = LimitRule(
+    "calibrate_day", CALIBRATE_DAILY_LIMIT, DAY,
+    "Calibration limit reached ({limit} runs per 24 hours). Please try again later.",
+)
+CALIBRATE_IP_DAILY = LimitRule(
+    "calibrate_ip_day", CALIBRATE_IP_DAILY_LIMIT, DAY,
+    "Too many calibration requests from your network ({limit} per 24 hours). Please try again later.",
+)
+
+RULES = {rule.name: rule for rule in (
+    SUBMIT_EMAIL_DAILY, SUBMIT_EMAIL_MONTHLY, SUBMIT_IP_DAILY,
+    REGISTER_IP_DAILY, CALIBRATE_DAILY, CALIBRATE_IP_DAILY,
+)}
+
+# 启动时从 papers 重新计算的规则（按 email 的投稿计数）
+_PAPER_RULES = (SUBMIT_EMAIL_DAILY, SUBMIT_EMAIL_MONTHLY)
+
+
+class SlidingWindowLimiter:
+    """
+    滑动窗口计数器（两个固定窗口加权近似）。
+    _counters：(规则名, 键) → [当前窗口序号, 当前窗口计数, 上一窗口计数]
     """
-    检查投稿频率是否超限。
-    返回 (allowed, error_message)。allowed=True 表示可以投稿。
+
+    def __init__(self):
+        self._counters: dict[tuple[str, str], list[int]] = {}
+        self.stats = {"checks": 0, "rejected": 0, "hits": 0, "refunds": 0, "loaded": 0, "rebuilt": 0, "swept": 0}
+
+    def _state(self, rule: LimitRule, key: str, now: float) -> list[int] | None:
+        """取出计数并滚动到 now 所在的窗口；没有计数时返回 None。"""
+        state = self._counters.get((rule.name, key))
+        if state is None:
+            return None
+        window = int(now // rule.window_seconds)
+        if state[0] != window:
+            # 正好滚过一个窗口时当前计数变成上一窗口的计数，更久则两者都已过期
+            state[2] = state[1] if state[0] == window - 1 else 0
+            state[1] = 0
+            state[0] = window
+        return state
+
+    def estimate(self, rule: LimitRule, key: str, now: float | None = None) -> float:
+        """滑动窗口内的估计请求数。"""
+        now = time.time() if now is None else now
+        state = self._state(rule, key, now)
+        if state is None:
+            return 0.0
+        elapsed = (now % rule.window_seconds) / rule.window_seconds
+        return state[2] * (1.0 - elapsed) + state[1]
+
+    def check(self, checks: list[tuple[LimitRule, str]], now: float | None = None) -> str:
+        """检查一组 (规则, 键)，返回第一条超限规则的提示；都未超限时返回空字符串。"""
+        now = time.time() if now is None else now
+        self.stats["checks"] += 1
+        for rule, key in checks:
+            if rule.limit and key and self.estimate(rule, key, now) + 1 > rule.limit:
+                self.stats["rejected"] += 1
+                return rule.message.format(limit=rule.limit)
+        return ""
+
+    def hit(self, checks: list[tuple[LimitRule, str]], now: float | None = None) -> list[tuple]:
+        """记录一次请求，返回需要持久化的行 (规则名, 键, 窗口序号, 当前计数, 上一窗口计数)。"""
+        now = time.time() if now is None else now
+        rows = []
+        for rule, key in checks:
+            if not rule.limit or not key:
+                continue
+            state = self._state(rule, key, now)
+            if state is None:
+                state = self._counters[(rule.name, key)] = [int(now // rule.window_seconds), 0, 0]
+            state[1] += 1
+            rows.append((rule.name, key, *state))
+        self.stats["hits"] += 1
+        if len(self._counters) > _SWEEP_THRESHOLD:
+            self.sweep(now)
+        return rows
+
+    def refund(self, checks: list[tuple[LimitRule, str]], now: float | None = None) -> list[tuple]:
+        """撤销一次 hit（请求最终没有完成），返回需要持久化的行；期间滚过窗口时从上一窗口扣除。"""
+        now = time.time() if now is None else now
+        rows = []
+        for rule, key in checks:
+            if not rule.limit or not key:
+                continue
+            state = self._state(rule, key, now)
+            if state is None:
+                continue
+            if state[1] > 0:
+                state[1] -= 1
+            elif state[2] > 0:
+                state[2] -= 1
+            rows.append((rule.name, key, *state))
+        self.stats["refunds"] += 1
+        return rows
+
+    def set(self, rule: LimitRule, key: str, window: int, current: int, previous: int):
+        self._counters[(rule.name, key)] = [window, current, previous]
+
+    def sweep(self, now: float | None = None):
+        """清理两个窗口内都没有计数的键（持久化的行在下次启动载入时清理）。"""
+        now = time.time() if now is None else now
+        expired = [
+            (name, key) for (name, key), state in self._counters.items()
+            if name not in RULES or state[0] < int(now // RULES[name].window_seconds) - 1
+        ]
+        for counter in expired:
+            del self._counters[counter]
+        self.stats["swept"] += len(expired)
+
+    def snapshot(self) -> dict:
+        stats = dict(self.stats)
+        stats["keys"] = len(self._counters)
+        return stats
+
+
+limiter = SlidingWindowLimiter()
+
+
+def client_ip(request: Request) -> str:
     """
-    if not email or not email.strip():
-        return False, "Email is required to submit a paper."
+    客户端 IP。部署在 TRUSTED_PROXY_HOPS 层反向代理之后时取 X-Forwarded-For 从右数第 TRUSTED_PROXY_HOPS 项
+    （代理追加的地址，客户端自己填的前缀伪造不了）；否则取连接的对端地址。
+    """
+    if TRUSTED_PROXY_HOPS > 0:
+        hops = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(hops) >= TRUSTED_PROXY_HOPS:
+            return hops[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else ""
+
+
+def _persist(rows: list[tuple]):
+    """写操作：把计数覆盖写入 rate_limit_counters。"""
+    async def work(session: AsyncSession):
+        for name, key, window, current, previous in rows:
+            stmt = insert(RateLimitCounter).values(
+                rule=name, key=key, window=window, current=current, previous=previous,
+            )
+            await session.execute(stmt.on_conflict_do_update(
+                index_elements=[RateLimitCounter.rule, RateLimitCounter.key],
+                set_={"window": stmt.excluded.window, "current": stmt.excluded.current,
+                      "previous": stmt.excluded.previous},
+            ))
+    return work
+
+
+async def hit(checks: list[tuple[LimitRule, str]]):
+    """记录一次请求并写穿到数据库（持久化失败不影响请求，只是重启后少了这次计数）。"""
+    if rows := limiter.hit(checks):
+        try:
+            await write(_persist(rows))
+        except Exception as e:
+            logger.error(f"Rate limit counter persist failed: {e}")
+
+
+async def check_and_hit(checks: list[tuple[LimitRule, str]]) -> str:
+    """
+    检查一组限额，未超限时记录这次请求；返回超限提示（未超限为空字符串）。
+    检查和计数之间没有 await，并发请求不会同时通过同一个名额。
+    """
+    if error := limiter.check(checks):
+        return error
+    await hit(checks)
+    return ""
+
+
+async def refund(checks: list[tuple[LimitRule, str]]):
+    """退还 check_and_hit 记下的一次请求（请求在后续步骤失败时调用）。"""
+    if rows := limiter.refund(checks):
+        try:
+            await write(_persist(rows))
+        except Exception as e:
+            logger.error(f"Rate limit counter persist failed: {e}")
+
+
+def _submission_checks(email: str, ip: str) -> list[tuple[LimitRule, str]]:
+    """投稿的限额检查项；空 email / IP 对应的规则跳过（IP 窗口总是检查，email 窗口只在填写了 email 时检查）。"""
+    email = (email or "").strip().lower()
+    return [(SUBMIT_EMAIL_DAILY, email), (SUBMIT_EMAIL_MONTHLY, email), (SUBMIT_IP_DAILY, ip)]
+
+
+async def reserve_submission(email: str, ip: str = "") -> str:
+    """
+    投稿前占用 email 与 IP 的名额（检查与计数一步完成），返回超限提示（未超限为空字符串）。
+    上传或保存失败时调用 refund_submission 退还。是否必须填写 email 由调用方按 REQUIRE_EMAIL 判断。
+    """
+    return await check_and_hit(_submission_checks(email, ip))
+
+
+async def refund_submission(email: str, ip: str = ""):
+    """投稿没有完成（上传被拒、保存失败）时退还 reserve_submission 占用的名额。"""
+    await refund(_submission_checks(email, ip))
+
+
+# ---------- 启动载入 ----------
+
+def submission_counts_query(window_seconds: int, since: datetime):
+    """从 since 起按 (email, 窗口序号) 统计投稿数（走 ix_papers_submitted；空 email 由调用方跳过）。"""
+    bucket = func.cast(func.strftime("%s", Paper.submitted_at), Integer) // window_seconds
+    return select(Paper.email, bucket, func.count(Paper.id)).where(
+        Paper.submitted_at >= since,
+    ).group_by(bucket, Paper.email)
+
+
+async def _rebuild_from_papers(session: AsyncSession, now: float) -> list[tuple]:
+    """按 email 从 papers 重新计算投稿规则当前与上一窗口的计数。"""
+    rows = []
+    for rule in _PAPER_RULES:
+        window = int(now // rule.window_seconds)
+        since = datetime.utcfromtimestamp((window - 1) * rule.window_seconds)
+        result = await session.execute(submission_counts_query(rule.window_seconds, since))
+        counts: dict[str, list[int]] = {}
+        for email, paper_window, count in result.all():
+            if not email:
+                continue
+            state = counts.setdefault(email, [window, 0, 0])
+            if paper_window == window:
+                state[1] += count
+            elif paper_window == window - 1:
+                state[2] += count
+        rows.extend((rule.name, email, *state) for email, state in counts.items())
+    return rows
 
-    email = email.strip().lower()
-    now = datetime.utcnow()
 
-    # 今日投稿数
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    daily_count = await db.scalar(
-        select(func.count(Paper.id)).where(
-            Paper.email == email,
-            Paper.submitted_at >= today_start,
-        )
-    )
+async def _load(session: AsyncSession) -> tuple[list[tuple], list[tuple]]:
+    """写操作：清理过期计数，返回持久化的计数和从 papers 重算的投稿计数（后者同时写回）。"""
+    now = time.time()
+    for rule in RULES.values():
+        await session.execute(delete(RateLimitCounter).where(
+            RateLimitCounter.rule == rule.name,
+            RateLimitCounter.window < int(now // rule.window_seconds) - 1,
+        ))
+    await session.execute(delete(RateLimitCounter).where(RateLimitCounter.rule.notin_(list(RULES))))
+    await session.execute(delete(RateLimitCounter).where(
+        RateLimitCounter.rule.in_([rule.name for rule in _PAPER_RULES])
+    ))
+    stored = [tuple(row) for row in (await session.execute(select(
+        RateLimitCounter.rule, RateLimitCounter.key, RateLimitCounter.window,
+        RateLimitCounter.current, RateLimitCounter.previous,
+    ))).all()]
+    rebuilt = await _rebuild_from_papers(session, now)
+    await _persist(rebuilt)(session)
+    return stored, rebuilt
 
-    if daily_count >= DAILY_SUBMIT_LIMIT:
-        return False, (
-            f"Daily limit reached ({DAILY_SUBMIT_LIMIT} submissions/day). "
-            f"Please try again tomorrow."
-        )
 
-    # 本月投稿数
-    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    monthly_count = await db.scalar(
-        select(func.count(Paper.id)).where(
-            Paper.email == email,
-            Paper.submitted_at >= month_start,
-        )
-    )
+async def load_rate_limits():
+    """应用启动时载入持久化的计数，并从 papers 重建按 email 的投稿计数。"""
+    stored, rebuilt = await write(_load)
+    for name, key, window, current, previous in stored + rebuilt:
+        limiter.set(RULES[name], key, window, current, previous)
+    limiter.stats["loaded"] += len(stored)
+    limiter.stats["rebuilt"] += len(rebuilt)
+    logger.info(f"Rate limiter loaded {len(stored)} counter(s), rebuilt {len(rebuilt)} from papers")
 
-    if monthly_count >= MONTHLY_SUBMIT_LIMIT:
-        return False, (
-            f"Monthly limit reached ({MONTHLY_SUBMIT_LIMIT} submissions/month). "
-            f"Your quota resets on the 1st of next month."
-        )
 
-    return True, ""
+def rate_limit_stats() -> dict:
+    return limiter.snapshot()
@@ -0,0 +1,122 @@
+"""审稿结果缓存服务 — 以稿件内容哈希为键，避免同一份稿件被重复审稿。
+
+缓存键由四部分组成：稿件输入（标题/作者/摘要/关键词/正文）、审稿人身份、
+模型名、以及 prompt 模板 + personality + 长稿件分段参数 + prompt 布局的哈希。任一部分变化都会自然失效。
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, func
+
+from app.database import read_session
+from app.models import ReviewCacheEntry
+from app.reviewers.base import (
+    BaseReviewer, ReviewResult, REVIEW_SYSTEM_PROMPT, REVIEW_USER_PROMPT,
+    REVIEW_NOTES_SYSTEM_PROMPT, REVIEW_NOTES_USER_PROMPT, REVIEW_SYNTHESIS_PROMPT,
+    REVIEW_PERSONA_PROMPT, DEFERRED_PERSONA,
+)
+from app.services.calibration_service import validate_review_format
+from app.services.crypto_service import sha256_parts
+from app.services.db_writer_service import write, update_row
+from app.config import (
+    REVIEW_CACHE_TTL_DAYS, REVIEW_CACHE_MAX_ENTRIES,
+    LONG_DOC_SINGLE_PASS_TOKENS, LONG_DOC_CHUNK_TOKENS, LONG_DOC_MAX_CHUNKS,
+    PROMPT_LAYOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+cache_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def review_cache_key(
+    reviewer: BaseReviewer,
+    title: str,
+    abstract: str,
+    keywords: str,
+    content: str,
+    authors: str,
+) -> str:
+    manuscript_hash = sha256_parts(title, authors, abstract, keywords, content)
+    prompt_hash = sha256_parts(
+        REVIEW_SYSTEM_PROMPT, REVIEW_USER_PROMPT, reviewer.personality,
+        # 长稿件的分段方式也会影响结果
+        REVIEW_NOTES_SYSTEM_PROMPT, REVIEW_NOTES_USER_PROMPT, REVIEW_SYNTHESIS_PROMPT,
+        f"{LONG_DOC_SINGLE_PASS_TOKENS}:{LONG_DOC_CHUNK_TOKENS}:{LONG_DOC_MAX_CHUNKS}",
+        # prompt 布局
+        PROMPT_LAYOUT, REVIEW_PERSONA_PROMPT, DEFERRED_PERSONA,
+    )
+    identity = f"{reviewer.model_provider}:{getattr(reviewer, 'guest_id', '')}:{reviewer.name}"
+    return sha256_parts(manuscript_hash, identity, reviewer.model_name, prompt_hash)
+
+
+async def get_cached_review(cache_key: str) -> tuple[ReviewResult, str] | None:
+    """查找未过期的缓存结果；命中时更新命中计数（经单写队列）。"""
+    async with read_session() as db:
+        entry = await db.scalar(
+            select(ReviewCacheEntry).where(ReviewCacheEntry.cache_key == cache_key)
+        )
+    now = datetime.utcnow()
+    if entry is None or entry.created_at < now - timedelta(days=REVIEW_CACHE_TTL_DAYS):
+        cache_stats["misses"] += 1
+        return None
+
+    await write(update_row(entry, hit_count=entry.hit_count + 1, last_hit_at=now))
+    cache_stats["hits"] += 1
+    return ReviewResult(**json.loads(entry.result_json)), entry.raw_response
+
+
+async def store_cached_review(cache_key: str, reviewer: BaseReviewer, result: ReviewResult, raw: str):
+    """写入缓存（经单写队列，与淘汰在同一事务中）。格式不合格（含解析失败的回退结果）不缓存。"""
+    if validate_review_format(result):
+        return
+    entry = ReviewCacheEntry(
+        cache_key=cache_key,
+        reviewer_name=reviewer.name,
+        model_name=reviewer.model_name,
+        result_json=json.dumps(result.to_dict(), ensure_ascii=False),
+        raw_response=raw,
+    )
+
+    async def work(db):
+        await db.execute(delete(ReviewCacheEntry).where(ReviewCacheEntry.cache_key == cache_key))
+        db.add(entry)
+        await db.flush()
+        return await _evict(db)
+
+    evicted = await write(work)
+    cache_stats["stores"] += 1
+    cache_stats["evictions"] += evicted
+
+
+async def _evict(db):
+    """按时间（TTL）和容量（最久未命中优先）淘汰，返回淘汰条数。"""
+    expired = await db.execute(
+        delete(ReviewCacheEntry).where(
+            ReviewCacheEntry.created_at < datetime.utcnow() - timedelta(days=REVIEW_CACHE_TTL_DAYS)
+        )
+    )
+    evicted = expired.rowcount or 0
+
+    total = await db.scalar(select(func.count(ReviewCacheEntry.id))) or 0
+    overflow = total - REVIEW_CACHE_MAX_ENTRIES
+    if overflow > 0:
+        oldest = (
+            select(ReviewCacheEntry.id)
+            .order_by(func.coalesce(ReviewCacheEntry.last_hit_at, ReviewCacheEntry.created_at))
+            .limit(overflow)
+        )
+        trimmed = await db.execute(delete(ReviewCacheEntry).where(ReviewCacheEntry.id.in_(oldest)))
+        evicted += trimmed.rowcount or 0
+
+    return evicted
+
+
+def review_cache_stats() -> dict:
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    return {
+        **cache_stats,
+        "hit_ratio": round(cache_stats["hits"] / lookups, 3) if lookups else 0,
+    }
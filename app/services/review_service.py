@@ -1,27 +1,45 @@
-"""审稿调度服务 — 并行触发内置+社区AI审稿人，然后由主编做决定。"""
+"""审稿调度服务 — 内置+社区AI审稿人同一波并发审稿，然后由主编做决定。"""
 
 import asyncio
 import json
 import logging
+import time
 from datetime import datetime
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload, undefer
 
-from app.models import Paper, Review, EditorialDecision, GuestReviewRecord
+from app.models import (
+    Paper, Review, EditorialDecision, GuestReviewRecord, GuestReviewerStats, PipelineRun, LLMCallMetric,
+    PaperExtraction,
+)
 from app.reviewers.base import BaseReviewer, ReviewResult
 from app.reviewers.claude_reviewer import ClaudeReviewer
 from app.reviewers.openai_reviewer import OpenAIReviewer
 from app.reviewers.deepseek_reviewer import DeepSeekReviewer
 from app.reviewers.guest_reviewer import build_guest_runner
 from app.reviewers.editor import AIEditor
+from app.reviewers.streaming import CallMetrics
+from app.services.dashboard_stats_service import update_paper_status, count_reviews, uncount_paper_reviews
+from app.services.db_writer_service import WriteWork, write, add_rows, update_row, chain, after_commit
 from app.services.email_service import send_decision_email
-from app.services.assignment_service import select_guest_reviewers
+from app.services.page_cache_service import invalidate_paper_page
+from app.services.paper_service import extract_text_async
+from app.services.assignment_service import select_guest_reviewers, assignment_index, unrecord_paper_loads
 from app.services.calibration_service import validate_review_format
 from app.services.promotion_service import check_promotion_demotion
+from app.services.review_cache_service import review_cache_key, get_cached_review, store_cached_review
+from app.services.reviewer_stats_service import record_guest_review, paper_guest_reviewers, refresh_guest_stats
+from app.config import (
+    REVIEW_CACHE_ENABLED, GUEST_API_TIMEOUT, EDITOR_MODEL,
+    PIPELINE_DEADLINE_SECONDS, BUILTIN_REVIEW_QUORUM, ASSOCIATE_GRACE_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
+LATENCY_EWMA_ALPHA = 0.3
+
 
 def get_active_reviewers() -> list[BaseReviewer]:
     """获取所有可用的内置审稿人实例。"""
@@ -44,10 +62,21 @@ async def _run_single_review(
     keywords: str,
     content: str,
     authors: str = "Anonymous",
+    use_cache: bool = True,
 ) -> tuple[str, str, ReviewResult, str]:
-    """运行单个审稿人的审稿。返回 (name, provider, result, raw)。"""
+    """运行单个审稿人的审稿（优先复用缓存）。返回 (name, provider, result, raw)。"""
     try:
+        cache_key = None
+        if use_cache and reviewer.cacheable:
+            cache_key = review_cache_key(reviewer, title, abstract, keywords, content, authors)
+            cached = await get_cached_review(cache_key)
+            if cached:
+                logger.info(f"Reviewer {reviewer.name}: reusing cached review")
+                return reviewer.name, reviewer.model_provider, cached[0], cached[1]
+
         result, raw = await reviewer.review(title, abstract, keywords, content, authors=authors)
+        if cache_key:
+            await store_cached_review(cache_key, reviewer, result, raw)
         return reviewer.name, reviewer.model_provider, result, raw
     except Exception as e:
         logger.error(f"Reviewer {reviewer.name} failed: {e}")
@@ -101,92 +130,83 @@ def _save_review_record(
     )
 
 
-async def run_review_pipeline(paper: Paper, db: AsyncSession):
+def _call_metric_record(paper_id: int, name: str, model_name: str, metrics: CallMetrics) -> LLMCallMetric:
+    """构建模型调用指标记录。"""
+    return LLMCallMetric(
+        paper_id=paper_id,
+        reviewer_name=name,
+        model_name=model_name or "",
+        streamed=1 if metrics.streamed else 0,
+        queue_wait=metrics.queue_wait,
+        ttft=metrics.ttft,
+        duration=metrics.duration,
+        prompt_tokens=metrics.prompt_tokens,
+        cached_tokens=metrics.cached_tokens,
+        completion_tokens=metrics.completion_tokens,
+        tokens_per_sec=metrics.tokens_per_sec,
+        retries=metrics.retries,
+        abort_reason=metrics.abort_reason[:200],
+    )
+
+
+def _persist_guest_review(
+    paper: Paper,
+    gr_db,
+    outcome,
+    editor_open: bool = True,
+) -> tuple[ReviewResult | None, WriteWork]:
     """
-    完整审稿流程：
-    1. 更新论文状态
-    2. 并行调用内置审稿人
-    3. 并行调用社区审稿人
-    4. 保存所有审稿结果
-    5. AI主编综合意见做最终决定
-    6. 更新论文状态 + 发送通知
+    构建一位社区审稿人结果的写操作（Review + GuestReviewRecord + 错误计数）。
+    返回 (应送入主编的结果, 写操作)；仅 Associate + 格式合格 + 在主编开始前完成的结果送主编，否则为 None。
     """
-    # 1. 更新状态
-    paper.status = "under_review"
-    await db.commit()
+    # 异常处理
+    if isinstance(outcome, BaseException):
+        logger.error(f"Guest reviewer {gr_db.display_name} failed: {outcome}")
+        # 记录失败的 GuestReviewRecord
+        record = GuestReviewRecord(
+            guest_reviewer_id=gr_db.id,
+            paper_id=paper.id,
+            format_valid=0,
+            score_reasonable=0,
+            comment_length=0,
+            sent_to_editor=0,
+        )
+        counter = update_row(gr_db, consecutive_errors=gr_db.consecutive_errors + 1)
 
-    # 2. 并行审稿 — 内置审稿人
-    builtin_reviewers = get_active_reviewers()
-    if not builtin_reviewers:
-        logger.error("No reviewers available! Check API keys.")
-        paper.status = "submitted"
-        await db.commit()
-        return
+        async def failed(session: AsyncSession):
+            await add_rows(record)(session)
+            await counter(session)
+            await record_guest_review(session, gr_db.id, format_valid=False)
+        return None, failed
 
-    builtin_tasks = [
-        _run_single_review(r, paper.title, paper.abstract, paper.keywords, paper.content_text, authors=paper.authors)
-        for r in builtin_reviewers
-    ]
-    builtin_results = await asyncio.gather(*builtin_tasks)
-
-    # 3. 并行审稿 — 社区审稿人
-    guest_reviewers_db = await select_guest_reviewers(paper.keywords or "", paper.id, db)
-    guest_results = []
-    if guest_reviewers_db:
-        guest_runners = [build_guest_runner(gr) for gr in guest_reviewers_db]
-        guest_tasks = [
-            _run_single_review(r, paper.title, paper.abstract, paper.keywords, paper.content_text, authors=paper.authors)
-            for r in guest_runners
-        ]
-        guest_results = await asyncio.gather(*guest_tasks, return_exceptions=True)
-
-    # 4. 保存内置审稿人结果
-    editor_reviews: list[tuple[str, ReviewResult]] = []
-    for name, provider, result, raw in builtin_results:
-        review = _save_review_record(paper.id, name, provider, result, raw)
-        db.add(review)
-        editor_reviews.append((name, result))
-
-    # 5. 保存社区审稿人结果
-    for i, gr_db in enumerate(guest_reviewers_db):
-        gr_result = guest_results[i]
-
-        # 异常处理
-        if isinstance(gr_result, Exception):
-            logger.error(f"Guest reviewer {gr_db.display_name} failed: {gr_result}")
-            gr_db.consecutive_errors += 1
-            # 记录失败的 GuestReviewRecord
-            db.add(GuestReviewRecord(
-                guest_reviewer_id=gr_db.id,
-                paper_id=paper.id,
-                format_valid=0,
-                score_reasonable=0,
-                comment_length=0,
-                sent_to_editor=0,
-            ))
-            continue
-
-        name, provider, result, raw = gr_result
-
-        # 格式验证
-        format_errors = validate_review_format(result)
-        format_ok = len(format_errors) == 0
-        reasonable = _scores_reasonable(result)
-
-        # 构建审稿人显示名
-        level_tag = "Associate" if gr_db.level == 2 else "Candidate"
-        display_name = f"{gr_db.display_name} [{level_tag}]"
-
-        review = _save_review_record(
-            paper.id, display_name, provider, result, raw,
-            is_guest=1, guest_reviewer_id=gr_db.id, guest_level=gr_db.level,
-        )
-        db.add(review)
-        await db.flush()  # 获取 review.id
+    name, provider, result, raw = outcome
+
+    # 格式验证
+    format_errors = validate_review_format(result)
+    format_ok = len(format_errors) == 0
+    reasonable = _scores_reasonable(result)
+
+    # 构建审稿人显示名
+    level_tag = "Associate" if gr_db.level == 2 else "Candidate"
+    display_name = f"{gr_db.display_name} [{level_tag}]"
+
+    review = _save_review_record(
+        paper.id, display_name, provider, result, raw,
+        is_guest=1, guest_reviewer_id=gr_db.id, guest_level=gr_db.level,
+    )
+    sent_to_editor = 1 if (gr_db.level == 2 and format_ok and editor_open) else 0
+
+    # 更新连续错误计数
+    if format_ok:
+        counter = update_row(gr_db, consecutive_errors=0, last_active_at=datetime.utcnow())
+    else:
+        counter = update_row(gr_db, consecutive_errors=gr_db.consecutive_errors + 1)
 
+    async def work(session: AsyncSession):
+        session.add(review)
+        await session.flush()  # 获取 review.id
         # 质量追踪记录
-        sent_to_editor = 1 if (gr_db.level == 2 and format_ok) else 0
-        db.add(GuestReviewRecord(
+        session.add(GuestReviewRecord(
             guest_reviewer_id=gr_db.id,
             review_id=review.id,
             paper_id=paper.id,
@@ -195,27 +215,209 @@ async def run_review_pipeline(paper: Paper, db: AsyncSession):
             comment_length=len(result.detailed_comments),
             sent_to_editor=sent_to_editor,
         ))
+        await counter(session)
+        await count_reviews(review)(session)
+        await record_guest_review(session, gr_db.id, format_ok, review)
+
+    # 仅 Associate + 格式合格 + 按时完成 → 送入主编
+    return (result if sent_to_editor else None), work
+
+
+def _record_guest_latency(guest_reviewer_id: int, duration: float | None, late: bool) -> WriteWork:
+    """写操作：更新社区审稿人的响应延迟（指数滑动平均）和迟到次数，供分配时降权。"""
+    async def work(db: AsyncSession):
+        await _update_guest_latency(db, guest_reviewer_id, duration, late)
+    return work
+
+
+async def _update_guest_latency(db: AsyncSession, guest_reviewer_id: int, duration: float | None, late: bool):
+    stats = await db.get(GuestReviewerStats, guest_reviewer_id)
+    if stats is None:
+        stats = GuestReviewerStats(guest_reviewer_id=guest_reviewer_id, latency_ewma=0.0, late_reviews=0)
+        db.add(stats)
+    # 调用异常（无耗时）按超时计
+    seconds = duration if duration is not None else float(GUEST_API_TIMEOUT)
+    if not stats.latency_ewma:
+        stats.latency_ewma = seconds
+    else:
+        stats.latency_ewma = LATENCY_EWMA_ALPHA * seconds + (1 - LATENCY_EWMA_ALPHA) * stats.latency_ewma
+    if late:
+        stats.late_reviews = (stats.late_reviews or 0) + 1
+    stats.updated_at = datetime.utcnow()
+    latency = stats.latency_ewma
+    # 内存中的分配索引在提交后再更新（写操作失败重试时不会重复生效）
+    after_commit(db, lambda: assignment_index.set_latency(guest_reviewer_id, latency))
+
+
+async def _extract_content(paper: Paper) -> float:
+    """审稿第一步：在进程池中提取稿件文本，记录耗时与页数。返回耗时（秒）。"""
+    text, pages, duration = await extract_text_async(paper.file_path)
+    error = text if text.startswith("[") else ""
+
+    # 如果文本为空或提取失败，用标题和摘要作为内容
+    if not text.strip() or text.startswith("["):
+        text = f"Title: {paper.title}\n\nAbstract: {paper.abstract}\n\n{text}"
+    save_text = update_row(paper, content_text=text)
+
+    async def work(session: AsyncSession):
+        await save_text(session)
+        await session.execute(delete(PaperExtraction).where(PaperExtraction.paper_id == paper.id))
+        session.add(PaperExtraction(paper_id=paper.id, pages=pages, duration=duration, chars=len(text), error=error))
+
+    await write(work)
+    logger.info(f"Paper #{paper.id}: extracted {len(text)} chars from {pages} page(s) in {duration:.2f}s")
+    return duration
+
+
+async def _timed(coro):
+    """运行协程并返回 (耗时秒数, 结果)。"""
+    start = time.monotonic()
+    result = await coro
+    return round(time.monotonic() - start, 3), result
+
+
+async def run_review_pipeline(paper: Paper, db: AsyncSession, use_cache: bool = REVIEW_CACHE_ENABLED):
+    """
+    完整审稿流程（use_cache=False 时跳过审稿缓存，强制重新调用模型）：
+    1. 更新论文状态；尚未提取正文时先在进程池中提取
+    2. 内置审稿人立即开始审稿；同时选择社区审稿人，选定后加入同一波并发
+    3. 每份审稿完成即落库；内置审稿达到法定数后，最多再等 Associate 到截止时间
+    4. AI主编综合按时到达的审稿意见做最终决定
+    5. 更新论文状态 + 发送通知
+    6. 迟到的社区审稿照常保存（不送主编），并计入该审稿人的延迟统计
+
+    各阶段耗时写入 pipeline_runs 表，每次模型调用的 TTFT / tokens/s 写入 llm_call_metrics 表，
+    便于对比流程改动前后的延迟。
+    """
+    started_at = datetime.utcnow()
+    t0 = time.monotonic()
+    timings: dict[str, float] = {}
 
-        # 更新连续错误计数
-        if format_ok:
-            gr_db.consecutive_errors = 0
-            gr_db.last_active_at = datetime.utcnow()
-        else:
-            gr_db.consecutive_errors += 1
+    def _elapsed() -> float:
+        return round(time.monotonic() - t0, 3)
 
-        # 仅 Associate + 格式合格 → 送入主编
-        if gr_db.level == 2 and format_ok:
-            editor_reviews.append((f"[Associate Reviewer] {gr_db.display_name}", result))
+    # 1. 更新状态
+    await write(update_paper_status(paper, status="under_review"))
+    if not paper.content_text and paper.file_path:
+        timings["extract"] = await _extract_content(paper)
 
-    await db.commit()
+    builtin_reviewers = get_active_reviewers()
+    if not builtin_reviewers:
+        logger.error("No reviewers available! Check API keys.")
+        await write(update_paper_status(paper, status="submitted"))
+        return
 
-    # 6. 升级/降级检查
-    for gr_db in guest_reviewers_db:
-        await check_promotion_demotion(gr_db, db)
+    runners: dict[asyncio.Task, BaseReviewer] = {}
+
+    def _start_review(reviewer: BaseReviewer) -> asyncio.Task:
+        task = asyncio.create_task(_timed(_run_single_review(
+            reviewer, paper.title, paper.abstract, paper.keywords, paper.content_text,
+            authors=paper.authors, use_cache=use_cache,
+        )))
+        runners[task] = reviewer
+        return task
+
+    # 2a. 内置审稿人立即开始 — task → (序号, 社区审稿人行 或 None)
+    pending: dict[asyncio.Task, tuple[int, object]] = {
+        _start_review(r): (i, None) for i, r in enumerate(builtin_reviewers)
+    }
+
+    # 2b. 与内置审稿并行：选择社区审稿人，选定后立即开始审稿
+    guest_reviewers_db = await select_guest_reviewers(paper, db)
+    timings["guest_selection"] = _elapsed()
+    for i, gr_db in enumerate(guest_reviewers_db):
+        pending[_start_review(build_guest_runner(gr_db))] = (i, gr_db)
+
+    # 3. 每完成一份审稿即保存。主编在以下条件满足时开始（见 _editor_ready）：
+    #    内置审稿达到法定数，且 (相关审稿全部完成 / 达到流程截止时间 / Associate 宽限期已过)。
+    #    之后才完成的社区审稿照常保存，但标记为未送主编。
+    builtin_for_editor: dict[int, tuple[str, ReviewResult]] = {}
+    guest_for_editor: dict[int, tuple[str, ReviewResult]] = {}
+    quorum = min(BUILTIN_REVIEW_QUORUM or len(builtin_reviewers), len(builtin_reviewers))
+    deadline = t0 + PIPELINE_DEADLINE_SECONDS
+    builtins_done_at: float | None = None
+
+    def _blocking_editor() -> list[asyncio.Task]:
+        """主编需要等待的未完成审稿：内置审稿人 + Associate。"""
+        return [t for t, (_, gr) in pending.items() if gr is None or gr.level == 2]
+
+    def _editor_wake_at() -> float | None:
+        """主编最迟开始的时间点；None 表示还未达到法定数，必须继续等。"""
+        if len(builtin_for_editor) < quorum:
+            return None
+        if builtins_done_at is not None:
+            return min(deadline, builtins_done_at + ASSOCIATE_GRACE_SECONDS)
+        return deadline
+
+    prompt_usage = {"prompt_tokens": 0, "cached_tokens": 0}
+    call_rows: list[LLMCallMetric] = []  # 随下一次写入一起保存
+
+    def _record_call(name: str, model_name: str, metrics: CallMetrics):
+        call_rows.append(_call_metric_record(paper.id, name, model_name, metrics))
+        prompt_usage["prompt_tokens"] += metrics.prompt_tokens
+        prompt_usage["cached_tokens"] += metrics.cached_tokens
+
+    async def _collect(done: set[asyncio.Task], editor_open: bool):
+        nonlocal builtins_done_at
+        works: list[WriteWork] = []
+        for task in done:
+            idx, gr_db = pending.pop(task)
+            if task.exception() is not None:
+                duration, outcome = None, task.exception()
+            else:
+                duration, outcome = task.result()
+            # 命中缓存或调用失败时没有调用指标
+            reviewer = runners.pop(task)
+            if reviewer.last_metrics is not None:
+                _record_call(reviewer.name, reviewer.model_name, reviewer.last_metrics)
+
+            if gr_db is None:
+                name, provider, result, raw = outcome
+                review = _save_review_record(paper.id, name, provider, result, raw)
+                works.append(chain(add_rows(review), count_reviews(review)))
+                if editor_open:
+                    builtin_for_editor[idx] = (name, result)
+                timings[f"review:{name}"] = duration
+                if not any(gr is None for _, gr in pending.values()):
+                    builtins_done_at = time.monotonic()
+                    timings["builtin_reviews"] = _elapsed()
+            else:
+                editor_result, work = _persist_guest_review(paper, gr_db, outcome, editor_open)
+                works.append(work)
+                if editor_result is not None:
+                    guest_for_editor[idx] = (f"[Associate Reviewer] {gr_db.display_name}", editor_result)
+                if duration is not None:
+                    timings[f"review:{gr_db.display_name}"] = duration
+                works.append(_record_guest_latency(gr_db.id, duration, late=not editor_open))
+        works.append(add_rows(*call_rows))
+        call_rows.clear()
+        await write(chain(*works))
+        if not editor_open:
+            invalidate_paper_page(paper.id)  # 决定后保存的迟到审稿会出现在详情页上
+
+    while _blocking_editor():
+        wake_at = _editor_wake_at()
+        if wake_at is not None and time.monotonic() >= wake_at:
+            break
+        timeout = None if wake_at is None else max(0.0, wake_at - time.monotonic())
+        done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        await _collect(done, editor_open=True)
+    timings["editor_ready"] = _elapsed()
+
+    late = [gr.display_name if gr is not None else "built-in" for _, gr in pending.values()
+            if gr is None or gr.level == 2]
+    if late:
+        logger.warning(f"Paper #{paper.id}: editor proceeding without late review(s): {late}")
+
+    editor_reviews: list[tuple[str, ReviewResult]] = (
+        [builtin_for_editor[i] for i in sorted(builtin_for_editor)]
+        + [guest_for_editor[i] for i in sorted(guest_for_editor)]
+    )
 
-    # 7. AI主编做决定
+    # 4. AI主编做决定
+    editor_start = time.monotonic()
+    editor = AIEditor()
     try:
-        editor = AIEditor()
         final_decision, decision_letter = await editor.make_decision(
             paper.title, paper.abstract, editor_reviews
         )
@@ -223,6 +425,9 @@ async def run_review_pipeline(paper: Paper, db: AsyncSession):
         logger.error(f"Editor decision failed: {e}")
         final_decision = "major_revision"
         decision_letter = f"Editorial decision could not be generated due to an error: {e}"
+    timings["editor"] = round(time.monotonic() - editor_start, 3)
+    if editor.last_metrics is not None:
+        _record_call("Editor", EDITOR_MODEL, editor.last_metrics)
 
     ed = EditorialDecision(
         paper_id=paper.id,
@@ -231,33 +436,109 @@ async def run_review_pipeline(paper: Paper, db: AsyncSession):
         editor_model="claude-editor",
         decided_at=datetime.utcnow(),
     )
-    db.add(ed)
+    decision_rows = [ed] + call_rows
+    call_rows.clear()
 
-    # 8. 更新论文状态
+    # 5. 更新论文状态
     status_map = {
         "accept": "accepted",
         "minor_revision": "revision",
         "major_revision": "revision",
         "reject": "rejected",
     }
-    paper.status = status_map.get(final_decision, "revision")
-    paper.decided_at = datetime.utcnow()
-
-    # 如果被接受，分配发表编号（TR-xxxx）
-    if final_decision == "accept":
-        max_pub = await db.execute(
-            select(func.max(Paper.publication_number))
-        )
-        current_max = max_pub.scalar() or 0
-        paper.publication_number = current_max + 1
-
-    await db.commit()
-
+    values = {"status": status_map.get(final_decision, "revision"), "decided_at": datetime.utcnow()}
+
+    async def _save_decision(session: AsyncSession):
+        await add_rows(*decision_rows)(session)
+        # 如果被接受，分配发表编号（TR-xxxx）；在单写队列中执行，编号不会重复（重试时重新分配）
+        publication = {}
+        if final_decision == "accept":
+            current_max = await session.scalar(select(func.max(Paper.publication_number))) or 0
+            publication["publication_number"] = current_max + 1
+        await update_paper_status(paper, **values, **publication)(session)
+
+    # 主编工作期间已完成的迟到审稿先落库，决定公布时页面上就能看到它们
+    finished = {task for task in pending if task.done()}
+    if finished:
+        await _collect(finished, editor_open=False)
+    await write(_save_decision)
+    invalidate_paper_page(paper.id)
     logger.info(f"Paper #{paper.id} '{paper.title}' — decision: {final_decision}")
 
-    # 9. 发送邮件通知作者
+    # 发送邮件通知作者
     if paper.email:
         try:
             send_decision_email(paper.email, paper.id, paper.title, final_decision, paper.publication_number)
         except Exception as e:
             logger.error(f"Email notification failed: {e}")
+
+    # 6. 主编决定后仍在进行的审稿：等待完成并保存（不送主编）
+    while pending:
+        done, _ = await asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED)
+        await _collect(done, editor_open=False)
+    timings["all_reviews"] = _elapsed()
+
+    # 升级/降级检查
+    for gr_db in guest_reviewers_db:
+        await check_promotion_demotion(gr_db, db)
+
+    timings["total"] = _elapsed()
+    await write(add_rows(PipelineRun(
+        paper_id=paper.id,
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+        timings=json.dumps(timings, ensure_ascii=False),
+    ), *call_rows))
+    logger.info(f"Paper #{paper.id} pipeline timings: {timings}")
+    if prompt_usage["prompt_tokens"]:
+        logger.info(
+            f"Paper #{paper.id} prompt cache: {prompt_usage['cached_tokens']}/{prompt_usage['prompt_tokens']} "
+            f"prompt tokens served from provider cache"
+        )
+
+
+async def fail_review_job(paper_id: int, error: str):
+    """
+    审稿任务用尽重试次数：还没有决定的论文转为终态 review_failed，详情页显示审稿失败，不再自动重试。
+    失败原因记录在任务的 last_error 中。
+    """
+    from app.database import read_session
+    async with read_session() as db:
+        paper = await db.get(Paper, paper_id)
+        if not paper or paper.status not in ("submitted", "under_review"):
+            return
+        await write(update_paper_status(paper, status="review_failed"))
+    invalidate_paper_page(paper_id)
+    logger.error(f"Paper #{paper_id}: review failed permanently: {error[:200]}")
+
+
+async def run_review_job(paper_id: int):
+    """
+    任务队列入口：加载论文并运行审稿流程。
+    任务可能在中断后被重新执行，因此先清理上一次未完成留下的审稿记录。
+    """
+    from app.database import read_session
+    async with read_session() as db:
+        paper = await db.get(
+            Paper, paper_id,
+            options=[undefer(Paper.content_text), selectinload(Paper.editorial_decision)],
+        )
+        if not paper:
+            logger.warning(f"Review job skipped: paper #{paper_id} not found")
+            return
+        if paper.editorial_decision:
+            logger.info(f"Review job skipped: paper #{paper_id} already decided")
+            return
+
+        async def _clear_previous(session: AsyncSession):
+            guest_reviewer_ids = await paper_guest_reviewers(session, paper_id)
+            await unrecord_paper_loads(session, paper_id)
+            await session.execute(delete(GuestReviewRecord).where(GuestReviewRecord.paper_id == paper_id))
+            await uncount_paper_reviews(session, paper_id)
+            await session.execute(delete(Review).where(Review.paper_id == paper_id))
+            await refresh_guest_stats(session, guest_reviewer_ids)
+
+        await write(_clear_previous)
+        invalidate_paper_page(paper.id)
+
+        await run_review_pipeline(paper, db)
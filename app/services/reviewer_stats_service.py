@@ -0,0 +1,148 @@
+"""社区审稿人排行榜 — 审稿数与评分总和存在 guest_reviewer_stats，排行榜一次查询、数据库内排序分页。
+
+审稿流程每写一条 GuestReviewRecord 就在同一写操作里累加该审稿人的计数和评分总和，
+并更新平均分列；排行榜的每个排序键都有索引，按索引顺序取一页即可，不再逐个审稿人聚合。
+任务重跑时删除的审稿记录，按受影响审稿人从原始表重新计算（refresh_stats_statements）。
+"""
+
+from dataclasses import dataclass
+
+from sqlalchemy import select, update, func, case, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import GuestReviewer, GuestReviewerStats, GuestReviewRecord, Review
+from app.services.assignment_service import record_daily_load
+
+# 排行榜排序键 → (排序列, 同分时的排序列)，都按降序。
+# 同分列与排序列在同一张表上，(排序列, rowid) 的索引顺序就是排行榜顺序，取一页不需要临时排序
+_BY_STATS = GuestReviewerStats.guest_reviewer_id
+LEADERBOARD_SORTS = {
+    "reviews": (GuestReviewerStats.review_count, _BY_STATS),
+    "level": (GuestReviewer.level, GuestReviewer.id),
+    "overall": (GuestReviewerStats.avg_overall, _BY_STATS),
+    "novelty": (GuestReviewerStats.avg_novelty, _BY_STATS),
+    "soundness": (GuestReviewerStats.avg_soundness, _BY_STATS),
+    "writing": (GuestReviewerStats.avg_writing, _BY_STATS),
+}
+
+
+async def _get_stats(session: AsyncSession, guest_reviewer_id: int) -> GuestReviewerStats:
+    stats = await session.get(GuestReviewerStats, guest_reviewer_id)
+    if stats is None:
+        stats = GuestReviewerStats(guest_reviewer_id=guest_reviewer_id, latency_ewma=0.0, late_reviews=0)
+        session.add(stats)
+    return stats
+
+
+def _update_averages(stats: GuestReviewerStats):
+    n = stats.scored_reviews or 0
+    stats.avg_novelty = (stats.novelty_sum or 0) / n if n else 0.0
+    stats.avg_soundness = (stats.soundness_sum or 0) / n if n else 0.0
+    stats.avg_writing = (stats.writing_sum or 0) / n if n else 0.0
+    stats.avg_overall = (stats.avg_novelty + stats.avg_soundness + stats.avg_writing) / 3 if n else 0.0
+
+
+async def record_guest_review(session: AsyncSession, guest_reviewer_id: int, format_valid: bool,
+                              review: Review | None = None):
+    """写入一条 GuestReviewRecord 时调用（同一写操作内）；review 为保存的审稿意见，调用失败时为 None。"""
+    await record_daily_load(session, guest_reviewer_id)  # 分配用的近 30 天负载
+    stats = await _get_stats(session, guest_reviewer_id)
+    stats.review_count = (stats.review_count or 0) + 1
+    if format_valid:
+        stats.valid_count = (stats.valid_count or 0) + 1
+    if review is not None:
+        stats.scored_reviews = (stats.scored_reviews or 0) + 1
+        stats.novelty_sum = (stats.novelty_sum or 0) + (review.novelty_score or 0)
+        stats.soundness_sum = (stats.soundness_sum or 0) + (review.soundness_score or 0)
+        stats.writing_sum = (stats.writing_sum or 0) + (review.writing_score or 0)
+        _update_averages(stats)
+
+
+async def ensure_guest_stats(session: AsyncSession, guest_reviewer_id: int):
+    """审稿人进入排行榜（通过校准）时建好统计行，排行榜用内连接即可列出还没有审稿的审稿人。"""
+    await _get_stats(session, guest_reviewer_id)
+
+
+def refresh_stats_statements(reviewer_ids: list[int] | None = None) -> list:
+    """从原始表重新计算计数、评分总和与平均分的 UPDATE 语句（reviewer_ids 为 None 时更新全部）。"""
+    reviewer = GuestReviewerStats.guest_reviewer_id
+    records = GuestReviewRecord.guest_reviewer_id == reviewer
+    reviews = and_(Review.guest_reviewer_id == reviewer, Review.is_guest == 1)
+
+    def scalar(column, condition):
+        return select(column).where(condition).scalar_subquery()
+
+    totals = update(GuestReviewerStats).values(
+        review_count=scalar(func.count(GuestReviewRecord.id), records),
+        valid_count=scalar(func.count(GuestReviewRecord.id), and_(records, GuestReviewRecord.format_valid == 1)),
+        scored_reviews=scalar(func.count(Review.id), reviews),
+        novelty_sum=scalar(func.coalesce(func.sum(Review.novelty_score), 0), reviews),
+        soundness_sum=scalar(func.coalesce(func.sum(Review.soundness_score), 0), reviews),
+        writing_sum=scalar(func.coalesce(func.sum(Review.writing_score), 0), reviews),
+    )
+    # SET 中引用的是更新前的值，平均分需要第二条语句
+    n = GuestReviewerStats.scored_reviews
+
+    def avg(column):
+        return case((n > 0, column * 1.0 / n), else_=0.0)
+
+    averages = update(GuestReviewerStats).values(
+        avg_novelty=avg(GuestReviewerStats.novelty_sum),
+        avg_soundness=avg(GuestReviewerStats.soundness_sum),
+        avg_writing=avg(GuestReviewerStats.writing_sum),
+        avg_overall=case(
+            (n > 0, (GuestReviewerStats.novelty_sum + GuestReviewerStats.soundness_sum
+                     + GuestReviewerStats.writing_sum) * 1.0 / (3 * n)),
+            else_=0.0,
+        ),
+    )
+    if reviewer_ids is not None:
+        totals = totals.where(reviewer.in_(reviewer_ids))
+        averages = averages.where(reviewer.in_(reviewer_ids))
+    return [totals, averages]
+
+
+async def paper_guest_reviewers(session: AsyncSession, paper_id: int) -> list[int]:
+    """参与过某篇论文的社区审稿人（删除该论文的审稿记录前调用，删除后传给 refresh_guest_stats）。"""
+    result = await session.execute(
+        select(GuestReviewRecord.guest_reviewer_id).where(GuestReviewRecord.paper_id == paper_id).distinct()
+    )
+    return list(result.scalars())
+
+
+async def refresh_guest_stats(session: AsyncSession, reviewer_ids: list[int]):
+    if reviewer_ids:
+        for statement in refresh_stats_statements(reviewer_ids):
+            await session.execute(statement)
+
+
+@dataclass
+class LeaderboardPage:
+    entries: list
+    page: int
+    per_page: int
+    has_next: bool
+
+
+def leaderboard_query(sort: str, page: int, per_page: int):
+    """排行榜一页的查询（Candidate 及以上），多取一行判断是否有下一页。"""
+    sort_column, tie_column = LEADERBOARD_SORTS.get(sort, LEADERBOARD_SORTS["reviews"])
+    return (
+        select(
+            GuestReviewer.id, GuestReviewer.display_name, GuestReviewer.level, GuestReviewer.mode,
+            GuestReviewer.backend_model, GuestReviewer.api_model_name,
+            GuestReviewerStats.review_count, GuestReviewerStats.avg_novelty, GuestReviewerStats.avg_soundness,
+            GuestReviewerStats.avg_writing, GuestReviewerStats.avg_overall,
+        )
+        .join(GuestReviewerStats, GuestReviewerStats.guest_reviewer_id == GuestReviewer.id)
+        .where(GuestReviewer.level >= 1)
+        .order_by(sort_column.desc(), tie_column.desc())
+        .offset((page - 1) * per_page)
+        .limit(per_page + 1)
+    )
+
+
+async def leaderboard_page(db: AsyncSession, sort: str, page: int, per_page: int) -> LeaderboardPage:
+    """按排序键取排行榜的一页，一次查询，排序和分页都在数据库中完成。"""
+    rows = (await db.execute(leaderboard_query(sort, page, per_page))).all()
+    return LeaderboardPage(entries=rows[:per_page], page=page, per_page=per_page, has_next=len(rows) > per_page)
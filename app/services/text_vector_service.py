@@ -0,0 +1,72 @@
+"""文本向量 — 哈希 n-gram 的 TF-IDF，用于稿件与社区审稿人专长的语义匹配。
+
+不需要词表：每个特征（单词；关键词内的相邻两词和整个关键词短语）用 crc32 哈希到 ASSIGNMENT_VECTOR_DIM 维中的一维，
+并按哈希位决定正负号（signed hashing，冲突的特征大致相互抵消）。词频取 1 + log(tf)，
+再乘以 IDF（在审稿人文档上统计文档频率），最后做 L2 归一化，两个向量的点积即余弦相似度。
+crc32 在各进程中结果一致（不同于内置 hash），同一段文本在任何进程得到的向量都相同。
+"""
+
+import math
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from app.config import ASSIGNMENT_VECTOR_DIM
+
+_WORD = re.compile(r"\w+")
+
+# 常见英文虚词，对匹配专长没有区分度
+_STOPWORDS = frozenset("""
+a an and are as at be been but by can for from has have in into is it its of on or our over such
+that the their these this those to using via we which with within without you your paper study
+approach method methods propose proposed results show based new
+""".split())
+
+
+def _words(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if len(w) > 1 and w not in _STOPWORDS and not w.isdigit()]
+
+
+def text_features(text: str = "", phrases=()) -> Counter:
+    """
+    文本的特征计数。正文只取单词（正文的相邻两词几乎不会在两篇文本间重合，只增加哈希冲突）；
+    phrases（已规范化的关键词）取单词、相邻两词和整个短语，精确匹配的关键词权重更高。
+    """
+    features = Counter(_words(text))
+    for phrase in phrases:
+        words = _words(phrase)
+        features.update(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    features.update(f"kw:{phrase}" for phrase in phrases)
+    return features
+
+
+def _hash(feature: str) -> tuple[int, float]:
+    h = zlib.crc32(feature.encode())
+    return h % ASSIGNMENT_VECTOR_DIM, (1.0 if h & 0x80000000 else -1.0)
+
+
+def term_vector(features: Counter) -> tuple[np.ndarray, np.ndarray]:
+    """特征计数 → 哈希后的稀疏词频 (维度下标, 带符号的 1 + log(tf))，同一维的特征合并。"""
+    weights: dict[int, float] = {}
+    for feature, count in features.items():
+        index, sign = _hash(feature)
+        weights[index] = weights.get(index, 0.0) + sign * (1.0 + math.log(count))
+    indices = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    return indices, values
+
+
+def idf_weights(document_frequencies: np.ndarray, documents: int) -> np.ndarray:
+    """各维的 IDF = log((1 + N) / (1 + df)) + 1，df 为含该维特征的文档数。"""
+    return (np.log((1.0 + documents) / (1.0 + document_frequencies)) + 1.0).astype(np.float32)
+
+
+def tfidf_vector(indices: np.ndarray, values: np.ndarray, idf: np.ndarray) -> np.ndarray:
+    """稀疏词频 → L2 归一化的稠密 TF-IDF 向量（float32）；没有任何特征时为零向量。"""
+    vector = np.zeros(ASSIGNMENT_VECTOR_DIM, dtype=np.float32)
+    vector[indices] = values * idf[indices]
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
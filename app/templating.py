@@ -0,0 +1,8 @@
+"""共享的 Jinja2 模板环境（所有路由使用同一个实例，模板全局函数只需注册一次）。"""
+
+from fastapi.templating import Jinja2Templates
+
+from app.services.http_cache_service import static_url
+
+templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["static_url"] = static_url
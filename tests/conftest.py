@@ -0,0 +1,9 @@
+"""测试使用临时数据库，不触碰 data/ 下的真实数据；导入 app 之前设置好环境变量。"""
+
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="turing-review-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["BLOB_GC_INTERVAL_SECONDS"] = "0"  # 临时数据库不引用 uploads/ 下的文件，不能回收
+os.environ["LLM_WARMUP_TIMEOUT"] = "0.1"
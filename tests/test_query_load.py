@@ -0,0 +1,89 @@
+"""请求级查询负载：数据量很大时，详情页和排行榜每个请求的查询数和加载对象数仍有固定上限。"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.config import DATABASE_URL, LEADERBOARD_PAGE_SIZE
+from app.main import app
+from app.models import Paper, Review, EditorialDecision, GuestReviewer, GuestReviewRecord, GuestReviewerStats
+from app.services.query_stats_service import query_stats
+from app.services.reviewer_stats_service import refresh_stats_statements
+
+PAPERS = 400
+REVIEWERS = 120
+BUILTIN = ("The Innovator", "The Logician", "The Technician")
+
+
+def _seed(session: Session):
+    session.execute(insert(GuestReviewer), [
+        {"id": i, "display_name": f"R{i}", "email": f"r{i}@x.y", "mode": "api", "level": 2,
+         "expertise_areas": "ai, ml", "calibration_passed": 1}
+        for i in range(1, REVIEWERS + 1)
+    ])
+    session.execute(insert(GuestReviewerStats), [{"guest_reviewer_id": i} for i in range(1, REVIEWERS + 1)])
+    session.execute(insert(Paper), [
+        {"id": p, "title": f"P{p}", "abstract": "A", "keywords": "ai", "status": "accepted", "publication_number": p}
+        for p in range(1, PAPERS + 1)
+    ])
+    session.execute(insert(EditorialDecision), [
+        {"paper_id": p, "final_decision": "accept", "decision_letter": "Dear authors"} for p in range(1, PAPERS + 1)
+    ])
+    reviews, records = [], []
+    for p in range(1, PAPERS + 1):
+        for name in BUILTIN:
+            reviews.append({"paper_id": p, "reviewer_name": name, "model_provider": "deepseek", "decision": "accept",
+                            "novelty_score": 7, "soundness_score": 6, "writing_score": 8})
+        # 每篇都有 1 号审稿人，外加轮换的另一位：1 号审稿人有 PAPERS 条审稿
+        for reviewer_id in (1, 2 + p % (REVIEWERS - 1)):
+            reviews.append({"paper_id": p, "reviewer_name": f"R{reviewer_id}", "model_provider": "guest",
+                            "decision": "accept", "novelty_score": 6, "soundness_score": 6, "writing_score": 6,
+                            "is_guest": 1, "guest_reviewer_id": reviewer_id, "guest_level": 2})
+            records.append({"guest_reviewer_id": reviewer_id, "paper_id": p, "format_valid": 1,
+                             "score_reasonable": 1, "comment_length": 300, "sent_to_editor": 1})
+    session.execute(insert(Review), reviews)
+    session.execute(insert(GuestReviewRecord), records)
+    for statement in refresh_stats_statements():
+        session.execute(statement)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        engine = create_engine(DATABASE_URL.replace("+aiosqlite", ""))
+        with Session(engine) as session, session.begin():
+            _seed(session)
+        engine.dispose()
+        yield c
+
+
+def _load(client, path: str, route: str) -> tuple[str, dict]:
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.text, query_stats()[route]
+
+
+def test_reviewer_profile_is_bounded(client):
+    # 审稿人、计数行 + 最近 20 条审稿的列（不是 ORM 对象），与审稿总数无关
+    text, load = _load(client, "/reviewer/1", "reviewer_profile")
+    assert text.count("/paper/") >= 20
+    assert load["max_objects"] <= 3
+    assert load["max_queries"] <= 4
+
+
+def test_leaderboard_is_bounded(client):
+    # 每页一次查询，加载量不超过一页
+    for sort in ("reviews", "overall", "level"):
+        text, load = _load(client, f"/reviewers?sort={sort}", "reviewer_leaderboard")
+        assert text.count('href="/reviewer/') == LEADERBOARD_PAGE_SIZE
+    assert load["max_objects"] <= LEADERBOARD_PAGE_SIZE
+    assert load["max_queries"] <= 2
+
+
+def test_paper_detail_is_bounded(client):
+    # 论文 + 5 条审稿 + 主编决定
+    text, load = _load(client, "/paper/1", "paper_detail")
+    assert "Dear authors" in text
+    assert load["max_objects"] <= 8
+    assert load["max_queries"] <= 5
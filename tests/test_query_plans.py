@@ -0,0 +1,57 @@
+"""热点查询的执行计划：新建数据库并执行全部迁移后，每个热点查询都必须走索引。"""
+
+import pytest
+from sqlalchemy import create_engine, select
+
+import app.models  # noqa: F401  注册所有表
+from app.database import Base
+from app.migrations import MIGRATIONS, run_migrations, check_query_plans, hot_queries, explain, _FULL_SCAN
+from app.models import Paper
+from app.services.reviewer_stats_service import LEADERBOARD_SORTS, leaderboard_query
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        assert run_migrations(connection) == sorted(m.version for m in MIGRATIONS)
+        yield connection
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", sorted(hot_queries()))
+def test_hot_query_uses_index(conn, name):
+    plan = explain(conn, hot_queries()[name])
+    assert not any(_FULL_SCAN.match(step) for step in plan), f"{name}: {' | '.join(plan)}"
+
+
+@pytest.mark.parametrize("sort", sorted(LEADERBOARD_SORTS))
+def test_leaderboard_reads_in_index_order(conn, sort):
+    # 排行榜按索引顺序取一页，不对全部审稿人做临时排序
+    plan = explain(conn, leaderboard_query(sort, 1, 20))
+    assert not any("TEMP B-TREE" in step for step in plan), plan
+
+
+def test_no_regressions(conn):
+    assert check_query_plans(conn) == {}
+
+
+def test_migrations_are_idempotent(conn):
+    assert run_migrations(conn) == []
+
+
+def test_full_scan_is_detected(conn):
+    # abstract 上没有索引：必须被识别为全表扫描
+    plan = explain(conn, select(Paper.id).where(Paper.abstract == ""))
+    assert any(_FULL_SCAN.match(step) for step in plan), plan
+
+
+@pytest.mark.parametrize("step, full_scan", [
+    ("SCAN papers", True),
+    ("SCAN papers USING INDEX ix_papers_submitted", False),
+    ("SCAN papers USING COVERING INDEX ix_papers_status_submitted", False),
+    ("SEARCH papers USING INDEX ix_papers_submitted (submitted_at<?)", False),
+])
+def test_full_scan_pattern(step, full_scan):
+    assert bool(_FULL_SCAN.match(step)) is full_scan